@@ -4,8 +4,13 @@ from ninja_extra import NinjaExtraAPI
 from organisations.controllers import OrganizationController
 from passport.controllers import (
     PassportController, 
-    BatchController
+    BatchController,
+    PublicPassportController,
+    DashboardController,
+    PassportImportController,
 )
+from utils_mixins.circuit_breaker import breakers_stats
+from utils_mixins.schemas import CircuitBreakerSchema
 from .security import (
     basic_auth
 )
@@ -24,9 +29,18 @@ api.register_controllers(
     OrganizationController,
     PassportController,
     BatchController,
+    PublicPassportController,
+    DashboardController,
+    PassportImportController,
 )
 
 
+@api.get("/health/cache", response=list[CircuitBreakerSchema], auth=None, tags=["Health"])
+def cache_health(request: HttpRequest):
+    """Circuit breakers of the cache in this worker process: closed, open or half_open."""
+    return breakers_stats()
+
+
 @api.exception_handler(ValidationError)
 def service_unavailable_handler(request: HttpRequest, exc: ValidationError):
     return api.create_response(
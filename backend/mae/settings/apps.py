@@ -15,6 +15,7 @@ INSTALLED_APPS = [
     "auditlog",
     "safedelete",
     "organizations",
+    "utils_mixins",
     "organisations",
     "users",
     "passport",
@@ -23,10 +24,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "utils_mixins.response_cache.ResponseCacheMiddleware",
+    "utils_mixins.db_routers.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "organisations.middleware.CurrentOrganizationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -35,6 +35,10 @@ DEBUG = os.getenv("DJANGO_DEBUG") == "ON"
 
 ALLOWED_HOSTS = os.getenv("DJANGO_ALLOWED_HOSTS", "").split(",")
 
+# Origins of the public portal (e.g. https://passeports.example.org), used to
+# warm the response cache; defaults to https:// + ALLOWED_HOSTS.
+PUBLIC_ORIGINS = [origin for origin in os.getenv("DJANGO_PUBLIC_ORIGINS", "").split(",") if origin]
+
 
 ROOT_URLCONF = "mae.urls"
 
@@ -82,6 +86,10 @@ AUTH_PASSWORD_VALIDATORS = [
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Version of the UUID primary keys generated for new rows (4: random,
+# 7: time-ordered, friendlier to B-tree indexes on insert-heavy tables).
+UUID_PRIMARY_KEY_VERSION = int(os.getenv("UUID_PRIMARY_KEY_VERSION", 4))
+
 
 AUTH_USER_MODEL = "users.User"
 
@@ -1,25 +1,103 @@
 import os
+from urllib.parse import urlencode
 
 
 
 REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/1")
 
-CACHEOPS_REDIS = REDIS_URL
+# Tight timeouts: a stalled Redis must not stall the requests with it.
+REDIS_CONNECT_TIMEOUT = float(os.environ.get("REDIS_CONNECT_TIMEOUT", 0.25))
+REDIS_READ_TIMEOUT = float(os.environ.get("REDIS_READ_TIMEOUT", 0.25))
+
+# After `failure_threshold` consecutive Redis errors, the cache is bypassed
+# (in-process fallback for Django's cache, database for cacheops) during
+# `reset_timeout` seconds before a trial call is let through.
+CIRCUIT_BREAKERS = {
+    "redis": {
+        "failure_threshold": int(os.environ.get("REDIS_FAILURE_THRESHOLD", 5)),
+        "reset_timeout": float(os.environ.get("REDIS_RESET_TIMEOUT", 30)),
+    },
+}
 
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "BACKEND": "utils_mixins.cache_backends.ResilientRedisCache",
         "LOCATION": REDIS_URL,
-    }
+        "OPTIONS": {
+            "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+            "socket_timeout": REDIS_READ_TIMEOUT,
+            "FALLBACK": os.environ.get("REDIS_FALLBACK", "locmem"),
+            "CIRCUIT_BREAKER": "redis",
+            "serializer": "utils_mixins.serializers.CompactRedisSerializer",
+        },
+    },
+    # Passport search results, keyed by organization data version: entries
+    # of older versions are never purged, they age out. Point SEARCH_CACHE_URL
+    # to a Redis configured with a memory budget and LRU eviction
+    # (maxmemory <budget>, maxmemory-policy allkeys-lru).
+    "search": {
+        "BACKEND": "utils_mixins.cache_backends.ResilientRedisCache",
+        "LOCATION": os.environ.get("SEARCH_CACHE_URL", REDIS_URL),
+        "KEY_PREFIX": "search",
+        "OPTIONS": {
+            "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+            "socket_timeout": REDIS_READ_TIMEOUT,
+            "FALLBACK": os.environ.get("REDIS_FALLBACK", "locmem"),
+            "CIRCUIT_BREAKER": "redis",
+            "serializer": "utils_mixins.serializers.CompactRedisSerializer",
+        },
+    },
 }
 
+# Lifetime of a cached search count or page (seconds).
+SEARCH_CACHE_TIMEOUT = int(os.environ.get("SEARCH_CACHE_TIMEOUT", 60*15))
+
+
+CACHEOPS_REDIS = "{}{}{}".format(
+    REDIS_URL,
+    "&" if "?" in REDIS_URL else "?",
+    urlencode({
+        "socket_connect_timeout": REDIS_CONNECT_TIMEOUT,
+        "socket_timeout": REDIS_READ_TIMEOUT,
+    }),
+)
+CACHEOPS_CLIENT_CLASS = "utils_mixins.cache_backends.CircuitBreakerRedis"
+CACHEOPS_DEGRADE_ON_FAILURE = True
+
+# Values of the Django caches are stored as compact field tuples and
+# compressed above CACHE_COMPRESSION_THRESHOLD bytes: "zlib", None, or
+# "zstd" / "lz4" with the zstandard / lz4 package installed.
+CACHE_COMPRESSION = os.environ.get("CACHE_COMPRESSION", "zlib")
+CACHE_COMPRESSION_THRESHOLD = 1024
+
 CACHEOPS_DEFAULTS = {
     'timeout': 60*60
 }
 
 CACHEOPS = {
-    'organisations.*': {'ops': 'all', 'timeout': 60*25},
     'users.User': {'ops': 'all', 'timeout': 60*30},
 }
 
+# Unauthenticated citizen lookup (/public/passports): off unless
+# PUBLIC_PASSPORT_API=ON, its routes answer 404 meanwhile.
+PUBLIC_PASSPORT_API = os.environ.get("PUBLIC_PASSPORT_API", "OFF") == "ON"
+
+# Coalesce identical concurrent public lookups across workers (through the
+# cache), not only within a worker.
+SINGLE_FLIGHT_DISTRIBUTED = os.environ.get("SINGLE_FLIGHT_DISTRIBUTED", "ON") == "ON"
+
+# Full-response cache of public routes: {path prefix: timeout in seconds}.
+# Entries are purged by surrogate key on writes (see passport.caches).
+RESPONSE_CACHE_ROUTES = {
+    "/public/": 60*10,
+}
+
+# Public lookups precomputed when a batch is published (and by
+# `manage.py warm_caches`): the first `pages` list pages, one page per
+# surname initial and per coupon prefix, at most `max_lookups` in total.
+WARM_CACHES = {
+    "pages": 3,
+    "coupon_prefix_length": 3,
+    "max_lookups": 100,
+}
@@ -1,12 +1,172 @@
+import os
+
+import dj_database_url
+
 from .base import BASE_DIR
 
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# DATABASE_URL selects the database, e.g. postgres://mae:secret@db:5432/mae;
+# SQLite in BASE_DIR when unset.
+
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
+
+
+def _database(url: str) -> dict:
+    database = dj_database_url.parse(url)
+    if database["ENGINE"] == "django.db.backends.postgresql":
+        _postgres_profile(database)
+    elif database["ENGINE"] == "django.db.backends.sqlite3":
+        _sqlite_profile(database)
+    return database
+
+
+# SQLite profile (single-node deployments), on by default (SQLITE_PROFILE)
+
+def _sqlite_profile(database: dict) -> None:
+    if os.getenv("SQLITE_PROFILE", "ON") != "ON":
+        return
+    options = database.setdefault("OPTIONS", {})
+
+    # Writers take the write lock when their transaction starts instead of
+    # failing on lock upgrade; the others wait up to `timeout` seconds for
+    # it rather than raising "database is locked".
+    options["transaction_mode"] = "IMMEDIATE"
+    options["timeout"] = float(os.getenv("SQLITE_BUSY_TIMEOUT", 20))
+
+    # Applied on every new connection. WAL lets readers run alongside the
+    # writer; synchronous=NORMAL is durable in WAL mode except for the last
+    # transactions on power loss.
+    options["init_command"] = ";".join([
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', 256 * 2**20))}",
+        f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE_KIB', 64 * 1024))}",
+        "PRAGMA temp_store=MEMORY",
+    ])
+
+    # Keep connections (and their page cache) between requests.
+    database["CONN_MAX_AGE"] = int(os.getenv("DATABASE_CONN_MAX_AGE", 600))
+    database["CONN_HEALTH_CHECKS"] = True
+
+
+# Postgres profile
+
+def _postgres_profile(database: dict) -> None:
+    options = database.setdefault("OPTIONS", {})
+
+    # Native psycopg3 connection pool (one per process): requests borrow an
+    # open connection instead of paying a new connection each time.
+    if os.getenv("DATABASE_POOL", "ON") == "ON":
+        options["pool"] = {
+            "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", 2)),
+            "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", 10)),
+            # Seconds before a connection is replaced / an idle one closed.
+            "max_lifetime": float(os.getenv("DATABASE_POOL_MAX_LIFETIME", 60*30)),
+            "max_idle": float(os.getenv("DATABASE_POOL_MAX_IDLE", 60*5)),
+            # Seconds a request waits for a free connection.
+            "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", 10)),
+        }
+        database["CONN_MAX_AGE"] = 0
+    else:
+        database["CONN_MAX_AGE"] = int(os.getenv("DATABASE_CONN_MAX_AGE", 60))
+
+    # Connections are checked before being reused (or handed out by the pool).
+    database["CONN_HEALTH_CHECKS"] = True
+
+    # Behind PgBouncer in transaction mode, server-side cursors and
+    # prepared statements are not safe: DATABASE_PGBOUNCER=ON disables both.
+    pgbouncer = os.getenv("DATABASE_PGBOUNCER") == "ON"
+
+    # QuerySet.iterator() streams through server-side cursors.
+    database["DISABLE_SERVER_SIDE_CURSORS"] = pgbouncer
+
+    # psycopg prepares a query server side once it ran `prepare_threshold`
+    # times on a connection (None: never).
+    prepare_threshold = os.getenv("DATABASE_PREPARE_THRESHOLD", "5")
+    options["prepare_threshold"] = (
+        None if pgbouncer or prepare_threshold.lower() in ("", "off", "none")
+        else int(prepare_threshold)
+    )
+
 
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": _database(DATABASE_URL),
+}
+
+
+# Shards
+# DATABASE_SHARD_URLS (comma-separated) adds shard_1, shard_2, ... The
+# batches and passports (SHARDED_MODELS) of an organization live on its
+# shard (Organization.shard, the default database when blank); queries
+# without organization are gathered from every shard. Migrate them all
+# with `manage.py migrate_shards`, move an organization with
+# `manage.py move_organization_shard`.
+
+DATABASE_SHARDS = ["default"]
+for _index, _url in enumerate(filter(None, os.getenv("DATABASE_SHARD_URLS", "").split(",")), 1):
+    DATABASES[f"shard_{_index}"] = _database(_url)
+    DATABASE_SHARDS.append(f"shard_{_index}")
+
+SHARDED_MODELS = [
+    "passport.batch",
+    "passport.passport",
+    "passport.archivedpassport",
+    "passport.passportrecord",
+    "passport.passportdailystats",
+    "passport.passportimport",
+    "passport.passportimportrow",
+    "passport.passportimporterror",
+]
+
+
+# Read replicas
+# DATABASE_REPLICA_URLS (comma-separated) adds replica_1, replica_2, ...
+# GET requests on REPLICA_ROUTES read from a replica, unless the client
+# wrote less than REPLICA_MAX_LAG seconds ago (read-your-writes) or the
+# replica lags more than that behind the primary.
+
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(filter(None, os.getenv("DATABASE_REPLICA_URLS", "").split(",")), 1):
+    DATABASES[f"replica_{_index}"] = {**_database(_url), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica_{_index}")
+
+DATABASE_ROUTERS = [
+    "organisations.sharding.ShardRouter",
+    "utils_mixins.db_routers.ReplicaRouter",
+]
+
+REPLICA_ROUTES = ["/passports", "/batches", "/public/"]
+
+# Staleness bound, in seconds.
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+
+
+# Passport archive (`manage.py archive_passports`)
+# Taken and lost passports untouched for `grace_days`, and passports
+# published more than `published_days` ago, are moved to the archive table.
+
+PASSPORT_ARCHIVE = {
+    "grace_days": int(os.getenv("PASSPORT_ARCHIVE_GRACE_DAYS", 30)),
+    "published_days": int(os.getenv("PASSPORT_ARCHIVE_PUBLISHED_DAYS", 2 * 365)),
+}
+
+
+# Soft-deleted rows (`manage.py purge_soft_deleted`)
+# Rows of SOFT_DELETE_RETENTION["models"] soft-deleted more than `days`
+# ago are deleted for good, children first, `chunk_size` rows per
+# transaction with `pause` seconds between chunks.
+
+SOFT_DELETE_RETENTION = {
+    "days": int(os.getenv("SOFT_DELETE_RETENTION_DAYS", 90)),
+    "chunk_size": int(os.getenv("SOFT_DELETE_PURGE_CHUNK_SIZE", 500)),
+    "pause": float(os.getenv("SOFT_DELETE_PURGE_PAUSE", 0.2)),
+    "models": [
+        "passport.passport",
+        "passport.archivedpassport",
+        "passport.batch",
+        "organisations.organizationuser",
+    ],
 }
@@ -1,10 +1,119 @@
 from django.core.exceptions import ImproperlyConfigured
-from cacheops import cached_as, cached
+from django.db.models import QuerySet
+from utils_mixins.caches import stampede_cached, invalidate_tags
 from organisations.models import Organization, OrganizationUser
 
 
+PLATFORM_ADMIN_TAG = "organization:platform_admin"
 
-@cached_as(Organization, timeout=60*15)
+
+# Tags
+# Les caches sont invalidés par clé (slug, pk, organisation + utilisateur)
+# et non plus par modèle : l'activité d'une organisation n'invalide pas
+# les entrées des autres.
+
+def organization_tag(pk) -> str:
+    return f"organization:{pk}"
+
+
+def organization_slug_tag(slug) -> str:
+    return f"organization:slug:{slug}"
+
+
+def organization_user_tag(organization, user) -> str:
+    return f"organization_user:{organization}:{user}"
+
+
+def organization_lookup_tags(**kwargs) -> set:
+    tags = set()
+    if "slug" in kwargs:
+        tags.add(organization_slug_tag(kwargs["slug"]))
+    for name in ("pk", "id"):
+        if name in kwargs:
+            tags.add(organization_tag(kwargs[name]))
+    return tags
+
+
+def organization_result_tags(organization) -> set:
+    if organization is None:
+        return set()
+    return {organization_tag(organization.pk)}
+
+
+def organization_user_lookup_tags(**kwargs) -> set:
+    user = kwargs.get("user__pk", kwargs.get("user"))
+    user = getattr(user, "pk", user)
+
+    if "organization" in kwargs:
+        organization = getattr(kwargs["organization"], "pk", kwargs["organization"])
+    elif "organization__pk" in kwargs:
+        organization = kwargs["organization__pk"]
+    elif "organization__slug" in kwargs:
+        organization = f"slug:{kwargs['organization__slug']}"
+    else:
+        return set()
+    return {organization_user_tag(organization, user)}
+
+
+def organization_user_result_tags(organization_user) -> set:
+    if organization_user is None:
+        return set()
+    return {organization_tag(organization_user.organization_id)}
+
+
+# Invalidation
+
+def invalidate_organization(organization: Organization) -> None:
+    """Invalidate the cached lookups of one organization."""
+    tags = [organization_tag(organization.pk), organization_slug_tag(organization.slug)]
+    if getattr(organization, "is_platform_admin", False):
+        tags.append(PLATFORM_ADMIN_TAG)
+    invalidate_tags(*tags)
+
+
+def invalidate_organization_user(organization_user: OrganizationUser) -> None:
+    """Invalidate the cached membership of one user in one organization."""
+    organization = organization_user.organization
+    invalidate_tags(
+        organization_user_tag(organization.pk, organization_user.user_id),
+        organization_user_tag(f"slug:{organization.slug}", organization_user.user_id),
+    )
+
+
+def invalidate_organizations(queryset: QuerySet[Organization]) -> None:
+    """
+    Invalidate the organizations matched by `queryset`.
+    Must be called by bulk paths (`QuerySet.update`, `bulk_update`) which
+    do not send model signals.
+    """
+    tags = []
+    for pk, slug in queryset.values_list("pk", "slug"):
+        tags += [organization_tag(pk), organization_slug_tag(slug)]
+    invalidate_tags(*tags)
+
+
+def invalidate_organization_users(queryset: QuerySet[OrganizationUser]) -> None:
+    """
+    Invalidate the memberships matched by `queryset`.
+    Must be called by bulk paths which do not send model signals.
+    """
+    tags = []
+    rows = queryset.values_list("organization_id", "organization__slug", "user_id")
+    for organization_id, slug, user_id in rows:
+        tags += [
+            organization_user_tag(organization_id, user_id),
+            organization_user_tag(f"slug:{slug}", user_id),
+        ]
+    invalidate_tags(*tags)
+
+
+# Cached lookups
+
+@stampede_cached(
+    timeout=60*15,
+    tags=organization_lookup_tags,
+    result_tags=organization_result_tags,
+)
 def get_organization(**kwargs) -> Organization | None:
     try:
         return Organization.objects.get(**kwargs)
@@ -12,7 +121,11 @@ def get_organization(**kwargs) -> Organization | None:
         return None
 
 
-@cached_as(OrganizationUser, timeout=60*15)
+@stampede_cached(
+    timeout=60*15,
+    tags=organization_user_lookup_tags,
+    result_tags=organization_user_result_tags,
+)
 def get_organization_user(**kwargs) -> OrganizationUser | None:
     """
     Fonction cachée pour récupérer un OrganizationUser avec optimisations.
@@ -20,17 +133,20 @@ def get_organization_user(**kwargs) -> OrganizationUser | None:
     try:
         return OrganizationUser.objects.select_related(
             'organization',
-            'organization__subscription_plan',
             'user'
         ).get(**kwargs)
     except OrganizationUser.DoesNotExist:
         return None
 
 
-@cached(timeout=60*15)
+@stampede_cached(
+    timeout=60*15,
+    tags=lambda: {PLATFORM_ADMIN_TAG},
+    result_tags=organization_result_tags,
+)
 def get_platform_admin_organization() -> Organization | None:
     org = Organization.objects.filter(is_platform_admin=True).order_by('created').first()
-    
+
     if org is None:
         raise ImproperlyConfigured("Oups! The platform administrator must be created.")
 
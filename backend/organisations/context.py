@@ -0,0 +1,36 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from organisations.models import Organization
+
+
+# Organisation courante de la requête en cours, définie par
+# CurrentOrganizationMiddleware et lue par les managers multi-tenant.
+_current_organization: ContextVar[Optional[Organization]] = ContextVar(
+    "current_organization", default=None
+)
+
+
+def get_current_organization() -> Optional[Organization]:
+    """Organisation courante, ou None hors requête / sans organisation."""
+    return _current_organization.get()
+
+
+def set_current_organization(organization: Optional[Organization]):
+    """Définit l'organisation courante; retourne le jeton pour la restaurer."""
+    return _current_organization.set(organization or None)
+
+
+def reset_current_organization(token) -> None:
+    _current_organization.reset(token)
+
+
+@contextmanager
+def use_organization(organization: Optional[Organization]):
+    """Organisation courante `organization` (None: aucune) le temps du bloc."""
+    token = set_current_organization(organization)
+    try:
+        yield organization
+    finally:
+        reset_current_organization(token)
@@ -0,0 +1,25 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.utils.translation import gettext as _
+
+from utils_mixins.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = _('Appliquer les migrations sur chaque base de DATABASE_SHARDS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_label', nargs='?', help=_('Application à migrer'))
+        parser.add_argument('migration_name', nargs='?', help=_('Migration cible'))
+
+    def handle(self, *args, **options):
+        targets = [name for name in (options['app_label'], options['migration_name']) if name]
+        for alias in shard_aliases():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Base {alias}:"))
+            call_command(
+                'migrate', *targets,
+                database=alias,
+                interactive=False,
+                verbosity=options['verbosity'],
+                stdout=self.stdout,
+            )
@@ -0,0 +1,115 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext as _
+
+from organisations.models.organisations import Organization
+from organisations.sharding import shard_for
+from passport.archive import ensure_partitions
+from passport.models import (
+    ArchivedPassport, Batch, Passport, PassportDailyStats,
+    PassportImport, PassportImportError, PassportImportRow,
+)
+from utils_mixins.sharding import shard_aliases
+
+
+# Lots avant passeports: les passeports référencent leur lot (de même les
+# imports avant leurs lignes et erreurs).
+SHARDED = (
+    Batch, Passport, ArchivedPassport, PassportDailyStats,
+    PassportImport, PassportImportRow, PassportImportError,
+)
+
+# Champ désignant l'organisation, `organization_id` par défaut.
+ORGANIZATION_LOOKUPS = {
+    PassportImportRow: 'passport_import__organization_id',
+    PassportImportError: 'passport_import__organization_id',
+}
+
+
+class Command(BaseCommand):
+    help = _("Déplacer les lots et passeports d'une organisation vers une autre base (DATABASE_SHARDS)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('slug', help=_("Identifiant (slug) de l'organisation"))
+        parser.add_argument('shard', help=_('Base cible, ex. shard_2 ou default'))
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help=_('Lignes copiées par requête (1000 par défaut)')
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help=_('Afficher les lignes à déplacer sans rien modifier')
+        )
+
+    def handle(self, *args, **options):
+        try:
+            organization = Organization.objects.get(slug=options['slug'])
+        except Organization.DoesNotExist:
+            raise CommandError(_("Organisation introuvable: %s") % options['slug'])
+
+        source, target = shard_for(organization), options['shard']
+        if target not in shard_aliases():
+            raise CommandError(_("%s n'est pas dans DATABASE_SHARDS (%s)") % (target, ", ".join(shard_aliases())))
+        if target == source:
+            raise CommandError(_("L'organisation est déjà sur %s") % target)
+
+        for model in SHARDED:
+            if self._rows(model, target, organization).exists():
+                raise CommandError(
+                    _("%s contient déjà des lignes %s de l'organisation: nettoyez-les avant de déplacer")
+                    % (target, model._meta.db_table)
+                )
+
+        self.stdout.write(f"{organization.slug}: {source} -> {target}")
+        if options['dry_run']:
+            for model in SHARDED:
+                self.stdout.write(f"  {model._meta.db_table}: {self._rows(model, source, organization).count()}")
+            return
+
+        # Sur SQLite les écritures de la base source attendent la fin de la
+        # transaction; ailleurs, suspendez les écritures de l'organisation:
+        # les lignes sont recomptées après la copie, un écart annule tout.
+        with transaction.atomic(using=source):
+            with transaction.atomic(using=target):
+                for model in SHARDED:
+                    copied = self._copy(model, source, target, organization, options['chunk_size'])
+                    self.stdout.write(f"  {model._meta.db_table}: {copied}")
+
+            organization.shard = "" if target == DEFAULT_DB_ALIAS else target
+            organization.save(update_fields=['shard'])
+
+            # Suppression directe, sans signaux: les données n'ont pas
+            # changé, seule leur base a changé (les caches restent valides).
+            for model in reversed(SHARDED):
+                rows = self._rows(model, source, organization)
+                rows._raw_delete(source)
+
+        self.stdout.write(self.style.SUCCESS(_("✅ %s est maintenant sur %s") % (organization.slug, target)))
+
+    def _rows(self, model, alias, organization):
+        # Y compris les lignes supprimées logiquement (safedelete).
+        lookup = ORGANIZATION_LOOKUPS.get(model, 'organization_id')
+        return model._base_manager.using(alias).filter(**{lookup: organization.pk})
+
+    def _copy(self, model, source, target, organization, chunk_size) -> int:
+        rows = self._rows(model, source, organization).order_by('pk')
+        if model is ArchivedPassport:
+            ensure_partitions(target, rows.values_list('published_year', flat=True).distinct())
+        copied, chunk = 0, []
+        for instance in rows.iterator(chunk_size=chunk_size):
+            chunk.append(instance)
+            if len(chunk) == chunk_size:
+                copied += len(model._base_manager.using(target).bulk_create(chunk))
+                chunk = []
+        if chunk:
+            copied += len(model._base_manager.using(target).bulk_create(chunk))
+
+        expected = self._rows(model, source, organization).count()
+        if copied != expected:
+            raise CommandError(
+                _("%s: %d lignes copiées sur %d, déplacement annulé") % (model._meta.db_table, copied, expected)
+            )
+        return copied
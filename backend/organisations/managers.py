@@ -0,0 +1,21 @@
+from safedelete.managers import SafeDeleteManager
+
+from organisations.context import get_current_organization
+
+
+class TenantSafeDeleteManager(SafeDeleteManager):
+    """
+    Manager multi-tenant: restreint toujours les requêtes à l'organisation
+    courante (`request.current_organization`, voir CurrentOrganizationMiddleware).
+    Sans organisation courante (commandes, tâches, routes publiques), aucun
+    filtre n'est appliqué. `all_objects` reste non filtré.
+    """
+
+    tenant_field = "organization"
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        organization = get_current_organization()
+        if organization:
+            queryset = queryset.filter(**{self.tenant_field: organization})
+        return queryset
@@ -1,6 +1,9 @@
 from django.http import HttpRequest
 from typing import Optional
 from organisations.base import NullOrganization
+from organisations.context import (
+    reset_current_organization, set_current_organization
+)
 from organisations.services import OrganizationService
 from organisations.constants import (
     ORGANIZATION_HEADER_KEY, ORGANIZATION_QUERY_KEY
@@ -23,12 +26,17 @@ class CurrentOrganizationMiddleware:
 
     def __call__(self, request: HttpRequest):
         # Définir current_organization sur la requête
-        
-        response = self.get_response(request)
+        token = set_current_organization(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_current_organization(token)
         return response
 
     def process_view(self, request, view_func, view_args, view_kwargs):
         request.current_organization = self._get_current_organization(request)
+        # Les managers multi-tenant filtrent sur cette organisation
+        set_current_organization(request.current_organization)
         return None
     
     def _get_current_organization(self, request: HttpRequest):
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:12
+
+import utils_mixins.uuids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0002_remove_organization_website'),
+    ]
+
+    # The default is computed in Python: nothing changes in the database and
+    # existing rows keep their ids (no table rebuild on SQLite).
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='organization',
+                    name='id',
+                    field=models.UUIDField(default=utils_mixins.uuids.default_uuid, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='organizationinvitation',
+                    name='id',
+                    field=models.UUIDField(default=utils_mixins.uuids.default_uuid, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False),
+                ),
+                migrations.AlterField(
+                    model_name='organizationuser',
+                    name='id',
+                    field=models.UUIDField(default=utils_mixins.uuids.default_uuid, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False),
+                ),
+            ],
+        ),
+    ]
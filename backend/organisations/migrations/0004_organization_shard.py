@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0003_alter_organization_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='shard',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Base (DATABASE_SHARDS) des lots et passeports, la base par défaut si vide', max_length=50, verbose_name='base de données'),
+        ),
+    ]
@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from safedelete.models import SafeDeleteModel
 from safedelete.models import SOFT_DELETE_CASCADE
 from auditlog.registry import auditlog
+from utils_mixins.soft_delete import BulkCascadeMixin
 from utils_mixins.models import (
     UUIDPrimaryKeyMixin,
     ActiveMixin
@@ -20,7 +21,7 @@ from organisations.enums import  TimeZoneEnum
 
 
 
-class Organization(AbstractOrganization, SafeDeleteModel, UUIDPrimaryKeyMixin):
+class Organization(BulkCascadeMixin, AbstractOrganization, SafeDeleteModel, UUIDPrimaryKeyMixin):
     """Core organization model"""
     _safedelete_policy = SOFT_DELETE_CASCADE
 
@@ -69,6 +70,14 @@ class Organization(AbstractOrganization, SafeDeleteModel, UUIDPrimaryKeyMixin):
             (TimeZoneEnum.NAIROBI.value, _('Nairobi (GMT + 3)')),
         )
     )
+    shard = models.CharField(
+        _('base de données'),
+        max_length=50,
+        blank=True,
+        default='',
+        editable=False,
+        help_text=_('Base (DATABASE_SHARDS) des lots et passeports, la base par défaut si vide')
+    )
     
     class Meta:
         verbose_name = _('Organisation')
@@ -123,7 +132,7 @@ class Organization(AbstractOrganization, SafeDeleteModel, UUIDPrimaryKeyMixin):
         return super().save(keep_deleted, **kwargs)
 
 
-class OrganizationUser(AbstractOrganizationUser, SafeDeleteModel, UUIDPrimaryKeyMixin, ActiveMixin):
+class OrganizationUser(BulkCascadeMixin, AbstractOrganizationUser, SafeDeleteModel, UUIDPrimaryKeyMixin, ActiveMixin):
     """Links a user to the organization"""
     _safedelete_policy = SOFT_DELETE_CASCADE
     
@@ -0,0 +1,129 @@
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import QuerySet
+
+from organisations.caches import get_organization
+from organisations.context import get_current_organization
+from organisations.models import Organization
+from utils_mixins.sharding import ShardedResults, forced_shard, is_sharded, scatter, shard_aliases
+
+
+# Sharding
+# Les lots et passeports d'une organisation vivent sur sa base
+# (`Organization.shard`, la base par défaut si vide). Les organisations,
+# utilisateurs et autres tables restent sur la base par défaut.
+
+def shard_for(organization) -> str:
+    """Database alias holding the sharded data of `organization`."""
+    alias = getattr(organization, "shard", "") or DEFAULT_DB_ALIAS
+    if alias not in shard_aliases():
+        raise ImproperlyConfigured(
+            f"Organization {organization.slug} is on {alias}, which is not in DATABASE_SHARDS"
+        )
+    return alias
+
+
+def organization_shard(**kwargs) -> str:
+    """Shard of the organization matching `kwargs` (pk or slug), default when unknown."""
+    organization = get_organization(**kwargs)
+    return shard_for(organization) if organization else DEFAULT_DB_ALIAS
+
+
+def current_shard() -> Optional[str]:
+    """Shard of the current request (forced shard, else current organization)."""
+    alias = forced_shard()
+    if alias is None:
+        organization = get_current_organization()
+        if organization:
+            alias = shard_for(organization)
+    return alias
+
+
+def is_sharded_model(model) -> bool:
+    return model._meta.label_lower in settings.SHARDED_MODELS
+
+
+def organization_queryset(queryset: QuerySet, organization_id: Optional[str]) -> QuerySet:
+    """`queryset` (a sharded model) restricted to the organization `organization_id` (slug), on its shard."""
+    if not organization_id:
+        return queryset
+    organization = get_organization(slug=organization_id)
+    if organization is None:
+        return queryset.none()
+    # Filtered on the key: the organizations table is not on the shards.
+    queryset = queryset.filter(organization_id=organization.pk)
+    alias = shard_for(organization)
+    if alias != (current_shard() or DEFAULT_DB_ALIAS):
+        queryset = queryset.using(alias)
+    return queryset
+
+
+def _spans_shards(organization_id: Optional[str]) -> bool:
+    return not organization_id and current_shard() is None and is_sharded()
+
+
+def organization_results(queryset: QuerySet, organization_id: Optional[str] = None):
+    """
+    Ordered `queryset` restricted to the organization `organization_id`;
+    without organization and outside of a tenant request, the rows of every
+    shard merged (ShardedResults).
+    """
+    if _spans_shards(organization_id):
+        return ShardedResults(queryset)
+    return organization_queryset(queryset, organization_id)
+
+
+def organization_gather(queryset: QuerySet, func: Callable, organization_id: Optional[str] = None) -> list:
+    """
+    `func` applied to `queryset` restricted to the organization
+    `organization_id`, or to each shard it spans (e.g. partial aggregates
+    to add up). Returns the list of results.
+    """
+    if _spans_shards(organization_id):
+        return scatter(queryset, func)
+    return [func(organization_queryset(queryset, organization_id))]
+
+
+class ShardRouter:
+    """
+    Places the models listed in SHARDED_MODELS on the shard of their
+    organization: the database of the instance at hand (or of its
+    organization), else the shard forced with `use_shard`, else the one of
+    the current organization (CurrentOrganizationMiddleware). The default
+    database is left to the next routers (replicas).
+    """
+
+    def _shard(self, model, hints) -> Optional[str]:
+        if not is_sharded_model(model):
+            return None
+        alias = forced_shard()
+        instance = hints.get("instance")
+        if alias is None and isinstance(instance, Organization):
+            alias = shard_for(instance)
+        elif alias is None and instance is not None and is_sharded_model(type(instance)):
+            if instance._state.db:
+                alias = instance._state.db
+            elif getattr(instance, "organization_id", None):
+                alias = organization_shard(pk=instance.organization_id)
+        if alias is None:
+            alias = current_shard()
+        return alias if alias != DEFAULT_DB_ALIAS else None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Sharded rows point to organizations (and users) of the default database.
+        if is_sharded_model(type(obj1)) or is_sharded_model(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every shard has the whole schema.
+        return None
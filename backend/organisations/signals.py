@@ -0,0 +1,33 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from organisations.models import Organization, OrganizationUser
+from organisations.caches import (
+    invalidate_organization,
+    invalidate_organization_user,
+    invalidate_organizations,
+    invalidate_organization_users,
+)
+from utils_mixins.soft_delete import bulk_soft_deleted
+
+
+
+@receiver(post_save, sender=Organization)
+@receiver(post_delete, sender=Organization)
+def organization_changed(sender, instance, **kwargs):
+    invalidate_organization(instance)
+
+
+@receiver(post_save, sender=OrganizationUser)
+@receiver(post_delete, sender=OrganizationUser)
+def organization_user_changed(sender, instance, **kwargs):
+    invalidate_organization_user(instance)
+
+
+@receiver(bulk_soft_deleted, sender=Organization)
+def organizations_soft_deleted(sender, using, lookup, **kwargs):
+    invalidate_organizations(Organization._base_manager.using(using).filter(**lookup))
+
+
+@receiver(bulk_soft_deleted, sender=OrganizationUser)
+def organization_users_soft_deleted(sender, using, lookup, **kwargs):
+    invalidate_organization_users(OrganizationUser._base_manager.using(using).filter(**lookup))
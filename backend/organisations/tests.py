@@ -1,3 +1,152 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from organisations.caches import get_organization, get_organization_user, invalidate_organizations
+from organisations.context import reset_current_organization, set_current_organization
+from organisations.models import Organization, OrganizationUser
+from organisations.sharding import ShardRouter, shard_for
+from passport.enums import PassportStatus
+from passport.imports import load_import
+from passport.models import Batch, Passport, PassportImport, PassportImportError, PassportImportRow
+from utils_mixins.sharding import use_shard
+
+
+LOCMEM_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"tests-{alias}"}
+    for alias in ("default", "search")
+}
+
+
+def manifest_row(i: int, **values) -> dict:
+    return {
+        "code": f"PA{i:05d}", "coupon_id": f"CP{i:05d}",
+        "first_name": "Jean", "last_name": "Mbala", "gender": "M", **values,
+    }
+
+
+@skipUnless(len(settings.DATABASE_SHARDS) > 1, "set DATABASE_SHARD_URLS (e.g. a second SQLite file)")
+class MoveOrganizationShardTests(TestCase):
+    """`manage.py move_organization_shard` between the default database and a shard."""
+
+    databases = set(settings.DATABASE_SHARDS)
+
+    def setUp(self):
+        self.target = settings.DATABASE_SHARDS[1]
+        self.organization = Organization.objects.create(name="Consulat", slug="consulat")
+        self.batch = Batch.objects.create(organization=self.organization)
+        Passport.objects.create(
+            batch=self.batch, code="P1", coupon_id="C1", first_name="Jean", last_name="Mbala",
+            gender="M", status=PassportStatus.DRAFT,
+        )
+        load_import(self.batch, [manifest_row(1), manifest_row(2, code="")])
+
+    def test_every_table_of_the_organization_moves(self):
+        tables = (Batch, Passport, PassportImport, PassportImportRow, PassportImportError)
+        before = {model: model._base_manager.using("default").count() for model in tables}
+        self.assertEqual(before[PassportImportRow], 2)
+        self.assertEqual(before[PassportImportError], 1)
+
+        call_command("move_organization_shard", "consulat", self.target, stdout=StringIO())
+
+        for model in tables:
+            self.assertEqual(model._base_manager.using("default").count(), 0, model)
+            self.assertEqual(model._base_manager.using(self.target).count(), before[model], model)
+        self.organization.refresh_from_db()
+        self.assertEqual(self.organization.shard, self.target)
+        self.assertEqual(Passport._base_manager.using(self.target).get().batch_id, self.batch.pk)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OrganizationCacheTests(TestCase):
+    """Cached lookups of organizations, invalidated per organization."""
+
+    # Soft deletes cascade on every shard.
+    databases = set(settings.DATABASE_SHARDS)
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.consulat = Organization.objects.create(name="Consulat", slug="consulat")
+        self.ambassade = Organization.objects.create(name="Ambassade", slug="ambassade")
+
+    def lookup(self, queries, **kwargs):
+        with self.assertNumQueries(queries):
+            return get_organization(**kwargs)
+
+    def test_saving_an_organization_keeps_the_others_cached(self):
+        self.lookup(1, slug="consulat")
+        self.lookup(1, slug="ambassade")
+        self.lookup(1, pk=self.ambassade.pk)
+
+        self.consulat.name = "Consulat général"
+        self.consulat.save()
+        self.assertEqual(self.lookup(1, slug="consulat").name, "Consulat général")
+        self.lookup(0, slug="ambassade")
+        self.lookup(0, pk=self.ambassade.pk)
+
+    def test_misses_are_invalidated_by_the_slug(self):
+        self.assertIsNone(self.lookup(1, slug="mission"))
+        self.lookup(0, slug="mission")
+        Organization.objects.create(name="Mission", slug="mission")
+        self.assertEqual(self.lookup(1, slug="mission").slug, "mission")
+
+    def test_bulk_updates_invalidate_the_matched_organizations(self):
+        self.lookup(1, pk=self.consulat.pk)
+        self.lookup(1, pk=self.ambassade.pk)
+        queryset = Organization.objects.filter(pk=self.consulat.pk)
+        queryset.update(name="Consulat général")
+        invalidate_organizations(queryset)
+        self.assertEqual(self.lookup(1, pk=self.consulat.pk).name, "Consulat général")
+        self.lookup(0, pk=self.ambassade.pk)
+
+    def test_memberships_are_invalidated_per_user(self):
+        users = [get_user_model().objects.create_user(email=f"{name}@mae.cd", password="x") for name in ("a", "b")]
+        memberships = [OrganizationUser.objects.create(organization=self.consulat, user=user) for user in users]
+        for user in users:
+            with self.assertNumQueries(1):
+                get_organization_user(organization=self.consulat, user=user)
+        memberships[0].delete()
+        with self.assertNumQueries(1):
+            get_organization_user(organization=self.consulat, user=users[0])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_organization_user(organization=self.consulat, user=users[1]), memberships[1])
+
+
+@override_settings(DATABASE_SHARDS=["default", "shard_1"])
+class ShardRouterTests(SimpleTestCase):
+    """Database of the sharded models, chosen without querying."""
+
+    def setUp(self):
+        self.router = ShardRouter()
+        self.sharded = Organization(name="Consulat", slug="consulat", shard="shard_1")
+
+    def test_instances_stay_on_their_database(self):
+        passport = Passport(organization_id=self.sharded.pk)
+        passport._state.db = "shard_1"
+        self.assertEqual(self.router.db_for_write(Passport, instance=passport), "shard_1")
+        self.assertEqual(self.router.db_for_read(Batch, instance=self.sharded), "shard_1")
+        self.assertIsNone(self.router.db_for_read(Organization, instance=self.sharded))
+
+    def test_current_organization_and_forced_shard(self):
+        self.assertIsNone(self.router.db_for_read(Passport))
+        token = set_current_organization(self.sharded)
+        try:
+            self.assertEqual(self.router.db_for_read(Passport), "shard_1")
+            with use_shard("default"):
+                self.assertIsNone(self.router.db_for_read(Passport))
+        finally:
+            reset_current_organization(token)
+
+    def test_unknown_shards_are_refused(self):
+        with self.assertRaises(ValueError):
+            with use_shard("shard_2"):
+                pass
+        with self.assertRaises(ImproperlyConfigured):
+            shard_for(Organization(slug="mission", shard="shard_2"))
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PassportConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "passport"
+
+    def ready(self):
+        from passport import signals  # noqa: F401
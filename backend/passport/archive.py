@@ -0,0 +1,141 @@
+import logging
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from passport.caches import bump_passport_data_version, purge_public_passports
+from passport.enums import PassportStatus
+from passport.models import ArchivedPassport, Batch, Passport, PassportRecord
+from utils_mixins.sharding import shard_aliases
+
+
+logger = logging.getLogger(__name__)
+
+
+# Archivage
+# Les passeports retirés, perdus ou anciens ne sont presque plus lus: ils
+# quittent `passport_passport` (et ses index) pour `passport_archivedpassport`,
+# partitionnée par année sur Postgres. La vue `passport_passportrecord`
+# (PassportRecord) réunit les deux tables pour les recherches à la demande.
+
+def _option(name: str):
+    return settings.PASSPORT_ARCHIVE[name]
+
+
+def snapshot_fields() -> list:
+    """Columns shared by live and archived passports."""
+    return [field.attname for field in PassportRecord._meta.concrete_fields if field.name != "archived"]
+
+
+def archivable(now=None) -> Q:
+    """Taken or lost passports untouched for `grace_days`, passports published `published_days` ago."""
+    now = now or timezone.now()
+    return (
+        Q(
+            status__in=[PassportStatus.TAKEN, PassportStatus.LOST],
+            updated_at__lt=now - timedelta(days=_option("grace_days")),
+        )
+        | Q(published_at__lt=now - timedelta(days=_option("published_days")))
+    )
+
+
+def archivable_passports(now=None) -> QuerySet[Passport]:
+    """Passports due for the archive, soft-deleted ones included."""
+    return Passport.all_objects.filter(archivable(now))
+
+
+def published_year(passport: Passport) -> int:
+    return (passport.published_at or passport.created_at).year
+
+
+def ensure_partitions(alias: str, years: Iterable[int]) -> None:
+    """Create the yearly partitions of the archive missing on `alias` (Postgres only)."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return
+    quote = connection.ops.quote_name
+    table = ArchivedPassport._meta.db_table
+    with connection.cursor() as cursor:
+        for year in sorted(set(years)):
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(f'{table}_{year}')} "
+                f"PARTITION OF {quote(table)} FOR VALUES FROM ({year}) TO ({year + 1})"
+            )
+
+
+def _archive_chunk(alias: str, passports: list) -> None:
+    fields = snapshot_fields()
+    archived_at = timezone.now()
+    ensure_partitions(alias, {published_year(passport) for passport in passports})
+    ArchivedPassport.all_objects.using(alias).bulk_create([
+        ArchivedPassport(
+            **{name: getattr(passport, name) for name in fields},
+            archived_at=archived_at,
+            published_year=published_year(passport),
+        )
+        for passport in passports
+    ])
+    # Moved, not deleted: no delete signals (nor soft delete).
+    Passport._base_manager.using(alias).filter(pk__in=[p.pk for p in passports])._raw_delete(alias)
+
+    batches = list(Batch._base_manager.using(alias).filter(pk__in={p.batch_id for p in passports}))
+    for batch in batches:
+        bump_passport_data_version(batch)
+    purge_public_passports(*batches)
+
+
+def archive_passports(queryset: Optional[QuerySet] = None, chunk_size: int = 1000) -> int:
+    """
+    Move `queryset` (by default `archivable_passports()`) to the archive,
+    on every shard, `chunk_size` passports per transaction.
+    Returns the number of passports archived.
+    """
+    queryset = archivable_passports() if queryset is None else queryset
+    total = 0
+    for alias in shard_aliases():
+        archived = 0
+        while True:
+            with transaction.atomic(using=alias):
+                passports = list(
+                    queryset.using(alias).select_for_update(skip_locked=True).order_by("pk")[:chunk_size]
+                )
+                if passports:
+                    _archive_chunk(alias, passports)
+            archived += len(passports)
+            if len(passports) < chunk_size:
+                break
+        logger.info("Archived %d passports on %s", archived, alias)
+        total += archived
+    return total
+
+
+# Vue PassportRecord
+# Recréée après chaque `migrate` (et supprimée avant): SQLite reconstruit
+# les tables modifiées, ce qu'une vue qui les référence empêcherait.
+
+def drop_record_view(using: str = DEFAULT_DB_ALIAS) -> None:
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP VIEW IF EXISTS {connection.ops.quote_name(PassportRecord._meta.db_table)}")
+
+
+def create_record_view(using: str = DEFAULT_DB_ALIAS) -> None:
+    """(Re)create the view of PassportRecord, once both tables exist."""
+    connection = connections[using]
+    tables = set(connection.introspection.table_names())
+    if not {Passport._meta.db_table, ArchivedPassport._meta.db_table} <= tables:
+        return
+    quote = connection.ops.quote_name
+    columns = ", ".join(quote(name) for name in snapshot_fields())
+    drop_record_view(using)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIEW {quote(PassportRecord._meta.db_table)} AS"
+            f" SELECT {columns}, FALSE AS archived FROM {quote(Passport._meta.db_table)}"
+            f" UNION ALL"
+            f" SELECT {columns}, TRUE AS archived FROM {quote(ArchivedPassport._meta.db_table)}"
+        )
@@ -0,0 +1,88 @@
+from typing import Iterable, Optional
+from django.db import transaction
+from passport.models import Batch
+from utils_mixins.caches import bump_data_version
+from utils_mixins.response_cache import purge_surrogate_keys
+
+
+# Surrogate keys
+# Les réponses publiques mises en cache sont étiquetées par organisation et
+# par lot, et purgées précisément quand une écriture touche ces clés.
+
+ALL_PASSPORTS_KEY = "passports:all"
+
+
+def organization_surrogate_key(slug) -> str:
+    return f"passports:organization:{slug}"
+
+
+def batch_surrogate_key(batch_id) -> str:
+    return f"passports:batch:{batch_id}"
+
+
+def public_lookup_surrogate_keys(organization_id: Optional[str], batch_ids: Iterable) -> list:
+    """Surrogate keys of a public lookup response."""
+    if not organization_id:
+        keys = [ALL_PASSPORTS_KEY]
+    else:
+        keys = [organization_surrogate_key(organization_id)]
+    return keys + [batch_surrogate_key(batch_id) for batch_id in batch_ids]
+
+
+def counts_surrogate_key(slug=None) -> str:
+    return f"passports:counts:{slug or 'all'}"
+
+
+def public_counts_surrogate_keys(organization_id: Optional[str]) -> list:
+    """Surrogate keys of a public counts response."""
+    return [counts_surrogate_key(organization_id)]
+
+
+def purge_public_passports(*batches: Batch, counts_only: bool = False) -> None:
+    """
+    Purge the cached public responses showing passports of `batches`,
+    once the current transaction (on their shard) is committed.
+    With `counts_only`, only the per-status counts are purged (e.g. a draft
+    was created: no published passport changed).
+    """
+    keys = {counts_surrogate_key()}
+    if not counts_only:
+        keys.add(ALL_PASSPORTS_KEY)
+    for batch in batches:
+        if batch.organization_id:
+            keys.add(counts_surrogate_key(batch.organization.slug))
+        if counts_only:
+            continue
+        keys.add(batch_surrogate_key(batch.pk))
+        if batch.organization_id:
+            keys.add(organization_surrogate_key(batch.organization.slug))
+    using = batches[0]._state.db if batches else None
+    transaction.on_commit(lambda: purge_surrogate_keys(*keys), using=using)
+
+
+# Data versions
+# Chaque écriture sur un passeport ou un lot incrémente la version des
+# données de son organisation: les résultats de recherche mis en cache sous
+# l'ancienne version ne sont plus jamais lus.
+
+ALL_PASSPORTS_VERSION = "passports:all"
+
+
+def organization_data_version(slug) -> str:
+    return f"passports:organization:{slug}"
+
+
+def search_data_versions(organization_id: Optional[str]) -> list:
+    """Data versions a search scoped to `organization_id` (slug) depends on."""
+    if not organization_id:
+        return [ALL_PASSPORTS_VERSION]
+    return [organization_data_version(organization_id)]
+
+
+def bump_passport_data_version(batch: Optional[Batch]) -> None:
+    """Bump, once the current transaction (on its shard) is committed, the data versions `batch` belongs to."""
+    namespaces = [ALL_PASSPORTS_VERSION]
+    if batch is not None and batch.organization_id:
+        namespaces.append(organization_data_version(batch.organization.slug))
+    using = batch._state.db if batch is not None else None
+    transaction.on_commit(lambda: bump_data_version(*namespaces), using=using)
@@ -1,3 +1,5 @@
 from .base_controller import *
 from .passport import * 
-
+from .public import *
+from .dashboard import *
+from .imports import *
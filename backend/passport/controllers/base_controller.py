@@ -9,11 +9,24 @@ from ninja_extra.pagination import (
     PageNumberPaginationExtra, 
     PaginatedResponseSchema
 )
+from django.core.paginator import Page
 from django.http import HttpRequest
 from typing import Type, Any
 from ninja.errors import HttpError
 
 
+class FacetedPageNumberPagination(PageNumberPaginationExtra):
+    """
+    PageNumberPaginationExtra also returning the `facets` attribute of the
+    paginated results, when set (see PassportService.cached_search_and_filter_passports).
+    """
+
+    def get_paginated_response(self, *, base_url: str, page: Page):
+        response = super().get_paginated_response(base_url=base_url, page=page)
+        response["facets"] = getattr(page.paginator.object_list, "facets", None)
+        return response
+
+
 class BasePassportController(ControllerBase):
     """
     Generic controller for models like Passport and Batch.
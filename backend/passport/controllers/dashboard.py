@@ -0,0 +1,32 @@
+from django.http import HttpRequest
+from ninja import Query
+from ninja_extra import (
+    ControllerBase,
+    api_controller,
+    http_get,
+)
+from ninja_extra.permissions import IsAuthenticated
+from organisations.permissions import IsOrganizationMember
+from passport.services import DashboardService
+from passport.schemas import PassportDashboardSchema
+
+
+
+@api_controller(
+    "/dashboard",
+    tags=["Dashboard"],
+    permissions=[IsAuthenticated & IsOrganizationMember()]
+)
+class DashboardController(ControllerBase):
+    """
+    Dashboard of the current organization (`organization_id` parameter or
+    X-Organization-ID header), served from pre-aggregated tables.
+    """
+
+    def __init__(self, dashboard_serv: DashboardService):
+        self.service = dashboard_serv
+
+
+    @http_get("/passports", response=PassportDashboardSchema)
+    def passports(self, request: HttpRequest, days: int = Query(30, gt=0, le=366)):
+        return self.service.dashboard(request.current_organization, days)
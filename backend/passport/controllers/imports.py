@@ -0,0 +1,90 @@
+import json
+from uuid import UUID
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpRequest, StreamingHttpResponse
+from ninja_extra import (
+    ControllerBase,
+    api_controller,
+    http_get,
+    http_post,
+)
+from ninja_extra.pagination import (
+    paginate,
+    PageNumberPaginationExtra,
+    PaginatedResponseSchema,
+)
+from ninja_extra.permissions import IsAuthenticated
+from organisations.permissions import IsOrganizationMember
+from passport.ingest import job_summary
+from passport.services import PassportImportService
+from passport.schemas import (
+    PassportImportCreateSchema,
+    PassportImportErrorSchema,
+    PassportImportSchema,
+)
+
+
+
+@api_controller(
+    "/imports",
+    tags=["Imports"],
+    permissions=[IsAuthenticated & IsOrganizationMember()]
+)
+class PassportImportController(ControllerBase):
+    """
+    Passport imports of the current organization: rows loaded and checked
+    in a staging table, errors paged, valid rows promoted at once.
+    """
+
+    def __init__(self, import_serv: PassportImportService):
+        self.service = import_serv
+
+
+    @http_post("", response=PassportImportSchema)
+    def create_import(self, request: HttpRequest, data: PassportImportCreateSchema):
+        return self.service.create(data.batch_id, [row.dict() for row in data.passports])
+
+
+    @http_post("/ingest")
+    def ingest(self, request: HttpRequest, batch_id: UUID, check_duplicates: bool = False):
+        """
+        Upsert the passports of the request body into the batch as it is
+        received: NDJSON (one object per line) or CSV with a header line
+        (Content-Type text/csv). The response streams NDJSON: the job first,
+        then the result of each row, then the job counters.
+        """
+        # The body is read line by line, never as a whole (request.body).
+        job, results = self.service.ingest(
+            batch_id, iter(request), request.content_type, check_duplicates=check_duplicates
+        )
+
+        def lines():
+            yield json.dumps({"job": job_summary(job)}) + "\n"
+            try:
+                for result in results:
+                    yield json.dumps(result, cls=DjangoJSONEncoder) + "\n"
+            finally:
+                # Client gone: the job is closed (interrupted) at once.
+                results.close()
+            yield json.dumps({"job": job_summary(job)}) + "\n"
+
+        response = StreamingHttpResponse(lines(), content_type="application/x-ndjson")
+        response["X-Job-ID"] = str(job.pk)
+        return response
+
+
+    @http_get("/{import_id}", response=PassportImportSchema)
+    def get_import(self, request: HttpRequest, import_id: UUID):
+        return self.service.get(import_id)
+
+
+    @http_get("/{import_id}/errors", response=PaginatedResponseSchema[PassportImportErrorSchema])
+    @paginate(PageNumberPaginationExtra, page_size=100)
+    def list_errors(self, request: HttpRequest, import_id: UUID):
+        return self.service.errors(import_id)
+
+
+    @http_post("/{import_id}/promote", response=PassportImportSchema)
+    def promote_import(self, request: HttpRequest, import_id: UUID):
+        return self.service.promote(import_id)
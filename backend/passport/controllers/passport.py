@@ -1,10 +1,17 @@
+from uuid import UUID
+from django.http import HttpRequest
+from ninja import Query
+from ninja.errors import HttpError
 from ninja_extra import (
     api_controller,
+    http_get,
     http_post,
     http_put,
 )
+from ninja_extra.pagination import paginate, PageNumberPaginationExtra, PaginatedResponseSchema
 from ninja_extra.permissions import IsAuthenticated
-from .base_controller import BasePassportController
+from organisations.permissions import IsOrganizationMember
+from .base_controller import BasePassportController, FacetedPageNumberPagination
 from passport.services import (
     PassportService,
     BatchService,
@@ -14,10 +21,15 @@ from passport.schemas import (
     PassportCreateSchema,
     PassportUpdateSchema,
     PassportFilterSchema,
+    PassportPageSchema,
+    PassportTransitionSchema,
+    PassportTransitionResultSchema,
     BatchDetailsSchema,
     BatchCreateSchema,
     BatchUpdateSchema,
     BatchFilterSchema,
+    PassportManifestSchema,
+    PassportManifestResultSchema,
 )
 
 
@@ -36,7 +48,14 @@ class PassportController(BasePassportController):
         self.update_schema = PassportUpdateSchema
         self.filter_schema = PassportFilterSchema
         self.details_schema = PassportDetailsSchema
-        self.filter_method = "search_and_filter_passports"
+        self.filter_method = "cached_search_and_filter_passports"
+
+
+    # LIST / FILTER, with facets
+    @http_get("", response=PassportPageSchema)
+    @paginate(FacetedPageNumberPagination, page_size=20)
+    def list_items(self, request: HttpRequest, filters: PassportFilterSchema = Query(...)):
+        return self.service.cached_search_and_filter_passports(**filters.dict(exclude_unset=True))
 
 
     @http_post("", response=PassportDetailsSchema)
@@ -44,6 +63,16 @@ class PassportController(BasePassportController):
         return self.service.create(**data.dict())
 
 
+    @http_post(
+        "/status/bulk",
+        response=PassportTransitionResultSchema,
+        permissions=[IsAuthenticated & IsOrganizationMember()],
+    )
+    def transition_items(self, request, data: PassportTransitionSchema):
+        filters = data.filters.dict(exclude_unset=True) if data.filters else None
+        return self.service.transition(data.status, ids=data.ids, codes=data.codes, filters=filters)
+
+
     @http_put("/{item_id}", response=PassportDetailsSchema)
     def update_item(self, request, item_id: int, data: PassportUpdateSchema):
         return self.service.update(item_id, **data.dict(exclude_unset=True))
@@ -67,6 +96,23 @@ class BatchController(BasePassportController):
         self.filter_method = "search_and_filter_batches"
 
 
+    # LIST / FILTER
+    @http_get("", response=PaginatedResponseSchema[BatchDetailsSchema])
+    @paginate(PageNumberPaginationExtra, page_size=20)
+    def list_items(self, request: HttpRequest, filters: BatchFilterSchema = Query(...)):
+        batches = self.service.search_and_filter_batches(**filters.dict(exclude_unset=True))
+        return batches.order_by("-received_date", "-created_at")
+
+
+    # RETRIEVE
+    @http_get("/{item_id}", response=BatchDetailsSchema)
+    def get_item(self, request: HttpRequest, item_id: UUID):
+        batch = self.service.get(item_id)
+        if not batch:
+            raise HttpError(404, "Item not found")
+        return batch
+
+
     @http_post("", response=BatchDetailsSchema)
     def create_item(self, request, data: BatchCreateSchema):
         return self.service.create(**data.dict())
@@ -75,3 +121,19 @@ class BatchController(BasePassportController):
     @http_put("/{item_id}", response=BatchDetailsSchema)
     def update_item(self, request, item_id: int, data: BatchUpdateSchema):
         return self.service.update(item_id, **data.dict(exclude_unset=True))
+
+
+    @http_put(
+        "/{item_id}/passports",
+        response=PassportManifestResultSchema,
+        permissions=[IsAuthenticated & IsOrganizationMember()],
+    )
+    def upsert_passports(
+        self, request, item_id: UUID, data: PassportManifestSchema, check_duplicates: bool = False
+    ):
+        result = self.service.upsert_passports(
+            item_id, [row.dict() for row in data.passports], check_duplicates=check_duplicates
+        )
+        if result is None:
+            raise HttpError(404, "Item not found")
+        return result
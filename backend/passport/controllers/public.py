@@ -0,0 +1,91 @@
+from typing import Optional
+from django.conf import settings
+from django.http import Http404, HttpRequest
+from ninja import Query
+from ninja_extra import (
+    ControllerBase,
+    api_controller,
+    http_get,
+)
+from ninja_extra.pagination import PaginatedResponseSchema
+from ninja_extra.permissions import BasePermission
+from ninja_extra.urls import remove_query_param, replace_query_param
+from passport.services import PassportService
+from passport.caches import public_counts_surrogate_keys, public_lookup_surrogate_keys
+from utils_mixins.response_cache import add_surrogate_keys
+from passport.schemas import PublicPassportCountsSchema, PublicPassportSchema
+
+
+
+class PublicApiEnabled(BasePermission):
+    """Anyone, once the public routes are enabled (PUBLIC_PASSPORT_API); 404 otherwise."""
+
+    def has_permission(self, request: HttpRequest, controller: ControllerBase) -> bool:
+        if not settings.PUBLIC_PASSPORT_API:
+            raise Http404
+        return True
+
+
+@api_controller(
+    "/public/passports",
+    tags=["Public"],
+    auth=None,
+    permissions=[PublicApiEnabled]
+)
+class PublicPassportController(ControllerBase):
+    """
+    Citizen-facing lookup of published passports. No authentication.
+    Responses are tagged with surrogate keys for the response cache.
+    """
+
+    def __init__(self, passport_serv: PassportService):
+        self.service = passport_serv
+
+
+    @http_get("/counts", response=PublicPassportCountsSchema)
+    def counts(self, request: HttpRequest, organization_id: Optional[str] = None):
+        add_surrogate_keys(
+            self.context.response,
+            *public_counts_surrogate_keys(organization_id),
+        )
+        return self.service.public_counts(organization_id)
+
+
+    @http_get("", response=PaginatedResponseSchema[PublicPassportSchema])
+    def lookup(
+        self,
+        request: HttpRequest,
+        organization_id: Optional[str] = None,
+        search: Optional[str] = None,
+        last_name_initial: Optional[str] = Query(None, max_length=1),
+        coupon_prefix: Optional[str] = None,
+        page: int = Query(1, gt=0),
+        page_size: int = Query(20, gt=0, le=100),
+    ):
+        data = self.service.public_lookup(
+            organization_id=organization_id,
+            search=search,
+            last_name_initial=last_name_initial,
+            coupon_prefix=coupon_prefix,
+            page=page,
+            page_size=page_size,
+        )
+
+        add_surrogate_keys(
+            self.context.response,
+            *public_lookup_surrogate_keys(organization_id, data["batch_ids"]),
+        )
+
+        url = request.build_absolute_uri()
+        previous = None
+        if page == 2:
+            previous = remove_query_param(url, "page")
+        elif page > 2:
+            previous = replace_query_param(url, "page", page - 1)
+
+        return {
+            "count": data["count"],
+            "next": replace_query_param(url, "page", page + 1) if data["has_next"] else None,
+            "previous": previous,
+            "results": data["results"],
+        }
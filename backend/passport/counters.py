@@ -0,0 +1,127 @@
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, QuerySet
+
+from passport.models import (
+    COUNTER_FIELDS,
+    STATUS_COUNTERS,
+    ArchivedPassport,
+    Batch,
+    Passport,
+    PassportDailyStats,
+)
+from utils_mixins.sharding import shard_aliases
+
+
+logger = logging.getLogger(__name__)
+
+
+# Compteurs par lot et statistiques journalières
+# `Batch.draft_count`, ..., `total_count` et `PassportDailyStats` suivent
+# chaque écriture de passeport: `Passport.save` (création, statut,
+# suppression logique), le signal `bulk_soft_deleted`, et
+# `update_passport_status` pour les mises à jour en masse. Les chemins en
+# masse doivent passer par ces fonctions; `reconcile_batch_counters` et
+# `backfill_passport_stats` corrigent les écarts.
+
+def passport_counts(queryset: QuerySet) -> Counter:
+    """Number of passports of `queryset` per (batch id, status)."""
+    counts = Counter()
+    for (batch_id, _, status), count in _grouped(queryset).items():
+        counts[(batch_id, status)] += count
+    return counts
+
+
+def _grouped(queryset: QuerySet) -> Counter:
+    rows = queryset.values_list("batch_id", "organization_id", "status").annotate(
+        count=Count("pk")
+    ).order_by()
+    return Counter({tuple(row[:3]): row[3] for row in rows})
+
+
+def count_passports(queryset: QuerySet, sign: int = 1) -> None:
+    """
+    Add (or remove, `sign` -1) the passports of `queryset` to the counters
+    of their batches, as undeleted (or deleted) in the daily stats.
+    """
+    deltas, events = Counter(), Counter()
+    for (batch_id, organization_id, status), count in _grouped(queryset).items():
+        deltas[(batch_id, status)] += sign * count
+        events[(organization_id, "deleted_count")] -= sign * count
+    Batch.count_passports(queryset.db, deltas)
+    PassportDailyStats.record(queryset.db, events)
+
+
+def update_passport_status(queryset: QuerySet, status: str, **values) -> int:
+    """
+    `queryset.update(status=status, **values)`, moving the passports
+    between the counters of their batches and recording the change in the
+    daily stats. Returns the number of rows updated.
+    """
+    with transaction.atomic(using=queryset.db):
+        # Lignes verrouillées avant le regroupement: une transition
+        # concurrente attend, sinon son statut précédent serait compté deux fois.
+        locked = queryset.filter(deleted__isnull=True).select_for_update().order_by("pk")
+        grouped = Counter(locked.values_list("batch_id", "organization_id", "status"))
+        updated = queryset.update(status=status, **values)
+        deltas, events = Counter(), Counter()
+        for (batch_id, organization_id, previous), count in grouped.items():
+            deltas[(batch_id, previous)] -= count
+            deltas[(batch_id, status)] += count
+            if previous != status:
+                events[(organization_id, STATUS_COUNTERS[status])] += count
+        Batch.count_passports(queryset.db, deltas)
+        PassportDailyStats.record(queryset.db, events)
+    return updated
+
+
+def expected_counters(alias: str, batch_ids: list) -> dict:
+    """Counters of the batches `batch_ids` recomputed from the passports (live and archived)."""
+    counts = Counter()
+    for model in (Passport, ArchivedPassport):
+        counts += passport_counts(
+            model._base_manager.using(alias).filter(batch_id__in=batch_ids, deleted__isnull=True)
+        )
+    expected = {batch_id: dict.fromkeys(COUNTER_FIELDS, 0) for batch_id in batch_ids}
+    for (batch_id, status), count in counts.items():
+        expected[batch_id][STATUS_COUNTERS[status]] += count
+        expected[batch_id]["total_count"] += count
+    return expected
+
+
+def reconcile_batch_counters(chunk_size: int = 500, dry_run: bool = False) -> int:
+    """
+    Recompute the counters of every batch (on each shard), `chunk_size`
+    batches per transaction, the batches locked meanwhile: concurrent
+    passport writes apply their delta once the correct value is stored.
+    Returns the number of batches whose counters were wrong.
+    """
+    fixed = 0
+    for alias in shard_aliases():
+        last = None
+        while True:
+            with transaction.atomic(using=alias):
+                batches = Batch._base_manager.using(alias).order_by("pk")
+                if last is not None:
+                    batches = batches.filter(pk__gt=last)
+                batches = list(batches.select_for_update().only("pk", *COUNTER_FIELDS)[:chunk_size])
+                if not batches:
+                    break
+                last = batches[-1].pk
+                expected = expected_counters(alias, [batch.pk for batch in batches])
+                wrong = []
+                for batch in batches:
+                    values = expected[batch.pk]
+                    if any(getattr(batch, field) != value for field, value in values.items()):
+                        for field, value in values.items():
+                            setattr(batch, field, value)
+                        wrong.append(batch)
+                if wrong and not dry_run:
+                    Batch._base_manager.using(alias).bulk_update(wrong, COUNTER_FIELDS)
+            fixed += len(wrong)
+            if len(batches) < chunk_size:
+                break
+        logger.info("Batch counters reconciled on %s", alias)
+    return fixed
@@ -0,0 +1,212 @@
+import logging
+from bisect import bisect, insort
+from collections import defaultdict
+from datetime import date
+from difflib import SequenceMatcher
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from django.db.models import Q
+
+from organisations.models import Organization
+from organisations.sharding import shard_for
+from passport.models import Passport
+from passport.names import normalize_name, swapped_name_keys
+
+
+logger = logging.getLogger(__name__)
+
+
+# Doublons
+# Les saisies depuis des listes papier créent des doublons à une faute
+# près. Plutôt que de comparer toutes les paires (O(n²)), les titulaires
+# sont regroupés par clés de blocage (nom normalisé + date du lot, clés
+# phonétiques des noms) et seules les paires d'un même bloc sont comparées.
+
+# Similarity from which two holders are reported
+DUPLICATE_THRESHOLD = 0.85
+
+# Blocks larger than this are compared within a sliding window (sorted by name)
+MAX_BLOCK = 200
+BLOCK_WINDOW = 20
+
+
+class Holder(NamedTuple):
+    """Passport holder as compared: `key` identifies it in the report (row index or code)."""
+    key: object
+    code: str
+    coupon_id: str
+    name: str
+    swapped: str
+    gender: str
+    day: Optional[date]
+
+
+def holder(key, code, coupon_id, first_name, middle_name, last_name, gender, day=None) -> Holder:
+    first, middle, last = (normalize_name(value) for value in (first_name, middle_name, last_name))
+    return Holder(
+        key=key,
+        code=code,
+        coupon_id=coupon_id,
+        name=" ".join(part for part in (first, middle, last) if part),
+        swapped=" ".join(part for part in (last, middle, first) if part),
+        gender=normalize_name(gender)[:1],
+        day=day,
+    )
+
+
+def blocking_keys(holder: Holder) -> list:
+    """Blocks of `holder`: surname and batch date, phonetic keys of the names (in any order)."""
+    phonetic, surname = swapped_name_keys(holder.swapped)
+    if not phonetic:
+        return []
+    keys = [("phonetic", phonetic)]
+    if holder.day:
+        keys.append(("surname", surname, holder.day))
+    return keys
+
+
+def similar(holder: Holder, others: Iterable[Holder], threshold: float) -> Iterator[tuple]:
+    """
+    (other, score) of the `others` whose names look like those of `holder`
+    (similarity from `threshold`, first and last names possibly swapped),
+    of the same gender.
+    """
+    # Prepared once for `holder`, then compared with each other name.
+    matcher = SequenceMatcher(None, autojunk=False)
+    matcher.set_seq2(holder.name)
+    size = len(holder.name)
+    for other in others:
+        if holder.gender and other.gender and holder.gender != other.gender:
+            continue
+        if holder.name == other.name:
+            yield other, 1.0
+            continue
+        # Upper bounds first: most pairs of a block are far apart.
+        if 2 * min(size, len(other.name)) < threshold * (size + len(other.name)):
+            continue
+        score = 0.0
+        for name in (other.name, other.swapped):
+            matcher.set_seq1(name)
+            if matcher.quick_ratio() >= threshold:
+                score = max(score, matcher.ratio())
+        if score >= threshold:
+            yield other, round(score, 3)
+
+
+def _by_name(holder: Holder) -> str:
+    return holder.name
+
+
+def _pairs(block: list) -> Iterator[tuple]:
+    """(holder, following holders) of a block, the window of them in a large block."""
+    if len(block) > MAX_BLOCK:
+        block = sorted(block, key=_by_name)
+        for i, holder in enumerate(block):
+            yield holder, block[i + 1:i + 1 + BLOCK_WINDOW]
+        return
+    for i, holder in enumerate(block):
+        yield holder, block[i + 1:]
+
+
+class DuplicateIndex:
+    """
+    Holders grouped by blocking key (each block sorted by name). `add`
+    returns the likely duplicates of a holder among those already added.
+    """
+
+    def __init__(self, threshold: float = DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.blocks = defaultdict(list)
+
+
+    def insert(self, holder: Holder) -> None:
+        for key in blocking_keys(holder):
+            insort(self.blocks[key], holder, key=_by_name)
+
+
+    def candidates(self, holder: Holder) -> dict:
+        found = {}
+        for key in blocking_keys(holder):
+            block = self.blocks.get(key, ())
+            if len(block) > MAX_BLOCK:
+                # Large block: the neighbours by name only.
+                position = bisect(block, holder.name, key=_by_name)
+                block = block[max(0, position - BLOCK_WINDOW):position + BLOCK_WINDOW]
+            for other in block:
+                found.setdefault(other.key, other)
+        return found
+
+
+    def add(self, holder: Holder) -> list:
+        """Add `holder`, returning [(other holder, score)] of its likely duplicates."""
+        others = [
+            other for other in self.candidates(holder).values()
+            if other.code != holder.code and other.coupon_id != holder.coupon_id
+        ]
+        duplicates = list(similar(holder, others, self.threshold))
+        self.insert(holder)
+        return duplicates
+
+
+def organization_holders(organization_id, using: str, condition: Optional[Q] = None) -> Iterator[Holder]:
+    """Live passports of the organization (matching `condition`), as holders keyed by code."""
+    rows = (
+        Passport._base_manager.using(using)
+        .filter(condition or Q(), organization_id=organization_id, deleted__isnull=True)
+        .values_list("code", "coupon_id", "first_name", "middle_name", "last_name", "gender", "batch__received_date")
+        .order_by()
+        .iterator(chunk_size=5000)
+    )
+    for code, coupon_id, first_name, middle_name, last_name, gender, day in rows:
+        yield holder(code, code, coupon_id, first_name, middle_name, last_name, gender, day)
+
+
+def blocks_index(
+    organization_id, using: str, holders: Iterable[Holder], threshold: float = DUPLICATE_THRESHOLD
+) -> DuplicateIndex:
+    """
+    Index of the live passports of the organization sharing a block with
+    one of `holders` (e.g. a chunk of an import), found on the indexed
+    `phonetic_key` / `surname_key` columns.
+    """
+    phonetic, surnames = set(), defaultdict(set)
+    for row in holders:
+        for key in blocking_keys(row):
+            if key[0] == "phonetic":
+                phonetic.add(key[1])
+            else:
+                surnames[key[2]].add(key[1])
+    condition = Q(phonetic_key__in=phonetic)
+    for day, names in surnames.items():
+        condition |= Q(surname_key__in=names, batch__received_date=day)
+    index = DuplicateIndex(threshold)
+    if phonetic:
+        for passport in organization_holders(organization_id, using, condition):
+            index.insert(passport)
+    return index
+
+
+def likely_duplicates(holders: Iterable[Holder], threshold: float = DUPLICATE_THRESHOLD) -> Iterator[tuple]:
+    """(holder, holder, score) of the likely duplicates among `holders`, each pair once."""
+    blocks = defaultdict(list)
+    for passport in holders:
+        for key in blocking_keys(passport):
+            blocks[key].append(passport)
+    seen = set()
+    for block in blocks.values():
+        for a, others in _pairs(block):
+            for b, score in similar(a, others, threshold):
+                pair = (a.key, b.key) if a.key < b.key else (b.key, a.key)
+                if pair not in seen and a.coupon_id != b.coupon_id:
+                    seen.add(pair)
+                    yield a, b, score
+
+
+def scan_organization(organization: Organization, threshold: float = DUPLICATE_THRESHOLD) -> list:
+    """Likely duplicate passports of `organization`: [(holder, holder, score)], most similar first."""
+    pairs = sorted(
+        likely_duplicates(organization_holders(organization.pk, shard_for(organization)), threshold),
+        key=lambda pair: (-pair[2], pair[0].code),
+    )
+    logger.info("%d likely duplicates in %s", len(pairs), organization.slug)
+    return pairs
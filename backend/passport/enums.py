@@ -10,6 +10,16 @@ class PassportStatus(str, Enum):
     COMPLETED = "completed"   # The passport is ready to be published
 
 
+# Allowed status changes: {new status: statuses it can be reached from}
+PASSPORT_TRANSITIONS = {
+    PassportStatus.DRAFT: {PassportStatus.COMPLETED},
+    PassportStatus.COMPLETED: {PassportStatus.DRAFT},
+    PassportStatus.PUBLISHED: {PassportStatus.COMPLETED, PassportStatus.LOST},
+    PassportStatus.TAKEN: {PassportStatus.PUBLISHED},
+    PassportStatus.LOST: {PassportStatus.PUBLISHED, PassportStatus.TAKEN},
+}
+
+
 class BatchStatus(str, Enum):
 
     PENDING = "pending"         # We are awaiting the receipt of some passports
@@ -18,3 +28,12 @@ class BatchStatus(str, Enum):
     COMPLETED = "completed"     # All passports have been processed and are ready for distribution
     PUBLISHED = "published"     # Publish the passports that are completed
 
+
+
+class ImportStatus(str, Enum):
+
+    VALIDATED = "validated"     # Rows loaded into the staging table and checked
+    PROMOTED = "promoted"       # The valid rows have been inserted as passports
+    INGESTING = "ingesting"     # Rows being received and upserted (streamed ingestion)
+    INGESTED = "ingested"       # Every row received has been upserted or refused
+    INTERRUPTED = "interrupted" # The stream stopped before its end (rows received so far are kept)
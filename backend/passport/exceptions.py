@@ -9,3 +9,8 @@ class PassportNotFound(APIException):
 class PassportConflict(APIException):
     status_code = 400
     default_detail = "Invalid passport data"
+
+
+class ImportConflict(APIException):
+    status_code = 409
+    default_detail = "The import is not in a state allowing this operation"
@@ -0,0 +1,232 @@
+import logging
+from typing import Iterable
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from passport.caches import bump_passport_data_version, purge_public_passports
+from passport.enums import BatchStatus, ImportStatus, PassportStatus
+from passport.exceptions import ImportConflict
+from passport.names import name_keys
+from passport.manifests import MANIFEST_FIELDS, MANIFEST_REQUIRED, clean_manifest_row
+from passport.models import (
+    STATUS_COUNTERS,
+    ArchivedPassport,
+    Batch,
+    Passport,
+    PassportDailyStats,
+    PassportImport,
+    PassportImportError,
+    PassportImportRow,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+# Imports
+# Les lignes sont chargées telles quelles dans `passport_passportimportrow`
+# (bulk_create), vérifiées par des requêtes ensemblistes qui remplissent
+# `passport_passportimporterror`, puis les lignes valides sont insérées
+# dans `passport_passport` par un seul INSERT ... SELECT: tout ou rien.
+# Tables de la base (shard) de l'organisation.
+
+# Columns checked against the live and archived passports
+UNIQUE_FIELDS = ("code", "coupon_id")
+
+
+def _quote(alias: str, model) -> str:
+    return connections[alias].ops.quote_name(model._meta.db_table)
+
+
+def load_import(batch: Batch, rows: Iterable[dict], chunk_size: int = 1000) -> PassportImport:
+    """Load `rows` (dicts of MANIFEST_FIELDS) into the staging table of a new import into `batch`, then validate them."""
+    using = batch._state.db
+    with transaction.atomic(using=using):
+        passport_import = PassportImport.objects.using(using).create(
+            organization_id=batch.organization_id, batch=batch
+        )
+        staging = PassportImportRow.objects.using(using)
+        chunk, line = [], -1
+        for line, row in enumerate(rows):
+            values = {
+                name: value if value is None else str(value)
+                for name, value in clean_manifest_row(row).items()
+            }
+            phonetic_key, surname_key = name_keys(values["first_name"], values["middle_name"], values["last_name"])
+            chunk.append(PassportImportRow(
+                passport_import=passport_import,
+                line=line,
+                phonetic_key=phonetic_key,
+                surname_key=surname_key,
+                **values,
+            ))
+            if len(chunk) == chunk_size:
+                staging.bulk_create(chunk)
+                chunk = []
+        if chunk:
+            staging.bulk_create(chunk)
+        passport_import.total_rows = line + 1
+        passport_import.save(update_fields=["total_rows", "updated_at"])
+        validate_import(passport_import)
+    return passport_import
+
+
+def _errors(passport_import: PassportImport, field: str, error: str, where: str, params: list) -> None:
+    """INSERT ... SELECT an error `error` on `field` for each staging row of the import matching `where`."""
+    using = passport_import._state.db
+    rows, errors = _quote(using, PassportImportRow), _quote(using, PassportImportError)
+    quote = connections[using].ops.quote_name
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {errors} (passport_import_id, line, field, error, value)"
+            f" SELECT s.passport_import_id, s.line, %s, %s, s.{quote(field)} FROM {rows} s"
+            f" WHERE s.passport_import_id = %s AND ({where})",
+            [field, error, _import_param(passport_import), *params],
+        )
+
+
+def validate_import(passport_import: PassportImport) -> PassportImport:
+    """
+    (Re)check the rows of the import with set-based queries: required
+    columns, lengths, duplicates within the import, codes and coupons
+    already used by a (live, deleted or archived) passport, batch of the
+    organization still open. Rows without error are marked `valid`.
+    """
+    using = passport_import._state.db
+    quote = connections[using].ops.quote_name
+    rows = PassportImportRow.objects.using(using).filter(passport_import=passport_import)
+    errors = PassportImportError.objects.using(using).filter(passport_import=passport_import)
+    errors.delete()
+
+    staging = _quote(using, PassportImportRow)
+    import_id = _import_param(passport_import)
+    for field in MANIFEST_REQUIRED:
+        column = f"s.{quote(field)}"
+        _errors(passport_import, field, "required", f"{column} IS NULL OR {column} = ''", [])
+    for field in MANIFEST_FIELDS:
+        max_length = Passport._meta.get_field(field).max_length
+        _errors(passport_import, field, "too_long", f"LENGTH(s.{quote(field)}) > %s", [max_length])
+    for field in UNIQUE_FIELDS:
+        column = quote(field)
+        _errors(
+            passport_import, field, "duplicate",
+            f"s.{column} IN (SELECT d.{column} FROM {staging} d WHERE d.passport_import_id = %s"
+            f" GROUP BY d.{column} HAVING COUNT(*) > 1)",
+            [import_id],
+        )
+        for model, error in ((Passport, "exists"), (ArchivedPassport, "archived")):
+            _errors(
+                passport_import, field, error,
+                f"EXISTS (SELECT 1 FROM {_quote(using, model)} p WHERE p.{column} = s.{column})",
+                [],
+            )
+
+    batch_open = Batch._base_manager.using(using).filter(
+        pk=passport_import.batch_id,
+        organization_id=passport_import.organization_id,
+        deleted__isnull=True,
+    ).exclude(status=BatchStatus.PUBLISHED).exists()
+    if not batch_open:
+        PassportImportError.objects.using(using).create(
+            passport_import=passport_import, line=None, field="batch", error="batch",
+            value=str(passport_import.batch_id),
+        )
+
+    rows.update(valid=~Exists(errors.filter(line=OuterRef("line"))) if batch_open else False)
+    passport_import.valid_rows = rows.filter(valid=True).count()
+    passport_import.error_count = errors.count()
+    passport_import.save(update_fields=["valid_rows", "error_count", "updated_at"])
+    return passport_import
+
+
+def _import_param(passport_import: PassportImport):
+    field = PassportImportRow._meta.get_field("passport_import")
+    return field.get_db_prep_value(passport_import.pk, connections[passport_import._state.db])
+
+
+def _promote_columns(passport_import: PassportImport, now) -> dict:
+    """{column of Passport: (SQL expression, params)} of the promoted rows."""
+    connection = connections[passport_import._state.db]
+    quote = connection.ops.quote_name
+
+    def param(name, value):
+        return "%s", [Passport._meta.get_field(name).get_db_prep_value(value, connection)]
+
+    columns = {
+        "id": ("s.passport_id", []),
+        "created_at": param("created_at", now),
+        "updated_at": param("updated_at", now),
+        "is_active": param("is_active", True),
+        "deleted": ("NULL", []),
+        "deleted_by_cascade": param("deleted_by_cascade", False),
+        "batch_id": param("batch", passport_import.batch_id),
+        "organization_id": param("organization", passport_import.organization_id),
+        "status": param("status", PassportStatus.DRAFT.value),
+        "published_at": ("NULL", []),
+        "taken_at": ("NULL", []),
+        "phonetic_key": ("s.phonetic_key", []),
+        "surname_key": ("s.surname_key", []),
+        **{name: (f"s.{quote(name)}", []) for name in MANIFEST_FIELDS},
+    }
+    expected = {field.column for field in Passport._meta.concrete_fields}
+    if set(columns) != expected:
+        raise ImproperlyConfigured(
+            f"Columns of the passport import out of date: {sorted(set(columns) ^ expected)}"
+        )
+    return columns
+
+
+def promote_import(passport_import: PassportImport) -> PassportImport:
+    """
+    Insert the valid rows of the import into `Passport` (drafts of its
+    batch) with one INSERT ... SELECT, after validating them again, in one
+    transaction: all of them or none. Only validated imports can be
+    promoted (ImportConflict otherwise).
+    """
+    using = passport_import._state.db
+    with transaction.atomic(using=using):
+        passport_import = PassportImport.objects.using(using).select_for_update().get(pk=passport_import.pk)
+        # Promoted imports and ingestion jobs (rows already upserted, errors
+        # of the stream) cannot be promoted.
+        if passport_import.status != ImportStatus.VALIDATED:
+            raise ImportConflict(
+                f"Only validated imports can be promoted, this one is {passport_import.status}."
+            )
+        # Locked: concurrent publications and imports of the batch wait.
+        batch = Batch._base_manager.using(using).select_for_update().get(pk=passport_import.batch_id)
+        validate_import(passport_import)
+
+        now = timezone.now()
+        columns = _promote_columns(passport_import, now)
+        quote = connections[using].ops.quote_name
+        sql = (
+            f"INSERT INTO {_quote(using, Passport)} ({', '.join(quote(column) for column in columns)})"
+            f" SELECT {', '.join(expression for expression, _ in columns.values())}"
+            f" FROM {_quote(using, PassportImportRow)} s"
+            f" WHERE s.passport_import_id = %s AND s.valid = %s ORDER BY s.line"
+        )
+        params = [param for _, values in columns.values() for param in values]
+        with connections[using].cursor() as cursor:
+            cursor.execute(sql, [*params, _import_param(passport_import), True])
+            inserted = cursor.rowcount
+
+        draft = PassportStatus.DRAFT.value
+        Batch.count_passports(using, {(batch.pk, draft): inserted})
+        PassportDailyStats.record(using, {
+            (batch.organization_id, "received_count"): inserted,
+            (batch.organization_id, STATUS_COUNTERS[draft]): inserted,
+        })
+        PassportImportRow.objects.using(using).filter(passport_import=passport_import)._raw_delete(using)
+
+        passport_import.status = ImportStatus.PROMOTED.value
+        passport_import.inserted_rows = inserted
+        passport_import.promoted_at = now
+        passport_import.save(update_fields=["status", "inserted_rows", "promoted_at", "updated_at"])
+        if inserted:
+            bump_passport_data_version(batch)
+            purge_public_passports(batch, counts_only=True)
+    logger.info("Import %s: %d passports inserted into batch %s", passport_import.pk, inserted, batch.pk)
+    return passport_import
@@ -0,0 +1,111 @@
+import csv
+import json
+import logging
+from collections import Counter
+from typing import Iterable, Iterator, Optional
+
+from passport.enums import ImportStatus
+from passport.manifests import OUTCOMES, stream_upsert
+from passport.models import Batch, PassportImport, PassportImportError
+
+
+logger = logging.getLogger(__name__)
+
+
+# Ingestion en flux
+# Les partenaires envoient leurs passeports en NDJSON (un objet par ligne)
+# ou en CSV (ligne d'en-tête) dans le corps de la requête: lu ligne à
+# ligne, écrit par lots (voir `stream_upsert`), le résultat de chaque ligne
+# renvoyé au fil de l'eau. Seul un lot est en mémoire; le suivi (compteurs,
+# lignes refusées) est gardé dans un PassportImport.
+
+# Rows per transaction, and per response flush
+INGEST_CHUNK_SIZE = 1000
+
+
+def parse_ndjson(lines: Iterable[bytes]) -> Iterator[Optional[dict]]:
+    """Objects of the non-blank lines (None for a line that is not a JSON object)."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else None
+
+
+def parse_csv(lines: Iterable[bytes]) -> Iterator[dict]:
+    """Rows of a CSV with a header line (column names of MANIFEST_FIELDS)."""
+    decoded = (line.decode("utf-8-sig" if index == 0 else "utf-8") for index, line in enumerate(lines))
+    yield from csv.DictReader(decoded)
+
+
+def parse_rows(lines: Iterable[bytes], content_type: str) -> Iterator[Optional[dict]]:
+    """Rows of a body of type `content_type`: CSV (text/csv), else NDJSON."""
+    return parse_csv(lines) if "csv" in (content_type or "") else parse_ndjson(lines)
+
+
+def ingest_passports(
+    batch: Batch,
+    rows: Iterable,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+    check_duplicates: bool = False,
+) -> tuple:
+    """
+    Start the ingestion of `rows` (an iterator, consumed lazily) into
+    `batch`. Returns the job (PassportImport) and the iterator of the
+    results of the rows (see `stream_upsert`), which does the work: the
+    refused rows are stored as errors of the job, its counters updated when
+    the iterator ends (or is closed).
+    """
+    job = PassportImport.objects.using(batch._state.db).create(
+        organization_id=batch.organization_id,
+        batch=batch,
+        status=ImportStatus.INGESTING.value,
+    )
+    return job, _ingest(job, batch, rows, chunk_size, check_duplicates)
+
+
+def _ingest(job: PassportImport, batch: Batch, rows, chunk_size: int, check_duplicates: bool) -> Iterator[dict]:
+    errors = PassportImportError.objects.using(job._state.db)
+    counts, refused = Counter(), []
+    status = ImportStatus.INTERRUPTED
+    try:
+        for result in stream_upsert(batch, rows, chunk_size, check_duplicates):
+            counts[result["outcome"]] += 1
+            if result["outcome"] not in OUTCOMES:
+                refused.append(PassportImportError(
+                    passport_import=job,
+                    line=result["row"],
+                    field="row",
+                    error=result["outcome"],
+                    value=result["code"],
+                ))
+                if len(refused) >= chunk_size:
+                    errors.bulk_create(refused)
+                    refused = []
+            yield result
+        status = ImportStatus.INGESTED
+    finally:
+        if refused:
+            errors.bulk_create(refused)
+        job.status = status.value
+        job.total_rows = sum(counts.values())
+        job.valid_rows = sum(counts[outcome] for outcome in OUTCOMES)
+        job.inserted_rows = counts["inserted"]
+        job.error_count = job.total_rows - job.valid_rows
+        job.save(update_fields=["status", "total_rows", "valid_rows", "inserted_rows", "error_count", "updated_at"])
+        logger.info("Ingestion %s into batch %s: %s (%s)", job.pk, batch.pk, dict(counts), status.value)
+
+
+def job_summary(job: PassportImport) -> dict:
+    """Counters of an ingestion job, as sent to the client."""
+    return {
+        "id": str(job.pk),
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "valid_rows": job.valid_rows,
+        "inserted_rows": job.inserted_rows,
+        "error_count": job.error_count,
+    }
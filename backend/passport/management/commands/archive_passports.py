@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from organisations.sharding import organization_gather
+from passport.archive import archivable_passports, archive_passports
+
+
+class Command(BaseCommand):
+    help = 'Move taken, lost and old passports (soft-deleted ones included) to the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Passports moved per transaction (default: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the passports due for the archive'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            due = sum(organization_gather(archivable_passports(), lambda qs: qs.count()))
+            self.stdout.write(f"{due} passports due for the archive")
+            return
+
+        archived = archive_passports(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"{archived} passports archived"))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from organisations.models import Organization
+from passport.stats import backfill_organization_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily passport stats of the organizations from the passports (live and archived)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'slugs',
+            nargs='*',
+            help='Organizations to rebuild (all of them by default)'
+        )
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.all()
+        if options['slugs']:
+            organizations = organizations.filter(slug__in=options['slugs'])
+            missing = set(options['slugs']) - set(organizations.values_list('slug', flat=True))
+            if missing:
+                raise CommandError(f"Unknown organizations: {', '.join(sorted(missing))}")
+
+        for organization in organizations:
+            days = backfill_organization_stats(organization)
+            self.stdout.write(f"{organization.slug}: {days} days")
+        self.stdout.write(self.style.SUCCESS("Daily stats rebuilt"))
@@ -0,0 +1,50 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from organisations.models import Organization
+from passport.duplicates import DUPLICATE_THRESHOLD, scan_organization
+
+
+class Command(BaseCommand):
+    help = 'Report the likely duplicate passport holders of the organizations (CSV)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'slugs',
+            nargs='*',
+            help='Organizations to scan (all of them by default)'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=DUPLICATE_THRESHOLD,
+            help=f'Similarity of the names from which a pair is reported (default: {DUPLICATE_THRESHOLD})'
+        )
+        parser.add_argument(
+            '--output',
+            help='CSV file of the report (default: standard output)'
+        )
+
+    def handle(self, *args, **options):
+        organizations = Organization.objects.all()
+        if options['slugs']:
+            organizations = organizations.filter(slug__in=options['slugs'])
+            missing = set(options['slugs']) - set(organizations.values_list('slug', flat=True))
+            if missing:
+                raise CommandError(f"Unknown organizations: {', '.join(sorted(missing))}")
+
+        output = open(options['output'], 'w', newline='') if options['output'] else self.stdout
+        try:
+            writer = csv.writer(output)
+            writer.writerow(['organization', 'code', 'name', 'batch_date', 'duplicate_code', 'duplicate_name', 'duplicate_batch_date', 'score'])
+            total = 0
+            for organization in organizations:
+                pairs = scan_organization(organization, options['threshold'])
+                for a, b, score in pairs:
+                    writer.writerow([organization.slug, a.code, a.name, a.day, b.code, b.name, b.day, score])
+                total += len(pairs)
+        finally:
+            if options['output']:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f"{total} likely duplicates"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from passport.counters import reconcile_batch_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the passport counters of every batch from its passports (live and archived)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Batches recomputed per transaction (default: 500)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the batches whose counters are wrong'
+        )
+
+    def handle(self, *args, **options):
+        wrong = reconcile_batch_counters(chunk_size=options['chunk_size'], dry_run=options['dry_run'])
+        if options['dry_run']:
+            self.stdout.write(f"{wrong} batches with wrong counters")
+            return
+        self.stdout.write(self.style.SUCCESS(f"{wrong} batches fixed"))
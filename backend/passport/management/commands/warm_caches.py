@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from organisations.models.organisations import Organization
+from organisations.sharding import organization_gather
+from passport.enums import PassportStatus
+from passport.models import Passport
+from passport.warmup import warm_organization
+from utils_mixins.response_cache import public_origins
+
+
+class Command(BaseCommand):
+    help = 'Precompute the public passport responses (pages, counts, common lookups)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--organization',
+            action='append',
+            dest='organizations',
+            help='Slug of an organization to warm (repeatable, default: all with published passports)'
+        )
+        parser.add_argument(
+            '--origin',
+            action='append',
+            dest='origins',
+            help='Public origin, e.g. https://passeports.example.org (default: PUBLIC_ORIGINS)'
+        )
+
+    def handle(self, *args, **options):
+        origins = options['origins'] or public_origins()
+        if not origins:
+            self.stdout.write(self.style.ERROR("No public origin: set DJANGO_PUBLIC_ORIGINS or use --origin."))
+            return
+
+        slugs = options['organizations']
+        if not slugs:
+            # Passports may be on other shards than the organizations.
+            published = set()
+            for ids in organization_gather(
+                Passport.objects.filter(status=PassportStatus.PUBLISHED),
+                lambda qs: list(qs.order_by().values_list('organization_id', flat=True).distinct()),
+            ):
+                published.update(ids)
+            slugs = list(
+                Organization.objects.filter(pk__in=published).order_by('slug').values_list('slug', flat=True)
+            )
+
+        total = warm_organization(None, origins)
+        self.stdout.write(f"(all organizations): {total} responses")
+        for slug in slugs:
+            warmed = warm_organization(slug, origins)
+            total += warmed
+            self.stdout.write(f"{slug}: {warmed} responses")
+        self.stdout.write(self.style.SUCCESS(f"{total} responses cached for {', '.join(origins)}"))
@@ -0,0 +1,305 @@
+import logging
+from collections import Counter, defaultdict
+from typing import Iterable, Iterator
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from passport.caches import bump_passport_data_version, purge_public_passports
+from passport.duplicates import blocks_index, holder
+from passport.enums import PassportStatus
+from passport.models import NAME_FIELDS, STATUS_COUNTERS, ArchivedPassport, Batch, Passport, PassportDailyStats
+from passport.names import name_keys
+
+
+logger = logging.getLogger(__name__)
+
+
+# Manifestes
+# Les autorités renvoient des manifestes corrigés: chaque ligne est
+# rapprochée d'un passeport existant par `code` ou par `coupon_id` (tous
+# deux uniques), puis insérée, mise à jour (seulement les colonnes
+# modifiées) ou laissée telle quelle. Renvoyer le même manifeste ne change
+# rien.
+
+# Columns of a manifest row
+MANIFEST_FIELDS = ("code", "coupon_id", "first_name", "middle_name", "last_name", "gender")
+
+MANIFEST_REQUIRED = ("code", "coupon_id", "first_name", "last_name", "gender")
+
+# Columns reset when a soft-deleted passport is received again
+RESTORED_VALUES = {
+    "deleted": None,
+    "deleted_by_cascade": False,
+    "status": PassportStatus.DRAFT.value,
+    "published_at": None,
+    "taken_at": None,
+}
+
+EXISTING_FIELDS = (
+    "pk", *MANIFEST_FIELDS, "batch_id", "organization_id", "status", "deleted",
+    "created_at", "published_at", "taken_at", "is_active",
+)
+
+
+def clean_manifest_row(row: dict) -> dict:
+    """Values of MANIFEST_FIELDS in `row`, stripped, blank ones as None."""
+    values = {}
+    for name in MANIFEST_FIELDS:
+        value = row.get(name)
+        if isinstance(value, str):
+            value = value.strip() or None
+        values[name] = value
+    return values
+
+
+def _invalid(values: dict) -> bool:
+    if any(not values[name] for name in MANIFEST_REQUIRED):
+        return True
+    return any(
+        values[name] is not None and len(str(values[name])) > Passport._meta.get_field(name).max_length
+        for name in MANIFEST_FIELDS
+    )
+
+
+# Outcomes of the rows written (or left as they are); other rows are conflicts
+OUTCOMES = ("inserted", "updated", "restored", "unchanged")
+
+
+class _Upsert:
+    """State of one manifest: keys already seen, whether passports were written."""
+
+    def __init__(self, batch: Batch):
+        self.batch = batch
+        self.using = batch._state.db
+        self.codes, self.coupons = set(), set()
+        self.written = False
+
+
+    def run(self, chunk: list) -> dict:
+        """
+        Upsert `chunk` ([(index, values)]) in one transaction, retried once
+        if a passport was created meanwhile. Returns {index: outcome}.
+        """
+        for attempt in (1, 2):
+            try:
+                with transaction.atomic(using=self.using):
+                    outcomes = self._run(chunk)
+            except IntegrityError:
+                if attempt == 2:
+                    raise
+                continue
+            self.written = self.written or any(
+                outcome in ("inserted", "updated", "restored") for outcome in outcomes.values()
+            )
+            return outcomes
+
+
+    def _run(self, chunk: list) -> dict:
+        batch, using = self.batch, self.using
+        outcomes = {}
+        codes = [values["code"] for _, values in chunk]
+        coupons = [values["coupon_id"] for _, values in chunk]
+        # Locked: the outcomes are those of the writes below.
+        existing = list(
+            Passport._base_manager.using(using).select_for_update()
+            .filter(Q(code__in=codes) | Q(coupon_id__in=coupons))
+            .values(*EXISTING_FIELDS)
+        )
+        by_code = {row["code"]: row for row in existing}
+        by_coupon = {row["coupon_id"]: row for row in existing}
+        archived = ArchivedPassport._base_manager.using(using).filter(
+            Q(code__in=codes) | Q(coupon_id__in=coupons)
+        ).values_list("code", "coupon_id")
+        archived_codes = {code for code, _ in archived}
+        archived_coupons = {coupon for _, coupon in archived}
+
+        inserts, writes = [], defaultdict(list)
+        deltas, events = Counter(), Counter()
+        # Passports matched by a previous row of the chunk
+        claimed = set()
+        for index, values in chunk:
+            current = by_code.get(values["code"])
+            other = by_coupon.get(values["coupon_id"])
+            if values["code"] in archived_codes or values["coupon_id"] in archived_coupons:
+                outcomes[index] = "archived"
+                continue
+            if current and other and current["pk"] != other["pk"]:
+                outcomes[index] = "ambiguous"
+                continue
+            current = current or other
+            if current is not None:
+                if current["pk"] in claimed:
+                    # E.g. its code given to another row matched by its coupon.
+                    outcomes[index] = "matches_claimed"
+                    continue
+                claimed.add(current["pk"])
+            phonetic_key, surname_key = name_keys(values["first_name"], values["middle_name"], values["last_name"])
+            if current is None:
+                inserts.append(Passport(
+                    batch_id=batch.pk,
+                    organization_id=batch.organization_id,
+                    status=PassportStatus.DRAFT.value,
+                    phonetic_key=phonetic_key,
+                    surname_key=surname_key,
+                    **values,
+                ))
+                outcomes[index] = "inserted"
+                deltas[(batch.pk, PassportStatus.DRAFT.value)] += 1
+                events[(batch.organization_id, "received_count")] += 1
+                events[(batch.organization_id, STATUS_COUNTERS[PassportStatus.DRAFT.value])] += 1
+                continue
+
+            restored = current["deleted"] is not None
+            if current["batch_id"] != batch.pk and (
+                not restored or current["organization_id"] != batch.organization_id
+            ):
+                outcomes[index] = "other_batch"
+                continue
+            changed = {name: value for name, value in values.items() if current[name] != value}
+            if NAME_FIELDS & set(changed):
+                changed.update(phonetic_key=phonetic_key, surname_key=surname_key)
+            if restored:
+                changed.update(RESTORED_VALUES, batch_id=batch.pk, organization_id=batch.organization_id)
+                deltas[(batch.pk, PassportStatus.DRAFT.value)] += 1
+                events[(batch.organization_id, "deleted_count")] -= 1
+                if current["status"] != PassportStatus.DRAFT.value:
+                    events[(batch.organization_id, STATUS_COUNTERS[PassportStatus.DRAFT.value])] += 1
+            if not changed:
+                outcomes[index] = "unchanged"
+                continue
+            outcomes[index] = "restored" if restored else "updated"
+            # The row stays matched by the key it keeps.
+            key = "code" if "code" not in changed else "coupon_id"
+            passport = Passport(**{
+                name: current[name] for name in EXISTING_FIELDS if name != "pk"
+            }, id=current["pk"])
+            for name, value in changed.items():
+                setattr(passport, name, value)
+            writes[(key, tuple(sorted(changed)))].append(passport)
+
+        if inserts:
+            Passport._base_manager.using(using).bulk_create(inserts)
+        for (key, fields), passports in writes.items():
+            # INSERT ... ON CONFLICT (key) DO UPDATE of the changed columns only.
+            Passport._base_manager.using(using).bulk_create(
+                passports,
+                update_conflicts=True,
+                unique_fields=[key],
+                update_fields=[*fields, "updated_at"],
+            )
+        Batch.count_passports(using, deltas)
+        PassportDailyStats.record(using, events)
+        return outcomes
+
+
+    def duplicates(self, chunk: list) -> dict:
+        """
+        {index: [{"duplicate_of", "score"}]} of the rows of `chunk` looking
+        like a live passport of the organization (rows of the previous
+        chunks included) or a previous row of the chunk. Only the passports
+        sharing a block with a row of the chunk are read.
+        """
+        rows = [(index, holder(index, **values, day=self.batch.received_date)) for index, values in chunk]
+        holders = blocks_index(self.batch.organization_id, self.using, [row for _, row in rows])
+        return {
+            index: [{"duplicate_of": other.code, "score": score} for other, score in holders.add(row)]
+            for index, row in rows
+        }
+
+
+def _results(upsert: _Upsert, pending: list, chunk: list, check_duplicates: bool) -> Iterator[dict]:
+    # Before the chunk is written: its rows are not their own duplicates.
+    duplicates = upsert.duplicates(chunk) if check_duplicates and chunk else {}
+    outcomes = upsert.run(chunk) if chunk else {}
+    for index, values, outcome in pending:
+        yield {
+            "row": index,
+            "code": values.get("code"),
+            "coupon_id": values.get("coupon_id"),
+            "outcome": outcome or outcomes[index],
+            "duplicates": duplicates.get(index, []),
+        }
+
+
+def stream_upsert(
+    batch: Batch,
+    rows: Iterable,
+    chunk_size: int = 1000,
+    check_duplicates: bool = False,
+) -> Iterator[dict]:
+    """
+    Upsert the manifest `rows` into `batch` (see `upsert_passports`),
+    `chunk_size` rows per transaction, yielding once its chunk is written
+    the result of each row, in order: {"row", "code", "coupon_id",
+    "outcome", "duplicates"}, outcome being one of OUTCOMES or the reason
+    of the conflict (`malformed` for a row that is not a dict). Only one
+    chunk of rows is held at a time (and the keys already seen).
+    """
+    upsert = _Upsert(batch)
+    pending, chunk = [], []
+    try:
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                pending.append((index, {}, "malformed"))
+                continue
+            values = clean_manifest_row(row)
+            if _invalid(values):
+                outcome = "invalid"
+            elif values["code"] in upsert.codes or values["coupon_id"] in upsert.coupons:
+                outcome = "duplicate"
+            else:
+                outcome = None
+                upsert.codes.add(values["code"])
+                upsert.coupons.add(values["coupon_id"])
+                chunk.append((index, values))
+            pending.append((index, values, outcome))
+            if len(pending) >= chunk_size:
+                yield from _results(upsert, pending, chunk, check_duplicates)
+                pending, chunk = [], []
+        yield from _results(upsert, pending, chunk, check_duplicates)
+    finally:
+        if upsert.written:
+            bump_passport_data_version(batch)
+            purge_public_passports(batch)
+
+
+def upsert_passports(
+    batch: Batch,
+    rows: Iterable[dict],
+    chunk_size: int = 1000,
+    check_duplicates: bool = False,
+) -> dict:
+    """
+    Insert or update the passports of the manifest `rows` (dicts of
+    MANIFEST_FIELDS) in `batch`, `chunk_size` rows per transaction.
+
+    A row matches the passport with its `code` or its `coupon_id`; only the
+    columns that differ are written. A soft-deleted passport received again
+    of the organization is restored into `batch` as a draft. Rows are
+    refused (`conflicts`) when invalid, repeated in the manifest, archived,
+    matching two passports, matching the passport of a previous row of its
+    chunk, or matching a passport of another batch (live) or organization.
+    With `check_duplicates`, rows whose holder looks like another passport
+    of the organization or another row (see `passport.duplicates`) are
+    reported for review (`duplicates`), but upserted all the same.
+    Returns {"inserted", "updated", "restored", "unchanged", "conflicts", "duplicates"}.
+    """
+    counts = Counter(dict.fromkeys(OUTCOMES, 0))
+    conflicts, duplicates = [], []
+    for result in stream_upsert(batch, rows, chunk_size, check_duplicates):
+        if result["outcome"] in counts:
+            counts[result["outcome"]] += 1
+        else:
+            conflicts.append({
+                "row": result["row"],
+                "code": result["code"],
+                "coupon_id": result["coupon_id"],
+                "reason": result["outcome"],
+            })
+        duplicates.extend(
+            {"row": result["row"], "code": result["code"], **duplicate}
+            for duplicate in result["duplicates"]
+        )
+    logger.info("Manifest of batch %s: %s, %d conflicts", batch.pk, dict(counts), len(conflicts))
+    return {**counts, "conflicts": conflicts, "duplicates": duplicates}
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_batch_organization(apps, schema_editor):
+    Batch = apps.get_model('passport', 'Batch')
+    Passport = apps.get_model('passport', 'Passport')
+    Passport._base_manager.update(
+        organization_id=models.Subquery(
+            Batch._base_manager.filter(pk=models.OuterRef('batch_id')).values('organization_id')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0003_alter_organization_id_and_more'),
+        ('passport', '0005_alter_batch_id_alter_passport_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passport',
+            name='organization',
+            field=models.ForeignKey(db_index=False, editable=False, help_text='Organization of the batch (denormalized for tenant-scoped queries)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='passports', to='organisations.organization'),
+        ),
+        migrations.RunPython(copy_batch_organization, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['organization', 'status'], name='batch_org_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['organization', '-received_date'], name='batch_org_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passport',
+            index=models.Index(fields=['organization', 'status'], name='passport_org_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passport',
+            index=models.Index(fields=['organization', 'last_name', 'first_name'], name='passport_org_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passport',
+            index=models.Index(fields=['organization', '-created_at'], name='passport_org_created_idx'),
+        ),
+    ]
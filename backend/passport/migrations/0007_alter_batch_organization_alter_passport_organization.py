@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0004_organization_shard'),
+        ('passport', '0006_passport_organization_batch_batch_org_status_idx_and_more'),
+    ]
+
+    # Organizations stay on the default database while batches and passports
+    # may live on another shard: no foreign key constraint in the database.
+    operations = [
+        migrations.AlterField(
+            model_name='batch',
+            name='organization',
+            field=models.ForeignKey(db_constraint=False, help_text='The organization this batch belongs to', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='organisations.organization'),
+        ),
+        migrations.AlterField(
+            model_name='passport',
+            name='organization',
+            field=models.ForeignKey(db_constraint=False, db_index=False, editable=False, help_text='Organization of the batch (denormalized for tenant-scoped queries)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='passports', to='organisations.organization'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_archive_table(apps, schema_editor):
+    model = apps.get_model("passport", "ArchivedPassport")
+    if schema_editor.connection.vendor != "postgresql":
+        schema_editor.create_model(model)
+        return
+    # Native partitions by year (passport.archive creates them on demand);
+    # the primary key of a partitioned table includes the partition key.
+    sql, params = schema_editor.table_sql(model)
+    sql = sql.replace(" PRIMARY KEY", "", 1)
+    sql = sql[:-1] + ', PRIMARY KEY ("id", "published_year")) PARTITION BY RANGE ("published_year")'
+    schema_editor.execute(sql, params or None)
+    for statement in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(statement)
+
+
+def drop_archive_table(apps, schema_editor):
+    schema_editor.delete_model(apps.get_model("passport", "ArchivedPassport"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0004_organization_shard'),
+        ('passport', '0007_alter_batch_organization_alter_passport_organization'),
+    ]
+
+    operations = [
+        # View maintained by passport.archive (post_migrate).
+        migrations.CreateModel(
+            name='PassportRecord',
+            fields=[
+                ('deleted', models.DateTimeField(db_index=True, editable=False, null=True)),
+                ('deleted_by_cascade', models.BooleanField(default=False, editable=False)),
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('code', models.CharField(max_length=100)),
+                ('coupon_id', models.CharField(max_length=100)),
+                ('first_name', models.CharField(max_length=100)),
+                ('middle_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('last_name', models.CharField(max_length=100)),
+                ('gender', models.CharField(max_length=10)),
+                ('status', models.CharField(choices=[('published', 'Published'), ('draft', 'Draft'), ('completed', 'Completed'), ('lost', 'Lost'), ('taken', 'Taken')], max_length=50)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+                ('taken_at', models.DateTimeField(blank=True, null=True)),
+                ('archived', models.BooleanField(help_text='The row comes from the archive')),
+            ],
+            options={
+                'db_table': 'passport_passportrecord',
+                'managed': False,
+            },
+        ),
+        # Table created by create_archive_table (partitioned on Postgres).
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ArchivedPassport',
+                    fields=[
+                        ('deleted', models.DateTimeField(db_index=True, editable=False, null=True)),
+                        ('deleted_by_cascade', models.BooleanField(default=False, editable=False)),
+                        ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                        ('created_at', models.DateTimeField()),
+                        ('updated_at', models.DateTimeField()),
+                        ('is_active', models.BooleanField(default=True)),
+                        ('code', models.CharField(max_length=100)),
+                        ('coupon_id', models.CharField(max_length=100)),
+                        ('first_name', models.CharField(max_length=100)),
+                        ('middle_name', models.CharField(blank=True, max_length=100, null=True)),
+                        ('last_name', models.CharField(max_length=100)),
+                        ('gender', models.CharField(max_length=10)),
+                        ('status', models.CharField(choices=[('published', 'Published'), ('draft', 'Draft'), ('completed', 'Completed'), ('lost', 'Lost'), ('taken', 'Taken')], max_length=50)),
+                        ('published_at', models.DateTimeField(blank=True, null=True)),
+                        ('taken_at', models.DateTimeField(blank=True, null=True)),
+                        ('archived_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Date when the passport was archived')),
+                        ('published_year', models.PositiveSmallIntegerField(help_text='Year of publication (of creation when never published), partition key')),
+                        ('batch', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='passport.batch')),
+                        ('organization', models.ForeignKey(db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='organisations.organization')),
+                    ],
+                    options={
+                        'indexes': [models.Index(fields=['organization', 'status'], name='archive_org_status_idx'), models.Index(fields=['organization', 'last_name', 'first_name'], name='archive_org_name_idx'), models.Index(fields=['code'], name='archive_code_idx'), models.Index(fields=['coupon_id'], name='archive_coupon_idx'), models.Index(fields=['batch'], name='archive_batch_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_archive_table, drop_archive_table),
+    ]
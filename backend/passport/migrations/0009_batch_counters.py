@@ -0,0 +1,75 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:40
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+COUNTERS = {
+    "draft_count": "draft",
+    "completed_count": "completed",
+    "published_count": "published",
+    "taken_count": "taken",
+    "lost_count": "lost",
+    "total_count": None,
+}
+
+
+def count_passports(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Batch = apps.get_model("passport", "Batch")
+
+    def counted(model_name, status):
+        rows = apps.get_model("passport", model_name)._base_manager.using(alias).filter(
+            batch_id=OuterRef("pk"), deleted__isnull=True
+        )
+        if status:
+            rows = rows.filter(status=status)
+        rows = rows.order_by().values("batch_id").annotate(count=Count("pk")).values("count")
+        return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+    Batch._base_manager.using(alias).update(**{
+        field: counted("Passport", status) + counted("ArchivedPassport", status)
+        for field, status in COUNTERS.items()
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passport', '0008_passport_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='completed_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Completed passports'),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='draft_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Draft passports'),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='lost_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Lost passports'),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='published_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Published passports'),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='taken_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Taken passports'),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='total_count',
+            field=models.IntegerField(default=0, editable=False, help_text='Passports of the batch'),
+        ),
+        migrations.RunPython(count_passports, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-19 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0004_organization_shard'),
+        ('passport', '0009_batch_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PassportDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Day, in the timezone of the organization')),
+                ('received_count', models.IntegerField(default=0, help_text='Passports created')),
+                ('draft_count', models.IntegerField(default=0, help_text='Passports set to draft')),
+                ('completed_count', models.IntegerField(default=0, help_text='Passports completed')),
+                ('published_count', models.IntegerField(default=0, help_text='Passports published')),
+                ('taken_count', models.IntegerField(default=0, help_text='Passports taken')),
+                ('lost_count', models.IntegerField(default=0, help_text='Passports reported lost')),
+                ('deleted_count', models.IntegerField(default=0, help_text='Passports deleted, less those undeleted')),
+                ('organization', models.ForeignKey(db_constraint=False, help_text='The organization of the passports', on_delete=django.db.models.deletion.CASCADE, related_name='passport_daily_stats', to='organisations.organization')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('organization', 'day'), name='passport_stats_org_day_uniq')],
+            },
+        ),
+    ]
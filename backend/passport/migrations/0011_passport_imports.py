@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:04
+
+import django.db.models.deletion
+import utils_mixins.uuids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0004_organization_shard'),
+        ('passport', '0010_passport_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PassportImport',
+            fields=[
+                ('id', models.UUIDField(default=utils_mixins.uuids.default_uuid, editable=False, help_text='Unique identifier for this record', primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date and time when this record was created')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Date and time when this record was last updated')),
+                ('is_active', models.BooleanField(default=True, help_text='Whether this record is active')),
+                ('status', models.CharField(choices=[('validated', 'Validated'), ('promoted', 'Promoted')], default='validated', help_text='Status of the import', max_length=20)),
+                ('total_rows', models.IntegerField(default=0, help_text='Rows loaded')),
+                ('valid_rows', models.IntegerField(default=0, help_text='Rows without error')),
+                ('error_count', models.IntegerField(default=0, help_text='Errors found')),
+                ('inserted_rows', models.IntegerField(default=0, help_text='Passports inserted by the promotion')),
+                ('promoted_at', models.DateTimeField(blank=True, help_text='Date of the promotion', null=True)),
+                ('batch', models.ForeignKey(db_constraint=False, help_text='The batch receiving the passports', on_delete=django.db.models.deletion.CASCADE, related_name='imports', to='passport.batch')),
+                ('organization', models.ForeignKey(db_constraint=False, help_text='The organization importing the passports', on_delete=django.db.models.deletion.CASCADE, related_name='passport_imports', to='organisations.organization')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PassportImportError',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line', models.PositiveIntegerField(help_text='Row at fault', null=True)),
+                ('field', models.CharField(help_text='Column at fault', max_length=50)),
+                ('error', models.CharField(help_text='required, too_long, duplicate, exists, archived, batch', max_length=50)),
+                ('value', models.TextField(help_text='Value at fault', null=True)),
+                ('passport_import', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='errors', to='passport.passportimport')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PassportImportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line', models.PositiveIntegerField(help_text='Position of the row in the import (from 0)')),
+                ('passport_id', models.UUIDField(default=utils_mixins.uuids.default_uuid, help_text='Id of the passport once promoted')),
+                ('code', models.TextField(null=True)),
+                ('coupon_id', models.TextField(null=True)),
+                ('first_name', models.TextField(null=True)),
+                ('middle_name', models.TextField(null=True)),
+                ('last_name', models.TextField(null=True)),
+                ('gender', models.TextField(null=True)),
+                ('valid', models.BooleanField(default=False, help_text='No error found on the row')),
+                ('passport_import', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='passport.passportimport')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='passportimport',
+            index=models.Index(fields=['organization', '-created_at'], name='import_org_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passportimporterror',
+            index=models.Index(fields=['passport_import', 'line'], name='import_error_line_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passportimportrow',
+            index=models.Index(fields=['passport_import', 'code'], name='import_row_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passportimportrow',
+            index=models.Index(fields=['passport_import', 'coupon_id'], name='import_row_coupon_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='passportimportrow',
+            constraint=models.UniqueConstraint(fields=('passport_import', 'line'), name='import_row_line_uniq'),
+        ),
+    ]
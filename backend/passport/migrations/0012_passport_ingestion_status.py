@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passport', '0011_passport_imports'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='passportimport',
+            name='status',
+            field=models.CharField(choices=[('validated', 'Validated'), ('promoted', 'Promoted'), ('ingesting', 'Ingesting'), ('ingested', 'Ingested'), ('interrupted', 'Interrupted')], default='validated', help_text='Status of the import', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='passportimporterror',
+            name='error',
+            field=models.CharField(help_text='required, too_long, duplicate, exists, archived, batch (imports), or the conflict of an ingested row', max_length=50),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:37
+
+from django.db import migrations, models
+
+from passport.names import name_keys
+
+
+def compute_name_keys(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Passport = apps.get_model('passport', 'Passport')
+    passports = Passport._base_manager.using(alias).only('first_name', 'middle_name', 'last_name').order_by('pk')
+    last = None
+    while True:
+        chunk = list((passports.filter(pk__gt=last) if last else passports)[:1000])
+        if not chunk:
+            break
+        for passport in chunk:
+            passport.phonetic_key, passport.surname_key = name_keys(
+                passport.first_name, passport.middle_name, passport.last_name
+            )
+        Passport._base_manager.using(alias).bulk_update(chunk, ['phonetic_key', 'surname_key'])
+        last = chunk[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organisations', '0004_organization_shard'),
+        ('passport', '0012_passport_ingestion_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passport',
+            name='phonetic_key',
+            field=models.CharField(db_default='', default='', editable=False, help_text='Soundex codes of the surname and first name (blocking key of the duplicates)', max_length=9),
+        ),
+        migrations.AddField(
+            model_name='passport',
+            name='surname_key',
+            field=models.CharField(db_default='', default='', editable=False, help_text='Normalized surname (blocking key of the duplicates)', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='passportimportrow',
+            name='phonetic_key',
+            field=models.CharField(default='', help_text='Passport.phonetic_key of the row', max_length=9),
+        ),
+        migrations.AddField(
+            model_name='passportimportrow',
+            name='surname_key',
+            field=models.CharField(default='', help_text='Passport.surname_key of the row', max_length=100),
+        ),
+        migrations.RunPython(compute_name_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='passport',
+            index=models.Index(fields=['organization', 'phonetic_key'], name='passport_org_phonetic_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passport',
+            index=models.Index(fields=['organization', 'surname_key'], name='passport_org_surname_idx'),
+        ),
+    ]
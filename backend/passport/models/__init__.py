@@ -1,2 +1,7 @@
 from .passport import *
 
+from .archive import *
+
+from .stats import *
+
+from .imports import *
@@ -0,0 +1,112 @@
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from safedelete.models import SafeDeleteModel
+from organisations.managers import TenantSafeDeleteManager
+from organisations.models.organisations import Organization
+from passport.enums import PassportStatus
+from passport.models.passport import Batch
+
+
+
+class PassportSnapshot(SafeDeleteModel):
+    """
+    Columns of a passport row, as stored in `passport_passport`, without
+    defaults or constraints: rows are copied as they are.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    is_active = models.BooleanField(default=True)
+    batch = models.ForeignKey(
+        Batch,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+    organization = models.ForeignKey(
+        Organization,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="+",
+    )
+    code = models.CharField(max_length=100)
+    coupon_id = models.CharField(max_length=100)
+    first_name = models.CharField(max_length=100)
+    middle_name = models.CharField(max_length=100, blank=True, null=True)
+    last_name = models.CharField(max_length=100)
+    gender = models.CharField(max_length=10)
+    status = models.CharField(
+        max_length=50,
+        choices=(
+            (PassportStatus.PUBLISHED.value, _('Published')),
+            (PassportStatus.DRAFT.value, _('Draft')),
+            (PassportStatus.COMPLETED.value, _('Completed')),
+            (PassportStatus.LOST.value, _('Lost')),
+            (PassportStatus.TAKEN.value, _('Taken')),
+        )
+    )
+    published_at = models.DateTimeField(blank=True, null=True)
+    taken_at = models.DateTimeField(blank=True, null=True)
+
+    objects = TenantSafeDeleteManager()
+
+    class Meta:
+        abstract = True
+
+
+
+class ArchivedPassport(PassportSnapshot):
+    """
+    Passport moved out of the live table (taken, lost or old, see
+    `passport.archive`), soft-deleted rows included.
+
+    On Postgres the table is partitioned by range of `published_year`, one
+    partition per year (created on demand); elsewhere it is a plain table.
+    """
+
+    archived_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Date when the passport was archived",
+    )
+    published_year = models.PositiveSmallIntegerField(
+        help_text="Year of publication (of creation when never published), partition key",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization", "status"], name="archive_org_status_idx"),
+            models.Index(fields=["organization", "last_name", "first_name"], name="archive_org_name_idx"),
+            models.Index(fields=["code"], name="archive_code_idx"),
+            models.Index(fields=["coupon_id"], name="archive_coupon_idx"),
+            models.Index(fields=["batch"], name="archive_batch_idx"),
+        ]
+
+
+    def __str__(self):
+        return f"Archived passport {self.code} ({self.published_year})"
+
+
+
+class PassportRecord(PassportSnapshot):
+    """
+    Read-only view over live and archived passports (UNION ALL), to query
+    the archive on demand with the lookups of `Passport`.
+
+    The view lists the columns of both tables: a migration changing the
+    columns of `Passport` must recreate it.
+    """
+
+    archived = models.BooleanField(help_text="The row comes from the archive")
+
+    class Meta:
+        managed = False
+        db_table = "passport_passportrecord"
+
+
+    def __str__(self):
+        return f"Passport {self.code}{' (archived)' if self.archived else ''}"
@@ -0,0 +1,127 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+from organisations.models.organisations import Organization
+from passport.enums import ImportStatus
+from passport.models.passport import Batch
+from passport.names import SURNAME_KEY_LENGTH
+from utils_mixins.models import BaseModelMixin
+from utils_mixins.uuids import default_uuid
+
+
+
+class PassportImport(BaseModelMixin):
+    """
+    Import of passports into a batch: rows loaded as they are into the
+    staging table (PassportImportRow), checked with set-based queries
+    (PassportImportError), then the valid ones promoted into `Passport` in
+    one INSERT ... SELECT (see `passport.imports`).
+    Also the job of a streamed ingestion (see `passport.ingest`): rows
+    upserted as they arrive, the refused ones kept as errors.
+    """
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="passport_imports",
+        help_text="The organization importing the passports",
+    )
+    batch = models.ForeignKey(
+        Batch,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="imports",
+        help_text="The batch receiving the passports",
+    )
+    status = models.CharField(
+        max_length=20,
+        default=ImportStatus.VALIDATED.value,
+        choices=(
+            (ImportStatus.VALIDATED.value, _('Validated')),
+            (ImportStatus.PROMOTED.value, _('Promoted')),
+            (ImportStatus.INGESTING.value, _('Ingesting')),
+            (ImportStatus.INGESTED.value, _('Ingested')),
+            (ImportStatus.INTERRUPTED.value, _('Interrupted')),
+        ),
+        help_text="Status of the import",
+    )
+    total_rows = models.IntegerField(default=0, help_text="Rows loaded")
+    valid_rows = models.IntegerField(default=0, help_text="Rows without error")
+    error_count = models.IntegerField(default=0, help_text="Errors found")
+    inserted_rows = models.IntegerField(default=0, help_text="Passports inserted by the promotion")
+    promoted_at = models.DateTimeField(null=True, blank=True, help_text="Date of the promotion")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization", "-created_at"], name="import_org_created_idx"),
+        ]
+
+
+    def __str__(self):
+        return f"Import {self.pk} into batch {self.batch_id} ({self.status})"
+
+
+
+class PassportImportRow(models.Model):
+    """
+    Row of an import, as received (no constraint): checked by the
+    validation queries, removed once promoted.
+    """
+
+    passport_import = models.ForeignKey(
+        PassportImport,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="rows",
+    )
+    line = models.PositiveIntegerField(help_text="Position of the row in the import (from 0)")
+    passport_id = models.UUIDField(default=default_uuid, help_text="Id of the passport once promoted")
+    code = models.TextField(null=True)
+    coupon_id = models.TextField(null=True)
+    first_name = models.TextField(null=True)
+    middle_name = models.TextField(null=True)
+    last_name = models.TextField(null=True)
+    gender = models.TextField(null=True)
+    phonetic_key = models.CharField(max_length=9, default="", help_text="Passport.phonetic_key of the row")
+    surname_key = models.CharField(max_length=SURNAME_KEY_LENGTH, default="", help_text="Passport.surname_key of the row")
+    valid = models.BooleanField(default=False, help_text="No error found on the row")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["passport_import", "line"], name="import_row_line_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["passport_import", "code"], name="import_row_code_idx"),
+            models.Index(fields=["passport_import", "coupon_id"], name="import_row_coupon_idx"),
+        ]
+
+
+
+class PassportImportError(models.Model):
+    """
+    Error of an import: one per row and field at fault (`line` empty for
+    the errors of the whole import).
+    """
+
+    passport_import = models.ForeignKey(
+        PassportImport,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="errors",
+    )
+    line = models.PositiveIntegerField(null=True, help_text="Row at fault")
+    field = models.CharField(max_length=50, help_text="Column at fault")
+    error = models.CharField(
+        max_length=50,
+        help_text="required, too_long, duplicate, exists, archived, batch (imports), or the conflict of an ingested row",
+    )
+    value = models.TextField(null=True, help_text="Value at fault")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["passport_import", "line"], name="import_error_line_idx"),
+        ]
+
+
+    def __str__(self):
+        return f"Import {self.passport_import_id}, line {self.line}: {self.field} {self.error}"
@@ -1,14 +1,35 @@
+from collections import Counter, defaultdict
 from utils_mixins.models import BaseModelMixin
+from utils_mixins.soft_delete import BulkCascadeMixin
 from django.utils import timezone
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
 from passport.enums import PassportStatus, BatchStatus
 from django.utils.translation import gettext_lazy as _
 from safedelete.models import SafeDeleteModel, SOFT_DELETE_CASCADE
 from organisations.models.organisations import Organization
+from organisations.managers import TenantSafeDeleteManager
+from passport.models.stats import PassportDailyStats
+from passport.names import SURNAME_KEY_LENGTH, name_keys
 
 
+# Counter of Batch per passport status
+STATUS_COUNTERS = {
+    PassportStatus.DRAFT.value: "draft_count",
+    PassportStatus.COMPLETED.value: "completed_count",
+    PassportStatus.PUBLISHED.value: "published_count",
+    PassportStatus.TAKEN.value: "taken_count",
+    PassportStatus.LOST.value: "lost_count",
+}
 
-class Batch(SafeDeleteModel, BaseModelMixin):
+COUNTER_FIELDS = [*STATUS_COUNTERS.values(), "total_count"]
+
+# Names from which the blocking keys of a passport are computed
+NAME_FIELDS = {"first_name", "middle_name", "last_name"}
+
+
+
+class Batch(BulkCascadeMixin, SafeDeleteModel, BaseModelMixin):
     """
     Represents a batch of passports.
 
@@ -16,6 +37,10 @@ class Batch(SafeDeleteModel, BaseModelMixin):
         received_date: The date this batch was received.
         status: Current status of the batch (Pending, Received, Processing, Completed, Published).
         organization: Organization this batch belongs to.
+        draft_count, completed_count, published_count, taken_count,
+        lost_count, total_count: Passports of the batch per status (not
+        soft-deleted, archived ones included), kept up to date by each
+        passport write (see `count_passports`, `passport.counters`).
     """
 
     _safedelete_policy = SOFT_DELETE_CASCADE
@@ -40,9 +65,65 @@ class Batch(SafeDeleteModel, BaseModelMixin):
         Organization,
         null=True,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name="batches",
         help_text="The organization this batch belongs to",
     )
+    draft_count = models.IntegerField(default=0, editable=False, help_text="Draft passports")
+    completed_count = models.IntegerField(default=0, editable=False, help_text="Completed passports")
+    published_count = models.IntegerField(default=0, editable=False, help_text="Published passports")
+    taken_count = models.IntegerField(default=0, editable=False, help_text="Taken passports")
+    lost_count = models.IntegerField(default=0, editable=False, help_text="Lost passports")
+    total_count = models.IntegerField(default=0, editable=False, help_text="Passports of the batch")
+
+    objects = TenantSafeDeleteManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["organization", "status"], name="batch_org_status_idx"),
+            models.Index(fields=["organization", "-received_date"], name="batch_org_received_idx"),
+        ]
+
+
+    def save(self, *args, **kwargs):
+        """
+        Save the batch, keeping the organization of its passports in sync.
+        The passport counters, updated in place, are only written on creation.
+        """
+        organization_changed = (
+            not self._state.adding
+            and Batch.all_objects.filter(pk=self.pk)
+                .exclude(organization_id=self.organization_id).exists()
+        )
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        if organization_changed:
+            Passport.all_objects.filter(batch=self).update(organization_id=self.organization_id)
+
+
+    @classmethod
+    def count_passports(cls, using: str, deltas: dict) -> None:
+        """
+        Add `deltas` ({(batch id, passport status): count}) to the counters
+        of the batches, with one atomic UPDATE per batch.
+        """
+        per_batch = defaultdict(Counter)
+        for (batch_id, status), count in deltas.items():
+            per_batch[batch_id][status] += count
+        for batch_id, counts in per_batch.items():
+            updates = {
+                STATUS_COUNTERS[status]: F(STATUS_COUNTERS[status]) + count
+                for status, count in counts.items() if count
+            }
+            total = sum(counts.values())
+            if total:
+                updates["total_count"] = F("total_count") + total
+            if updates:
+                cls._base_manager.using(using).filter(pk=batch_id).update(**updates)
 
 
     def __str__(self):
@@ -52,7 +133,7 @@ class Batch(SafeDeleteModel, BaseModelMixin):
         return f"Batch: {self.received_date} - {self.status}"
 
 
-class Passport(SafeDeleteModel, BaseModelMixin):
+class Passport(BulkCascadeMixin, SafeDeleteModel, BaseModelMixin):
     """
     Represents a passport within a batch.
 
@@ -77,6 +158,16 @@ class Passport(SafeDeleteModel, BaseModelMixin):
         related_name="passports",
         help_text="The batch this passport belongs to",
     )
+    organization = models.ForeignKey(
+        Organization,
+        null=True,
+        editable=False,
+        db_index=False,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="passports",
+        help_text="Organization of the batch (denormalized for tenant-scoped queries)",
+    )
     code = models.CharField(
         max_length=100,
         unique=True,
@@ -127,6 +218,67 @@ class Passport(SafeDeleteModel, BaseModelMixin):
         null=True,
         help_text="Date when the passport was taken",
     )
+    phonetic_key = models.CharField(
+        max_length=9,
+        default="",
+        db_default="",
+        editable=False,
+        help_text="Soundex codes of the surname and first name (blocking key of the duplicates)",
+    )
+    surname_key = models.CharField(
+        max_length=SURNAME_KEY_LENGTH,
+        default="",
+        db_default="",
+        editable=False,
+        help_text="Normalized surname (blocking key of the duplicates)",
+    )
+
+    objects = TenantSafeDeleteManager()
+
+    class Meta:
+        # Organization first: each tenant's queries only read its own slice.
+        indexes = [
+            models.Index(fields=["organization", "status"], name="passport_org_status_idx"),
+            models.Index(fields=["organization", "last_name", "first_name"], name="passport_org_name_idx"),
+            models.Index(fields=["organization", "-created_at"], name="passport_org_created_idx"),
+            models.Index(fields=["organization", "phonetic_key"], name="passport_org_phonetic_idx"),
+            models.Index(fields=["organization", "surname_key"], name="passport_org_surname_idx"),
+        ]
+
+
+    def save(self, *args, **kwargs):
+        """
+        Save the passport, copying the organization of its batch and
+        computing the blocking keys of its names, and move it between the
+        counters of its batch (status change, soft delete, undelete) and
+        record the change in the daily stats.
+        """
+        self.organization_id = self.batch.organization_id
+        self.phonetic_key, self.surname_key = name_keys(self.first_name, self.middle_name, self.last_name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and NAME_FIELDS & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "phonetic_key", "surname_key"}
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous = None if self._state.adding else (
+                Passport._base_manager.using(using).filter(pk=self.pk)
+                .values_list("batch_id", "status", "deleted").first()
+            )
+            super().save(*args, **kwargs)
+            deltas, events = Counter(), Counter()
+            if previous and previous[2] is None:
+                deltas[previous[:2]] -= 1
+            if self.deleted is None:
+                deltas[(self.batch_id, self.status)] += 1
+            organization_id = self.organization_id
+            if previous is None:
+                events[(organization_id, "received_count")] += 1
+            if self.deleted is None and (previous is None or previous[1] != self.status):
+                events[(organization_id, STATUS_COUNTERS[self.status])] += 1
+            if previous and (previous[2] is None) != (self.deleted is None):
+                events[(organization_id, "deleted_count")] += 1 if self.deleted else -1
+            Batch.count_passports(using, deltas)
+            PassportDailyStats.record(using, events)
 
 
     def __str__(self):
@@ -0,0 +1,89 @@
+from collections import Counter, defaultdict
+from datetime import date
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+from organisations.caches import get_organization
+from organisations.models.organisations import Organization
+
+
+# Events counted per organization and day
+STATS_FIELDS = [
+    "received_count",
+    "draft_count",
+    "completed_count",
+    "published_count",
+    "taken_count",
+    "lost_count",
+    "deleted_count",
+]
+
+
+
+class PassportDailyStats(models.Model):
+    """
+    Passport events of one organization on one day (in the timezone of the
+    organization): passports received, passports entering each status,
+    passports deleted (net of undeletes). Kept up to date by the passport
+    write paths (see `record`), rebuilt by `manage.py backfill_passport_stats`.
+    """
+
+    organization = models.ForeignKey(
+        Organization,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="passport_daily_stats",
+        help_text="The organization of the passports",
+    )
+    day = models.DateField(help_text="Day, in the timezone of the organization")
+    received_count = models.IntegerField(default=0, help_text="Passports created")
+    draft_count = models.IntegerField(default=0, help_text="Passports set to draft")
+    completed_count = models.IntegerField(default=0, help_text="Passports completed")
+    published_count = models.IntegerField(default=0, help_text="Passports published")
+    taken_count = models.IntegerField(default=0, help_text="Passports taken")
+    lost_count = models.IntegerField(default=0, help_text="Passports reported lost")
+    deleted_count = models.IntegerField(default=0, help_text="Passports deleted, less those undeleted")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["organization", "day"], name="passport_stats_org_day_uniq"),
+        ]
+
+
+    @staticmethod
+    def today(organization_id) -> date:
+        """Current day in the timezone of the organization."""
+        organization = get_organization(pk=organization_id)
+        zone = organization.timezone if organization else settings.TIME_ZONE
+        return timezone.localdate(timezone=ZoneInfo(zone))
+
+
+    @classmethod
+    def record(cls, using: str, events: dict) -> None:
+        """
+        Add `events` ({(organization id, field): count}) to today's row of
+        each organization, with one atomic UPDATE (or INSERT) per organization.
+        """
+        per_organization = defaultdict(Counter)
+        for (organization_id, field), count in events.items():
+            if organization_id is not None and count:
+                per_organization[organization_id][field] += count
+        for organization_id, counts in per_organization.items():
+            day = cls.today(organization_id)
+            rows = cls._base_manager.using(using).filter(organization_id=organization_id, day=day)
+            updates = {field: F(field) + count for field, count in counts.items() if count}
+            if not updates or rows.update(**updates):
+                continue
+            try:
+                with transaction.atomic(using=using):
+                    cls._base_manager.using(using).create(organization_id=organization_id, day=day, **counts)
+            except IntegrityError:
+                # Created meanwhile.
+                rows.update(**updates)
+
+
+    def __str__(self):
+        return f"Passport stats of {self.organization_id} on {self.day}"
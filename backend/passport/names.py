@@ -0,0 +1,63 @@
+import unicodedata
+from typing import Optional
+
+
+# Noms des titulaires
+# Formes normalisées et clés phonétiques des noms, comparées par la
+# recherche de doublons (`passport.duplicates`) et stockées sur chaque
+# passeport (`phonetic_key`, `surname_key`) pour en retrouver les blocs.
+
+# Length of Passport.surname_key
+SURNAME_KEY_LENGTH = 100
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def normalize_name(value: Optional[str]) -> str:
+    """Lowercase letters of `value`, accents and punctuation removed."""
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in value.casefold() if char.isalpha() or char == " ").strip()
+
+
+def soundex(value: str) -> str:
+    """Soundex code of a normalized name ("" when empty)."""
+    letters = value.replace(" ", "")
+    if not letters:
+        return ""
+    code, previous = letters[0], SOUNDEX_CODES.get(letters[0])
+    for char in letters[1:]:
+        digit = SOUNDEX_CODES.get(char)
+        if digit and digit != previous:
+            code += digit
+        if char not in "hw":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def swapped_name(first_name, middle_name, last_name) -> str:
+    """Normalized names, last name first."""
+    parts = (normalize_name(value) for value in (last_name, middle_name, first_name))
+    return " ".join(part for part in parts if part)
+
+
+def swapped_name_keys(swapped: str) -> tuple:
+    """(phonetic key, surname key) of a `swapped_name`: ("", "") when empty."""
+    parts = swapped.split()
+    if not parts:
+        return "", ""
+    last, first = parts[0], parts[-1]
+    return " ".join(sorted((soundex(last), soundex(first)))), last[:SURNAME_KEY_LENGTH]
+
+
+def name_keys(first_name, middle_name, last_name) -> tuple:
+    """(phonetic key, surname key) of a holder, as stored on Passport."""
+    return swapped_name_keys(swapped_name(first_name, middle_name, last_name))
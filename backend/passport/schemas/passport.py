@@ -1,6 +1,8 @@
-from typing import Optional
-from datetime import datetime
-from ninja import ModelSchema, Schema
+from typing import Literal, Optional
+from uuid import UUID
+from datetime import date, datetime
+from ninja import Field, ModelSchema, Schema
+from ninja_extra.pagination import PaginatedResponseSchema
 from passport.models import Batch, Passport
 from passport.enums import PassportStatus
 
@@ -63,7 +65,160 @@ class PassportDetailsSchema(ModelSchema):
 
     class Meta:
         model = Passport
-        fields = '__all__'
+        # Blocking keys of the duplicates: internal
+        exclude = ['phonetic_key', 'surname_key']
+
+
+class PassportSelectionSchema(Schema):
+    """
+    Passports selected by filters (see PassportService.search_and_filter_passports).
+    """
+    search: Optional[str] = None
+    status: Optional[PassportStatus] = None
+    gender: Optional[str] = None
+    batch_id: Optional[UUID] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+
+
+class PassportTransitionSchema(Schema):
+    """
+    Status change of many passports, selected by ids, by codes or by
+    filters (exactly one of them).
+    """
+    status: PassportStatus
+    ids: Optional[list[UUID]] = None
+    codes: Optional[list[str]] = None
+    filters: Optional[PassportSelectionSchema] = None
+
+
+class PassportTransitionItemSchema(Schema):
+    """
+    Outcome for one passport: updated, unchanged (already in the status),
+    not_allowed (transition refused) or not_found. `status` is the one
+    before the change.
+    """
+    id: Optional[str] = None
+    code: Optional[str] = None
+    outcome: Literal["updated", "unchanged", "not_allowed", "not_found"]
+    status: Optional[PassportStatus] = None
+
+
+class PassportTransitionResultSchema(Schema):
+    """
+    Outcomes of a bulk status change.
+    """
+    status: PassportStatus
+    updated: int
+    results: list[PassportTransitionItemSchema]
+
+
+class PassportManifestRowSchema(Schema):
+    """
+    One passport of a manifest, matched by `code` or `coupon_id`.
+    """
+    code: str
+    coupon_id: str
+    first_name: str
+    middle_name: Optional[str] = None
+    last_name: str
+    gender: str
+
+
+class PassportManifestSchema(Schema):
+    """
+    Manifest of a batch, sent again when corrected.
+    """
+    passports: list[PassportManifestRowSchema]
+
+
+class PassportManifestConflictSchema(Schema):
+    """
+    Row of the manifest left out: invalid, duplicate (in the manifest),
+    archived, ambiguous (code and coupon of two passports), matches_claimed
+    (passport matched by a previous row) or other_batch.
+    """
+    row: int
+    code: Optional[str] = None
+    coupon_id: Optional[str] = None
+    reason: str
+
+
+class PassportDuplicateSchema(Schema):
+    """
+    Row of the manifest whose holder looks like the one of another passport
+    (or row), `duplicate_of` being its code. To be reviewed.
+    """
+    row: int
+    code: str
+    duplicate_of: str
+    score: float
+
+
+class PassportManifestResultSchema(Schema):
+    """
+    Outcomes of a manifest upsert.
+    """
+    inserted: int
+    updated: int
+    restored: int
+    unchanged: int
+    conflicts: list[PassportManifestConflictSchema]
+    duplicates: list[PassportDuplicateSchema] = []
+
+
+class PassportImportRowSchema(Schema):
+    """
+    One row of an import, as received: checked once loaded.
+    """
+    code: Optional[str] = None
+    coupon_id: Optional[str] = None
+    first_name: Optional[str] = None
+    middle_name: Optional[str] = None
+    last_name: Optional[str] = None
+    gender: Optional[str] = None
+
+
+class PassportImportCreateSchema(Schema):
+    """
+    Passports to import into a batch.
+    """
+    batch_id: UUID
+    passports: list[PassportImportRowSchema]
+
+
+class PassportImportSchema(Schema):
+    """
+    Import of passports: rows loaded, valid, errors found, passports
+    inserted once promoted.
+    """
+    id: UUID
+    batch_id: UUID
+    status: str
+    total_rows: int
+    valid_rows: int
+    error_count: int
+    inserted_rows: int
+    created_at: datetime
+    promoted_at: Optional[datetime] = None
+
+
+class PassportImportErrorSchema(Schema):
+    """
+    Error of an import (`line` empty for the whole import).
+    """
+    line: Optional[int] = None
+    field: str
+    error: str
+    value: Optional[str] = None
+
+
+class PassportPageSchema(PaginatedResponseSchema[PassportDetailsSchema]):
+    """
+    Page of the passport list, with the counts per value of the requested
+    facets over the whole result set.
+    """
+    facets: Optional[dict[str, dict[str, int]]] = None
 
 
 class PassportCreateSchema(ModelSchema):
@@ -137,6 +292,13 @@ class PassportFilterSchema(Schema):
     taken_at: Optional[datetime] = None
     code: Optional[str] = None
     coupon_id: Optional[str] = None
+    organization_id: Optional[str] = None
+    include_archived: Optional[bool] = None
+    search: Optional[str] = None
+    facets: Optional[str] = Field(
+        None,
+        description="Comma-separated facets to count over the whole result set: status, gender, batch",
+    )
 
 
 class PassportStatusUpdateSchema(Schema):
@@ -146,3 +308,72 @@ class PassportStatusUpdateSchema(Schema):
     """
     status: PassportStatus
 
+
+
+class PublicPassportSchema(Schema):
+    """
+    Schema exposed to citizens by the public lookup.
+    Only what is needed to know whether a passport can be collected.
+    """
+    first_name: str
+    middle_name: Optional[str] = None
+    last_name: str
+    status: PassportStatus
+    published_at: Optional[datetime] = None
+    received_date: date
+
+
+class PublicPassportCountsSchema(Schema):
+    """
+    Number of published passports per status, shown on the public portal
+    (passports not published yet are not shown).
+    """
+    published: int
+    lost: int
+    taken: int
+
+
+class PassportTotalsSchema(Schema):
+    """
+    Current number of passports of an organization per status
+    (sum of the batch counters).
+    """
+    draft_count: int
+    completed_count: int
+    published_count: int
+    taken_count: int
+    lost_count: int
+    total_count: int
+
+
+class PassportEventsSchema(Schema):
+    """
+    Number of passports received, entering each status and deleted.
+    """
+    received_count: int
+    draft_count: int
+    completed_count: int
+    published_count: int
+    taken_count: int
+    lost_count: int
+    deleted_count: int
+
+
+class PassportDayStatsSchema(PassportEventsSchema):
+    """
+    Passport events of one day, in the timezone of the organization.
+    """
+    day: date
+
+
+class PassportDashboardSchema(Schema):
+    """
+    Dashboard of an organization: tiles (current totals, totals of the
+    period) and daily series of the last `days` days.
+    """
+    organization: str
+    timezone: str
+    today: date
+    totals: PassportTotalsSchema
+    period: PassportEventsSchema
+    series: list[PassportDayStatsSchema]
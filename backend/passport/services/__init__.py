@@ -1,2 +1,5 @@
 from .passport import *
 
+from .dashboard import *
+
+from .imports import *
@@ -0,0 +1,55 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from organisations.models import Organization
+from organisations.sharding import shard_for
+from passport.models import COUNTER_FIELDS, STATS_FIELDS, Batch, PassportDailyStats
+
+
+
+class DashboardService:
+    """
+    Service class serving the passport dashboard of an organization from
+    the pre-aggregated tables (batch counters, daily stats) only.
+    """
+
+    def dashboard(self, organization: Organization, days: int = 30) -> dict:
+        """
+        Current totals, totals of the last `days` days and their daily
+        series (days in the timezone of the organization, missing days
+        filled with zeros).
+        """
+
+        alias = shard_for(organization)
+        today = timezone.localdate(timezone=ZoneInfo(organization.timezone))
+        start = today - timedelta(days=days - 1)
+
+        totals = Batch._base_manager.using(alias).filter(
+            organization_id=organization.pk, deleted__isnull=True
+        ).aggregate(**{field: Coalesce(Sum(field), 0) for field in COUNTER_FIELDS})
+
+        rows = {
+            row["day"]: row
+            for row in PassportDailyStats._base_manager.using(alias).filter(
+                organization_id=organization.pk, day__range=(start, today)
+            ).values("day", *STATS_FIELDS)
+        }
+        empty = dict.fromkeys(STATS_FIELDS, 0)
+        series = [
+            rows.get(day, {"day": day, **empty})
+            for day in (start + timedelta(days=offset) for offset in range(days))
+        ]
+        period = {field: sum(row[field] for row in series) for field in STATS_FIELDS}
+
+        return {
+            "organization": organization.slug,
+            "timezone": organization.timezone,
+            "today": today,
+            "totals": totals,
+            "period": period,
+            "series": series,
+        }
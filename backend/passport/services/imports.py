@@ -0,0 +1,55 @@
+from django.core.exceptions import ValidationError
+from django.db.models import QuerySet
+from organisations.context import get_current_organization
+from passport.imports import load_import, promote_import
+from passport.ingest import ingest_passports, parse_rows
+from passport.models import Batch, PassportImport, PassportImportError
+
+
+
+class PassportImportService:
+    """
+    Service class to handle the passport imports of the current
+    organization: load and validate, errors, promotion.
+    """
+
+    def create(self, batch_id, rows: list) -> PassportImport:
+        """Load `rows` into a new import into the batch, then validate them."""
+
+        batch = Batch.objects.filter(id=batch_id).first()
+        if batch is None:
+            raise ValidationError("Unknown batch.")
+        return load_import(batch, rows)
+
+
+    def ingest(self, batch_id, lines, content_type: str, check_duplicates: bool = False) -> tuple:
+        """
+        Start the ingestion of a streamed body (`lines`, NDJSON or CSV) into
+        the batch. Returns the job and the iterator of the row results.
+        """
+
+        batch = Batch.objects.filter(id=batch_id).first()
+        if batch is None:
+            raise ValidationError("Unknown batch.")
+        return ingest_passports(batch, parse_rows(lines, content_type), check_duplicates=check_duplicates)
+
+
+    def get(self, import_id) -> PassportImport:
+        """Retrieve an import of the current organization by its ID."""
+
+        return PassportImport.objects.filter(organization=get_current_organization()).get(id=import_id)
+
+
+    def errors(self, import_id) -> QuerySet[PassportImportError]:
+        """Errors of an import, by line."""
+
+        passport_import = self.get(import_id)
+        return PassportImportError.objects.using(passport_import._state.db).filter(
+            passport_import=passport_import
+        ).order_by("line", "pk")
+
+
+    def promote(self, import_id) -> PassportImport:
+        """Insert the valid rows of an import as passports (see `promote_import`)."""
+
+        return promote_import(self.get(import_id))
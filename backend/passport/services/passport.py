@@ -1,9 +1,73 @@
+import hashlib
+from collections import Counter
 from datetime import datetime
 from typing import Optional
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Paginator
 from django.utils import timezone
-from django.db.models import Q, QuerySet
-from passport.enums import PassportStatus, BatchStatus
-from passport.models import Passport, Batch
+from django.db import router, transaction
+from django.db.models import Count, F, Q, QuerySet
+from django.db.models.functions import Coalesce
+from organisations.context import get_current_organization, use_organization
+from organisations.sharding import organization_gather, organization_results
+from passport.enums import PASSPORT_TRANSITIONS, PassportStatus, BatchStatus
+from passport.models import COUNTER_FIELDS, STATUS_COUNTERS, Passport, Batch, PassportRecord
+from passport.counters import update_passport_status
+from passport.manifests import upsert_passports
+from passport.caches import bump_passport_data_version, purge_public_passports, search_data_versions
+from passport.warmup import announce_batch
+from utils_mixins.background import run_in_background
+from utils_mixins.caches import VersionedResults
+from utils_mixins.db_routers import max_staleness
+from utils_mixins.singleflight import SingleFlight
+
+
+# Identical concurrent public lookups share one query and one serialization
+public_lookup_flight = SingleFlight(
+    prefix="passport:public_lookup",
+    distributed=settings.SINGLE_FLIGHT_DISTRIBUTED,
+)
+
+
+# Facets of the passport list: {name: grouped field}
+PASSPORT_FACETS = {
+    "status": "status",
+    "gender": "gender",
+    "batch": "batch_id",
+}
+
+
+def parse_facets(facets: Optional[str]) -> list:
+    """Facet names of the comma-separated `facets`, sorted. Raises ValidationError on unknown ones."""
+    names = sorted({name.strip() for name in (facets or "").split(",") if name.strip()})
+    unknown = set(names) - set(PASSPORT_FACETS)
+    if unknown:
+        raise ValidationError(
+            f"Unknown facets: {', '.join(sorted(unknown))} (available: {', '.join(PASSPORT_FACETS)})"
+        )
+    return names
+
+
+# Passports changed at most by one bulk status transition
+BULK_TRANSITION_LIMIT = 5000
+
+
+# Statuses counted publicly: those of passports once published (see PublicPassportCountsSchema)
+PUBLIC_STATUSES = (PassportStatus.PUBLISHED, PassportStatus.TAKEN, PassportStatus.LOST)
+
+
+# Passport fields exposed by the public lookup (see PublicPassportSchema)
+PUBLIC_PASSPORT_FIELDS = (
+    "first_name", "middle_name", "last_name", "status", "published_at",
+)
+
+
+def normalize_search(search: Optional[str]) -> Optional[str]:
+    """Normalize a search term so that equivalent queries share a key."""
+    if not search:
+        return None
+    return " ".join(search.split()).casefold() or None
 
 
 
@@ -17,7 +81,12 @@ class PassportService:
     def create(self, **kwargs) -> Passport:
         """Create a new Passport with the given fields."""
 
-        return Passport.objects.create(**kwargs)
+        passport = Passport.objects.create(**kwargs)
+        purge_public_passports(
+            passport.batch,
+            counts_only=passport.status != PassportStatus.PUBLISHED,
+        )
+        return passport
 
 
     def update(self, passport_id: int, **kwargs) -> Passport:
@@ -27,6 +96,7 @@ class PassportService:
         for key, value in kwargs.items():
             setattr(passport, key, value)
         passport.save()
+        purge_public_passports(passport.batch)
         return passport
 
 
@@ -36,9 +106,99 @@ class PassportService:
         passport = Passport.objects.get(id=passport_id)
         passport.status = status
         passport.save()
+        purge_public_passports(passport.batch)
         return passport
     
 
+    def transition(
+        self,
+        status: PassportStatus,
+        ids: Optional[list] = None,
+        codes: Optional[list] = None,
+        filters: Optional[dict] = None,
+    ) -> dict:
+        """
+        Move the passports selected by `ids`, `codes` or `filters` (one of
+        them, see `search_and_filter_passports`) to `status`, in one
+        transaction. Only the transitions of PASSPORT_TRANSITIONS are
+        applied, by the UPDATE itself (WHERE status IN ...); `published_at`
+        (when not set yet) and `taken_at` are set alike.
+        Returns {"status", "updated", "results": [{"id", "code", "outcome",
+        "status"}]}, outcome being updated, unchanged, not_allowed or
+        not_found (status: the one before the call).
+        Only the passports of the current organization are selected.
+        """
+
+        organization = get_current_organization()
+        if not organization:
+            raise ValidationError("Transitions need a current organization (X-Organization-ID).")
+        status = PassportStatus(status)
+        selectors = [selector for selector in (ids, codes, filters) if selector]
+        if len(selectors) != 1:
+            raise ValidationError("Select the passports with exactly one of ids, codes or filters.")
+
+        if ids:
+            requested, field = list(dict.fromkeys(str(pk) for pk in ids)), "id"
+            selection = Passport.objects.filter(pk__in=requested)
+        elif codes:
+            requested, field = list(dict.fromkeys(codes)), "code"
+            selection = Passport.objects.filter(code__in=requested)
+        else:
+            requested, field = None, None
+            filters = {name: value for name, value in filters.items() if value is not None}
+            selection = self.search_and_filter_passports(filters.pop("search", None), **filters)
+        selection = selection.filter(organization_id=organization.pk)
+        if requested is not None and len(requested) > BULK_TRANSITION_LIMIT:
+            raise ValidationError(f"At most {BULK_TRANSITION_LIMIT} passports per transition.")
+
+        sources = [source.value for source in PASSPORT_TRANSITIONS[status]]
+        now = timezone.now()
+        values = {"updated_at": now}
+        if status == PassportStatus.PUBLISHED:
+            values["published_at"] = Coalesce(F("published_at"), now)
+        elif status == PassportStatus.TAKEN:
+            values["taken_at"] = now
+
+        with transaction.atomic(using=router.db_for_write(Passport)):
+            # Locked: the outcomes are those of the UPDATE.
+            rows = list(
+                selection.select_for_update().order_by("pk")
+                .values_list("pk", "code", "status", "batch_id")[:BULK_TRANSITION_LIMIT + 1]
+            )
+            if len(rows) > BULK_TRANSITION_LIMIT:
+                raise ValidationError(f"At most {BULK_TRANSITION_LIMIT} passports per transition.")
+            allowed = {pk for pk, _, current, _ in rows if current in sources}
+            updated = update_passport_status(
+                Passport.objects.filter(organization_id=organization.pk, pk__in=allowed, status__in=sources),
+                status.value,
+                **values,
+            ) if allowed else 0
+
+            batches = list(Batch.objects.filter(pk__in={row[3] for row in rows if row[0] in allowed}))
+            for batch in batches:
+                bump_passport_data_version(batch)
+            purge_public_passports(*batches)
+
+        found = {str(pk) if field == "id" else code: (pk, code, current) for pk, code, current, _ in rows}
+        results = []
+        for key in (found if requested is None else requested):
+            if key not in found:
+                results.append({
+                    "id": key if field == "id" else None,
+                    "code": key if field == "code" else None,
+                    "outcome": "not_found",
+                    "status": None,
+                })
+                continue
+            pk, code, current = found[key]
+            if current == status.value:
+                outcome = "unchanged"
+            else:
+                outcome = "updated" if current in sources else "not_allowed"
+            results.append({"id": str(pk), "code": code, "outcome": outcome, "status": current})
+        return {"status": status.value, "updated": updated, "results": results}
+
+
     def get(self, passport_id: int) -> Passport:
         """Retrieve a single Passport by its ID."""
         
@@ -49,6 +209,7 @@ class PassportService:
 
         passport = Passport.objects.get(id=passport_id)
         passport.delete()
+        purge_public_passports(passport.batch)
         return True
 
 
@@ -58,16 +219,39 @@ class PassportService:
         passport.status = PassportStatus.PUBLISHED
         passport.published_at = published_at or timezone.now()
         passport.save()
+        purge_public_passports(passport.batch)
         return passport
     
 
-    def search_and_filter_passports(self, search=None, **kwargs) -> QuerySet[Passport]:
+    def search_and_filter_passports(self, search=None, include_archived=False, **kwargs) -> QuerySet[Passport]:
         """
         Search and filter passports.
         Supports text search on multiple fields and additional filtering via kwargs.
+        With `include_archived`, archived passports are searched too (PassportRecord).
+        """
+
+        qs = self._search((PassportRecord if include_archived else Passport).objects.all(), search)
+        if kwargs:
+            qs = qs.filter(**kwargs)
+        return qs
+
+
+    def public_passports(self, search=None, **kwargs) -> QuerySet[Passport]:
+        """
+        `search_and_filter_passports` of every organization, whatever the
+        current one (X-Organization-ID): public responses are shared by
+        every visitor, they are scoped by their `organization_id` only.
         """
 
-        qs = Passport.objects.all()
+        qs = self._search(Passport._base_manager.filter(deleted__isnull=True), search)
+        if kwargs:
+            qs = qs.filter(**kwargs)
+        return qs
+
+
+    def _search(self, qs: QuerySet, search=None) -> QuerySet:
+        """`qs` restricted to the passports matching the text `search`."""
+
         if search:
             qs = qs.filter(
                 Q(code__icontains=search)
@@ -80,11 +264,184 @@ class PassportService:
                 | Q(published_at__icontains=search)
                 | Q(batch__received_date__icontains=search)
             )
-        if kwargs:
-            qs = qs.filter(**kwargs)
         return qs
 
 
+    def cached_search_and_filter_passports(
+        self,
+        search=None,
+        organization_id: Optional[str] = None,
+        include_archived=False,
+        facets: Optional[str] = None,
+        **kwargs,
+    ) -> VersionedResults:
+        """
+        `search_and_filter_passports` scoped to an organization (slug, the
+        current organization by default), with its count and pages cached
+        until the organization's data version is bumped by a passport or
+        batch write.
+        With `facets` (comma-separated names of PASSPORT_FACETS), the counts
+        per value of each facet are computed (cached alike) and set as the
+        `facets` attribute of the results: {facet: {value: count}}.
+        """
+
+        current = get_current_organization()
+        tenant = current.slug if current else None
+        organization_id = organization_id or tenant
+        search = normalize_search(search)
+        filters = {name: value for name, value in kwargs.items() if value is not None}
+        include_archived = bool(include_archived)
+        qs = self.search_and_filter_passports(search, include_archived, **filters).select_related(
+            "batch"
+        ).order_by("-created_at", "pk")
+
+        # The tenant manager filters on the current organization too.
+        params = repr((tenant, organization_id, search, include_archived, sorted(filters.items())))
+        results = VersionedResults(
+            organization_results(qs, organization_id),
+            key=f"passport:search:{hashlib.md5(params.encode()).hexdigest()}",
+            namespaces=search_data_versions(organization_id),
+            timeout=settings.SEARCH_CACHE_TIMEOUT,
+            cache_alias="search",
+            settle_time=max_staleness(),
+        )
+
+        names = parse_facets(facets)
+        if names:
+            # Batch counters: every passport of the batches, archived ones included.
+            from_counters = include_archived and not search and not filters and set(names) <= {"status", "batch"}
+            results.facets = results.cached(
+                f"facets:{','.join(names)}",
+                lambda: (
+                    self._counter_facets(names, organization_id) if from_counters
+                    else self._facets(qs, names, organization_id)
+                ),
+            )
+        return results
+
+
+    def _facets(self, qs, names: list, organization_id: Optional[str]) -> dict:
+        """Counts per facet value, in one aggregate query (per shard) grouped by every facet."""
+
+        fields = [PASSPORT_FACETS[name] for name in names]
+        grouped = Counter()
+        for rows in organization_gather(
+            qs.order_by(),
+            lambda qs: list(qs.values_list(*fields).annotate(total=Count("pk")).order_by()),
+            organization_id,
+        ):
+            grouped.update({tuple(row[:-1]): row[-1] for row in rows})
+
+        facets = {name: Counter() for name in names}
+        for values, total in grouped.items():
+            for name, value in zip(names, values):
+                facets[name][str(value)] += total
+        return {name: dict(counts) for name, counts in facets.items()}
+
+
+    def _counter_facets(self, names: list, organization_id: Optional[str]) -> dict:
+        """Status and batch facets of every passport, from the batch counters."""
+
+        facets = {name: Counter() for name in names}
+        for rows in organization_gather(
+            Batch.objects.all(),
+            lambda qs: list(qs.values("pk", *COUNTER_FIELDS)),
+            organization_id,
+        ):
+            for row in rows:
+                if "batch" in facets and row["total_count"]:
+                    facets["batch"][str(row["pk"])] += row["total_count"]
+                if "status" in facets:
+                    for status, field in STATUS_COUNTERS.items():
+                        if row[field]:
+                            facets["status"][status] += row[field]
+        return {name: dict(counts) for name, counts in facets.items()}
+
+
+    def public_lookup(
+        self,
+        organization_id: Optional[str] = None,
+        search: Optional[str] = None,
+        last_name_initial: Optional[str] = None,
+        coupon_prefix: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 20,
+    ) -> dict:
+        """
+        Look up published passports for citizens, by search term, by surname
+        initial (as on the printed lists) or by coupon prefix.
+        Returns a serialized page:
+        {"count": int, "results": [dict, ...], "has_next": bool, "batch_ids": [...]}.
+        Identical concurrent lookups are coalesced into a single query.
+        """
+
+        search = normalize_search(search)
+        last_name_initial = normalize_search(last_name_initial)
+        coupon_prefix = (coupon_prefix or "").strip() or None
+        args = (organization_id, search, last_name_initial, coupon_prefix, page, page_size)
+        key = hashlib.md5("|".join(map(str, args)).encode()).hexdigest()
+        # Shared by every caller: the organization of the request (header)
+        # must not restrict it, nor pick its shard.
+        with use_organization(None):
+            return public_lookup_flight.do(key, self._public_lookup_page, *args)
+
+
+    def _public_lookup_page(
+        self, organization_id, search, last_name_initial, coupon_prefix, page, page_size
+    ) -> dict:
+        """Internal helper executing and serializing one public lookup page."""
+
+        filters = {"status": PassportStatus.PUBLISHED}
+        if last_name_initial:
+            filters["last_name__istartswith"] = last_name_initial
+        if coupon_prefix:
+            filters["coupon_id__startswith"] = coupon_prefix
+
+        qs = self.public_passports(search, **filters).order_by(
+            "last_name", "first_name", "pk"
+        ).values(
+            *PUBLIC_PASSPORT_FIELDS,
+            "pk",
+            "batch_id",
+            received_date=F("batch__received_date"),
+        )
+
+        paginator = Paginator(organization_results(qs, organization_id), page_size)
+        try:
+            page_obj = paginator.page(page)
+        except EmptyPage:
+            return {"count": paginator.count, "results": [], "has_next": False, "batch_ids": []}
+
+        results = list(page_obj)
+        batch_ids = {row.pop("batch_id") for row in results}
+        for row in results:
+            del row["pk"]
+        return {
+            "count": paginator.count,
+            "results": results,
+            "has_next": page_obj.has_next(),
+            "batch_ids": sorted(str(batch_id) for batch_id in batch_ids),
+        }
+
+
+    def public_counts(self, organization_id: Optional[str] = None) -> dict:
+        """
+        Number of published passports per status (published, then taken or
+        lost: PASSPORT_TRANSITIONS), for one organization or all of them.
+        Passports never published are not counted.
+        """
+
+        counts = Counter()
+        with use_organization(None):
+            for rows in organization_gather(
+                self.public_passports(status__in=PUBLIC_STATUSES),
+                lambda qs: list(qs.values_list("status").annotate(total=Count("pk")).order_by()),
+                organization_id,
+            ):
+                counts.update(dict(rows))
+        return {status.value: counts.get(status.value, 0) for status in PUBLIC_STATUSES}
+
+
 
 class BatchService:
     """
@@ -98,6 +455,12 @@ class BatchService:
         return Batch.objects.create(received_date=received_date)
 
 
+    def get(self, batch_id) -> Optional[Batch]:
+        """Retrieve a single Batch by its ID, None if not found."""
+
+        return Batch.objects.filter(id=batch_id).first()
+
+
     def update(self, batch_id, received_date: datetime | None = None) -> Batch:
         """Update an existing Batch's received_date by ID."""
 
@@ -105,6 +468,7 @@ class BatchService:
         if received_date:
             batch.received_date = received_date
             batch.save()
+            purge_public_passports(batch)
         return batch
 
 
@@ -115,9 +479,26 @@ class BatchService:
         if batch.status == BatchStatus.PUBLISHED:
             raise ValueError("Cannot delete a published batch. Archive it instead.")
         batch.delete()
+        purge_public_passports(batch)
         return True
 
 
+    def upsert_passports(self, batch_id, rows: list, check_duplicates: bool = False) -> Optional[dict]:
+        """
+        Insert or update the passports of a (corrected) manifest of the
+        batch, see `upsert_passports`. Only the batches of the current
+        organization are found: None otherwise.
+        """
+
+        organization = get_current_organization()
+        if not organization:
+            raise ValidationError("Manifests need a current organization (X-Organization-ID).")
+        batch = Batch.objects.filter(id=batch_id, organization_id=organization.pk).first()
+        if batch is None:
+            return None
+        return upsert_passports(batch, rows, check_duplicates=check_duplicates)
+
+
     def search_and_filter_batches(self, search: str = None, **kwargs) -> QuerySet[Batch]:
         """Search and filter batches. Supports text search and dynamic filtering."""
 
@@ -142,28 +523,45 @@ class BatchService:
     def publish(self, batch_id: int, all: bool = True) -> bool:
         """
         Publish passports within a batch.
-        - If all=True, publish all passports in the batch.
+        - If all=True, publish every passport allowed to become published
+          (PASSPORT_TRANSITIONS: completed and lost); drafts and taken
+          passports are left as they are.
         - Otherwise, only publish passports with status COMPLETED.
         Updates the batch status accordingly.
+        Once committed, the public caches are warmed before `batch_published` is sent.
         """
 
-        batch = Batch.objects.get(id=batch_id)
+        # One transaction on the shard of the current organization.
+        with transaction.atomic(using=router.db_for_write(Batch)):
+            return self._publish(batch_id, all)
+
+
+    def _publish(self, batch_id: int, all: bool) -> bool:
+        # Locked: its counters are read after the update.
+        batch = Batch.objects.select_for_update().get(id=batch_id)
         if batch.status == BatchStatus.PUBLISHED:
             raise ValueError("This batch is already published and cannot be republished.")
-
-        passports = Passport.objects.filter(batch=batch)
-        if not passports.exists():
+        if not batch.total_count:
             raise ValueError("No passports found in this batch.")
 
-        to_publish = passports if all else passports.filter(status=PassportStatus.COMPLETED)
-        if not to_publish.exists():
+        passports = Passport.objects.filter(batch=batch)
+        sources = PASSPORT_TRANSITIONS[PassportStatus.PUBLISHED] if all else [PassportStatus.COMPLETED]
+        to_publish = passports.filter(status__in=[source.value for source in sources])
+        # Already published passports keep their publication date.
+        updated_count = update_passport_status(
+            to_publish, PassportStatus.PUBLISHED, published_at=Coalesce(F("published_at"), timezone.now())
+        )
+        if not updated_count:
             return False
 
-        updated_count = to_publish.update(status=PassportStatus.PUBLISHED)
-
-        total = passports.count()
-        published_count = passports.filter(status=PassportStatus.PUBLISHED).count()
-        batch.status = BatchStatus.PUBLISHED if published_count == total and total > 0 else BatchStatus.PROCESSING
+        batch.refresh_from_db(fields=COUNTER_FIELDS)
+        published = batch.published_count == batch.total_count
+        batch.status = BatchStatus.PUBLISHED if published else BatchStatus.PROCESSING
         batch.save()
+        purge_public_passports(batch)
+        # Préchauffage hors de la requête, comme la cascade de suppression.
+        transaction.on_commit(
+            lambda: run_in_background(announce_batch, batch), using=batch._state.db, robust=True
+        )
 
         return updated_count > 0
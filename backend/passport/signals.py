@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_migrate
+from django.dispatch import Signal, receiver
+from passport.models import Batch, Passport, PassportDailyStats
+from passport.archive import create_record_view, drop_record_view
+from passport.caches import bump_passport_data_version, purge_public_passports
+from passport.counters import count_passports
+from utils_mixins.soft_delete import bulk_soft_deleted
+
+
+# Sent once a published batch is visible and the public caches are warm.
+# Arguments: batch.
+batch_published = Signal()
+
+
+@receiver(post_save, sender=Batch)
+@receiver(post_delete, sender=Batch)
+def batch_changed(sender, instance, **kwargs):
+    bump_passport_data_version(instance)
+
+
+@receiver(post_save, sender=Passport)
+@receiver(post_delete, sender=Passport)
+def passport_changed(sender, instance, **kwargs):
+    bump_passport_data_version(instance.batch)
+
+
+@receiver(post_delete, sender=Passport)
+def passport_deleted(sender, instance, **kwargs):
+    if instance.deleted is None:
+        Batch.count_passports(instance._state.db, {(instance.batch_id, instance.status): -1})
+        PassportDailyStats.record(instance._state.db, {(instance.organization_id, "deleted_count"): 1})
+
+
+@receiver(bulk_soft_deleted, sender=Batch)
+@receiver(bulk_soft_deleted, sender=Passport)
+def passports_soft_deleted(sender, using, lookup, undelete, **kwargs):
+    rows = sender._base_manager.using(using).filter(**lookup)
+    if sender is Passport:
+        count_passports(rows, 1 if undelete else -1)
+    batch_ids = rows.values("pk") if sender is Batch else rows.values("batch_id")
+    batches = list(Batch._base_manager.using(using).filter(pk__in=batch_ids))
+    for batch in batches:
+        bump_passport_data_version(batch)
+    purge_public_passports(*batches)
+
+
+@receiver(pre_migrate)
+def drop_passport_views(sender, using, **kwargs):
+    if sender.label == "passport":
+        drop_record_view(using)
+
+
+@receiver(post_migrate)
+def create_passport_views(sender, using, **kwargs):
+    if sender.label == "passport":
+        create_record_view(using)
@@ -0,0 +1,55 @@
+import logging
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+from organisations.models import Organization
+from organisations.sharding import shard_for
+from passport.enums import PassportStatus
+from passport.models import ArchivedPassport, Passport, PassportDailyStats
+
+
+logger = logging.getLogger(__name__)
+
+
+# Statistiques journalières
+# Reconstruites depuis les dates des passeports (vivants et archivés), dans
+# le fuseau de l'organisation: création, publication, retrait, perte
+# (dernière modification des perdus), suppression. Les passages en
+# brouillon ou complété n'ont pas de date: ils ne sont pas reconstruits.
+
+BACKFILL_DATES = {
+    "received_count": ("created_at", {}),
+    "published_count": ("published_at", {"published_at__isnull": False}),
+    "taken_count": ("taken_at", {"taken_at__isnull": False}),
+    "lost_count": ("updated_at", {"status": PassportStatus.LOST}),
+    "deleted_count": ("deleted", {"deleted__isnull": False}),
+}
+
+
+def backfill_organization_stats(organization: Organization) -> int:
+    """Rebuild the daily stats of `organization`. Returns the number of days written."""
+    alias = shard_for(organization)
+    zone = ZoneInfo(organization.timezone)
+    days = defaultdict(dict)
+    for model in (Passport, ArchivedPassport):
+        passports = model._base_manager.using(alias).filter(organization_id=organization.pk)
+        for field, (column, lookup) in BACKFILL_DATES.items():
+            rows = passports.filter(**lookup).annotate(day=TruncDate(column, tzinfo=zone)).values_list(
+                "day"
+            ).annotate(count=Count("pk")).order_by()
+            for day, count in rows:
+                days[day][field] = days[day].get(field, 0) + count
+
+    with transaction.atomic(using=alias):
+        stats = PassportDailyStats._base_manager.using(alias)
+        stats.filter(organization_id=organization.pk).delete()
+        stats.bulk_create([
+            PassportDailyStats(organization_id=organization.pk, day=day, **counts)
+            for day, counts in sorted(days.items())
+        ])
+    logger.info("Daily stats of %s rebuilt (%d days)", organization.slug, len(days))
+    return len(days)
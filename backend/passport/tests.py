@@ -1,3 +1,710 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import uuid
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from organisations.base import NullOrganization
+from organisations.context import (
+    get_current_organization, reset_current_organization, set_current_organization, use_organization,
+)
+from organisations.models import Organization, OrganizationUser
+from passport.archive import archive_passports
+from passport.caches import purge_public_passports
+from passport.counters import COUNTER_FIELDS, expected_counters, update_passport_status
+from passport.duplicates import scan_organization
+from passport.enums import BatchStatus, PassportStatus
+from passport.manifests import stream_upsert
+from passport.models import ArchivedPassport, Batch, Passport, PassportDailyStats, PassportImport, PassportRecord
+from passport.services.passport import BatchService, PassportService
+from passport.stats import backfill_organization_stats
+from passport.warmup import PUBLIC_COUNTS_PATH, PUBLIC_LOOKUP_PATH, announce_batch, warm_batch
+from utils_mixins.db_routers import PIN_COOKIE
+from utils_mixins.soft_delete import bulk_soft_delete, purge_soft_deleted, purgeable
+
+
+LOCMEM_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"tests-{alias}"}
+    for alias in ("default", "search")
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class PassportTestCase(TestCase):
+    """An organization with a batch of passports; caches in memory."""
+
+    # Cascades and counters run on every shard (DATABASE_SHARD_URLS);
+    # replicas mirror the primary.
+    databases = set(settings.DATABASE_SHARDS)
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.organization = Organization.objects.create(name="Consulat", slug="consulat")
+        self.batch = Batch.objects.create(organization=self.organization)
+
+    def assertCountersConsistent(self, batch=None):
+        batch = batch or self.batch
+        batch.refresh_from_db(fields=COUNTER_FIELDS)
+        counters = {field: getattr(batch, field) for field in COUNTER_FIELDS}
+        self.assertEqual(counters, expected_counters("default", [batch.pk])[batch.pk])
+        return counters["total_count"]
+
+    def create_passports(self, count: int, batch=None, status=PassportStatus.DRAFT, prefix="P") -> list:
+        batch = batch or self.batch
+        return [
+            Passport.objects.create(
+                batch=batch,
+                code=f"{prefix}{batch.pk.hex[:6]}{i:04d}",
+                coupon_id=f"C{prefix}{batch.pk.hex[:6]}{i:04d}",
+                first_name="Jean",
+                last_name=f"Kabila{i}",
+                gender="M",
+                status=status,
+            )
+            for i in range(count)
+        ]
+
+
+def member(organization, email="agent@mae.cd", password="secret"):
+    """A user of `organization`, and the basic-auth headers of its requests."""
+    user = get_user_model().objects.create_user(email=email, password=password)
+    OrganizationUser.objects.create(organization=organization, user=user)
+    credentials = base64.b64encode(f"{email}:{password}".encode()).decode()
+    return user, {"HTTP_AUTHORIZATION": f"Basic {credentials}", "HTTP_X_ORGANIZATION_ID": organization.slug}
+
+
+class SoftDeleteCounterTests(PassportTestCase):
+    """Batch counters through set-based soft delete and undelete."""
+
+    def setUp(self):
+        super().setUp()
+        self.passports = self.create_passports(2) + self.create_passports(1, status=PassportStatus.COMPLETED, prefix="Q")
+
+    def test_batch_delete_and_undelete(self):
+        self.passports[0].delete()
+        self.assertEqual(self.assertCountersConsistent(), 2)
+
+        self.batch.delete()
+        self.assertEqual(Passport.objects.count(), 0)
+        self.assertEqual(self.assertCountersConsistent(), 0)
+
+        # Only what the cascade deleted comes back.
+        Batch.all_objects.get(pk=self.batch.pk).undelete()
+        self.assertEqual(Passport.objects.count(), 2)
+        self.assertEqual(self.assertCountersConsistent(), 2)
+
+    def test_passports_restored_before_their_batch_are_counted_once(self):
+        self.batch.delete()
+        Passport.all_objects.get(pk=self.passports[1].pk).undelete()
+        self.assertEqual(self.assertCountersConsistent(), 1)
+
+        Batch.all_objects.get(pk=self.batch.pk).undelete()
+        self.assertEqual(self.assertCountersConsistent(), 3)
+
+    def test_bulk_soft_delete(self):
+        other = Batch.objects.create(organization=self.organization)
+        self.create_passports(2, batch=other, prefix="R")
+        counts = bulk_soft_delete(Batch.objects.all())
+        self.assertEqual(counts, {"passport.Batch": 2, "passport.Passport": 5})
+        self.assertEqual(self.assertCountersConsistent(), 0)
+
+        bulk_soft_delete(Batch.all_objects.filter(pk=other.pk), undelete=True)
+        self.assertEqual(self.assertCountersConsistent(other), 2)
+        self.assertEqual(self.assertCountersConsistent(), 0)
+
+    def test_protect_and_set_relations_are_left_to_safedelete(self):
+        # LogEntry.content_type is SET_NULL.
+        with self.assertRaises(ValueError):
+            bulk_soft_delete(ContentType.objects.all())
+        with mock.patch("utils_mixins.soft_delete.needs_collector", return_value=True):
+            self.batch.delete()
+        self.assertEqual(Passport.objects.count(), 0)
+        self.assertEqual(self.assertCountersConsistent(), 0)
+
+
+class PurgeSoftDeletedTests(PassportTestCase):
+    """Purge of the rows soft-deleted before the retention."""
+
+    def test_rows_still_referenced_are_kept(self):
+        empty = Batch.objects.create(organization=self.organization)
+        self.create_passports(2)
+        bulk_soft_delete(Batch.objects.all())
+        later = timezone.now() + timezone.timedelta(seconds=1)
+
+        self.assertIn("EXISTS", str(purgeable(Batch, later).query))
+        self.assertEqual(list(purgeable(Batch, later).values_list("pk", flat=True)), [empty.pk])
+
+        self.assertEqual(purge_soft_deleted(Passport, later)[0], 2)
+        self.assertEqual(purge_soft_deleted(Batch, later)[0], 2)
+        self.assertFalse(Batch.all_objects.exists())
+
+    def test_rows_deleted_after_the_retention_are_kept(self):
+        before = timezone.now()
+        self.batch.delete()
+        self.assertEqual(purge_soft_deleted(Batch, before)[0], 0)
+
+
+class ArchiveTests(PassportTestCase):
+    """Taken, lost and old passports moved to the archive."""
+
+    def test_archivable_passports_are_moved(self):
+        taken, lost, draft, published = self.create_passports(4)
+        taken.delete()
+        passports = Passport.all_objects.filter
+        update_passport_status(passports(pk=taken.pk), PassportStatus.TAKEN)
+        passports(pk=taken.pk).update(updated_at=timezone.now() - timezone.timedelta(days=31))
+        update_passport_status(passports(pk=lost.pk), PassportStatus.LOST)
+        update_passport_status(
+            passports(pk=published.pk),
+            PassportStatus.PUBLISHED,
+            published_at=timezone.now() - timezone.timedelta(days=3 * 365),
+        )
+
+        self.assertEqual(archive_passports(chunk_size=1), 2)
+        self.assertEqual(sorted(Passport.all_objects.values_list("pk", flat=True)), sorted([lost.pk, draft.pk]))
+        self.assertEqual(
+            sorted(ArchivedPassport.all_objects.values_list("pk", flat=True)), sorted([taken.pk, published.pk])
+        )
+        self.assertEqual(self.assertCountersConsistent(), 3)
+        records = dict(PassportRecord.objects.values_list("code", "archived"))
+        self.assertEqual(records[published.code], True)
+        self.assertEqual(records[draft.code], False)
+
+
+class DashboardTests(PassportTestCase):
+    """Dashboard served from the batch counters and the daily stats."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.headers = member(self.organization)
+        passports = self.create_passports(4)
+        update_passport_status(
+            Passport.objects.filter(pk__in=[p.pk for p in passports[:2]]),
+            PassportStatus.PUBLISHED,
+            published_at=timezone.now(),
+        )
+        passports[3].delete()
+
+    def test_totals_and_daily_series(self):
+        with CaptureQueriesContext(connections["default"]) as queries:
+            response = self.client.get("/dashboard/passports?days=7", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        dashboard = response.json()
+        self.assertEqual(
+            {name: dashboard["totals"][name] for name in ("total_count", "published_count", "draft_count")},
+            {"total_count": 3, "published_count": 2, "draft_count": 1},
+        )
+        self.assertEqual(len(dashboard["series"]), 7)
+        self.assertEqual(dashboard["series"][-1]["day"], dashboard["today"])
+        self.assertEqual(
+            {name: dashboard["period"][name] for name in ("received_count", "published_count", "deleted_count")},
+            {"received_count": 4, "published_count": 2, "deleted_count": 1},
+        )
+        self.assertFalse([query for query in queries if '"passport_passport"' in query["sql"]])
+
+    def test_backfill_rebuilds_the_recorded_stats(self):
+        fields = ("day", "received_count", "published_count", "deleted_count")
+        recorded = list(PassportDailyStats.objects.values(*fields))
+        self.assertEqual(backfill_organization_stats(self.organization), 1)
+        self.assertEqual(list(PassportDailyStats.objects.values(*fields)), recorded)
+
+
+class BatchApiTests(PassportTestCase):
+    """Typed batch list and detail routes, publication."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.headers = member(self.organization)
+        other = Organization.objects.create(name="Ambassade", slug="ambassade")
+        Batch.objects.create(organization=other)
+
+    def test_list_and_detail(self):
+        self.create_passports(2)
+        response = self.client.get("/batches", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(response.json()["results"][0]["total_count"], 2)
+
+        response = self.client.get(f"/batches/{self.batch.pk}", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()["id"], response.json()["draft_count"]), (str(self.batch.pk), 2))
+
+        other = Batch.all_objects.exclude(pk=self.batch.pk).get()
+        self.assertEqual(self.client.get(f"/batches/{other.pk}", **self.headers).status_code, 404)
+
+    def test_publish_sets_the_publication_date(self):
+        published = self.create_passports(1, status=PassportStatus.PUBLISHED, prefix="Q")[0]
+        Passport.objects.filter(pk=published.pk).update(published_at=timezone.now() - timezone.timedelta(days=3))
+        self.create_passports(2, status=PassportStatus.COMPLETED)
+        with mock.patch("passport.services.passport.run_in_background"):
+            BatchService().publish(self.batch.pk)
+
+        dates = dict(Passport.objects.values_list("pk", "published_at"))
+        self.assertTrue(all(dates.values()))
+        self.assertLess(dates.pop(published.pk), timezone.now() - timezone.timedelta(days=2))
+        self.assertTrue(all(date > timezone.now() - timezone.timedelta(minutes=1) for date in dates.values()))
+
+    def test_publish_all_follows_the_transitions(self):
+        statuses = [PassportStatus.DRAFT, PassportStatus.TAKEN, PassportStatus.LOST, PassportStatus.COMPLETED]
+        passports = [self.create_passports(1, status=status, prefix=status[0])[0] for status in statuses]
+        with mock.patch("passport.services.passport.run_in_background"):
+            self.assertTrue(BatchService().publish(self.batch.pk))
+
+        current = dict(Passport.objects.values_list("pk", "status"))
+        self.assertEqual(
+            [current[passport.pk] for passport in passports],
+            [PassportStatus.DRAFT, PassportStatus.TAKEN, PassportStatus.PUBLISHED, PassportStatus.PUBLISHED],
+        )
+        self.assertCountersConsistent()
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, BatchStatus.PROCESSING)
+
+class TenantScopingTests(PassportTestCase):
+    """Passport querysets restricted to the current organization."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.headers = member(self.organization)
+        other = Organization.objects.create(name="Ambassade", slug="ambassade")
+        self.other_batch = Batch.objects.create(organization=other)
+        self.own = self.create_passports(2)
+        self.foreign = self.create_passports(3, batch=self.other_batch, prefix="F")
+
+    def test_managers_filter_on_the_current_organization(self):
+        token = set_current_organization(self.organization)
+        try:
+            self.assertEqual(Passport.objects.count(), 2)
+            self.assertEqual(Batch.objects.get().pk, self.batch.pk)
+            self.assertEqual(Passport.all_objects.count(), 5)
+        finally:
+            reset_current_organization(token)
+        self.assertEqual(Passport.objects.count(), 5)
+
+    def test_null_organization_is_not_a_filter(self):
+        token = set_current_organization(NullOrganization())
+        try:
+            self.assertEqual(Passport.objects.count(), 5)
+        finally:
+            reset_current_organization(token)
+
+    def test_requests_list_the_passports_of_their_organization(self):
+        response = self.client.get("/passports", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(passport["code"] for passport in response.json()["results"]),
+            sorted(passport.code for passport in self.own),
+        )
+        self.assertIsNone(get_current_organization())
+
+
+class FacetTests(PassportTestCase):
+    """Facet counts of the passport list, over the whole result set."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.headers = member(self.organization)
+        passports = self.create_passports(5)
+        update_passport_status(Passport.objects.filter(pk=passports[0].pk), PassportStatus.COMPLETED)
+        Passport.objects.filter(pk=passports[1].pk).update(gender="F")
+        other = Organization.objects.create(name="Ambassade", slug="ambassade")
+        self.create_passports(2, batch=Batch.objects.create(organization=other), prefix="F")
+
+    def facets(self, query=""):
+        response = self.client.get(f"/passports?page_size=2&facets=status,gender{query}", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_of_every_page(self):
+        page = self.facets()
+        self.assertEqual((page["count"], len(page["results"])), (5, 2))
+        self.assertEqual(page["facets"], {"gender": {"F": 1, "M": 4}, "status": {"completed": 1, "draft": 4}})
+        self.assertEqual(self.facets("&status=draft")["facets"]["gender"], {"F": 1, "M": 3})
+
+    def test_cached_until_the_organization_writes(self):
+        self.facets()
+        with CaptureQueriesContext(connections["default"]) as queries:
+            self.facets()
+        self.assertFalse([query for query in queries if '"passport_passport"' in query["sql"]])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_passports(1, prefix="N")
+        self.assertEqual(self.facets()["facets"]["status"]["draft"], 5)
+
+    def test_unknown_facets_are_refused(self):
+        response = self.client.get("/passports?facets=status,color", **self.headers)
+        self.assertEqual(response.status_code, 400)
+
+
+class TransitionTests(PassportTestCase):
+    """Bulk status transitions, scoped to the organization of the caller."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.headers = member(self.organization)
+        self.other = Organization.objects.create(name="Ambassade", slug="ambassade")
+        self.other_batch = Batch.objects.create(organization=self.other)
+        self.own = self.create_passports(2, status=PassportStatus.COMPLETED)
+        self.foreign = self.create_passports(2, batch=self.other_batch, status=PassportStatus.COMPLETED, prefix="F")
+
+    def transition(self, data, **headers):
+        return self.client.post(
+            "/passports/status/bulk", data, content_type="application/json", **{**self.headers, **headers}
+        )
+
+    def statuses(self, passports) -> list:
+        return [Passport.all_objects.get(pk=passport.pk).status for passport in passports]
+
+    def test_passports_of_other_organizations_are_not_found(self):
+        codes = [passport.code for passport in self.own + self.foreign]
+        response = self.transition({"status": "published", "codes": codes})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["updated"], 2)
+        outcomes = [result["outcome"] for result in response.json()["results"]]
+        self.assertEqual(outcomes, ["updated", "updated", "not_found", "not_found"])
+        self.assertEqual(self.statuses(self.own), ["published"] * 2)
+        self.assertEqual(self.statuses(self.foreign), ["completed"] * 2)
+
+    def test_filters_select_in_the_current_organization_only(self):
+        response = self.transition({"status": "published", "filters": {"status": "completed"}})
+        self.assertEqual(response.json()["updated"], 2)
+        self.assertEqual(self.statuses(self.foreign), ["completed"] * 2)
+        self.assertEqual(self.assertCountersConsistent(), 2)
+        self.assertEqual(self.assertCountersConsistent(self.other_batch), 2)
+
+    def test_an_organization_of_the_caller_is_required(self):
+        ids = [str(passport.pk) for passport in self.foreign]
+        without = self.transition({"status": "published", "ids": ids}, HTTP_X_ORGANIZATION_ID="")
+        foreign = self.transition({"status": "published", "ids": ids}, HTTP_X_ORGANIZATION_ID="ambassade")
+        self.assertEqual((without.status_code, foreign.status_code), (403, 403))
+        self.assertEqual(self.statuses(self.foreign), ["completed"] * 2)
+
+    def test_service_without_current_organization(self):
+        with self.assertRaises(ValidationError):
+            PassportService().transition(PassportStatus.PUBLISHED, codes=[self.own[0].code])
+
+
+class ImportTests(PassportTestCase):
+    """Staging imports and streamed ingestion: promotion rules."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.headers = member(self.organization)
+
+    def post(self, path, data=None, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        return self.client.post(path, data, **kwargs, **self.headers)
+
+    def rows(self, *codes):
+        return [
+            {"code": code, "coupon_id": f"C-{code}", "first_name": "Jean", "last_name": "Mbala", "gender": "M"}
+            for code in codes
+        ]
+
+    def test_validated_imports_are_promoted_once(self):
+        response = self.post("/imports", {"batch_id": str(self.batch.pk), "passports": self.rows("A1", "", "A2")})
+        self.assertEqual(response.status_code, 200)
+        job = response.json()
+        self.assertEqual((job["status"], job["valid_rows"], job["error_count"]), ("validated", 2, 1))
+
+        errors = self.client.get(f"/imports/{job['id']}/errors", **self.headers).json()["results"]
+        self.assertEqual([(error["line"], error["error"]) for error in errors], [(1, "required")])
+
+        response = self.post(f"/imports/{job['id']}/promote")
+        self.assertEqual((response.status_code, response.json()["inserted_rows"]), (200, 2))
+        self.assertEqual(sorted(Passport.objects.values_list("code", flat=True)), ["A1", "A2"])
+        self.assertEqual(set(Passport.objects.values_list("surname_key", flat=True)), {"mbala"})
+        self.assertEqual(self.assertCountersConsistent(), 2)
+
+        self.assertEqual(self.post(f"/imports/{job['id']}/promote").status_code, 409)
+        self.assertEqual(Passport.objects.count(), 2)
+
+    def test_ingestion_jobs_cannot_be_promoted(self):
+        body = "\n".join(json.dumps(row) for row in self.rows("B1", "B1", "B2")).encode()
+        response = self.post(f"/imports/ingest?batch_id={self.batch.pk}", body, content_type="application/x-ndjson")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        job = lines[-1]["job"]
+        self.assertEqual((job["status"], job["inserted_rows"], job["error_count"]), ("ingested", 2, 1))
+
+        response = self.post(f"/imports/{job['id']}/promote")
+        self.assertEqual(response.status_code, 409)
+        # The errors of the stream are kept.
+        errors = self.client.get(f"/imports/{job['id']}/errors", **self.headers).json()
+        self.assertEqual(errors["count"], 1)
+        self.assertEqual(PassportImport.objects.get(pk=job["id"]).status, "ingested")
+        self.assertEqual(Passport.objects.count(), 2)
+        self.assertEqual(self.assertCountersConsistent(), 2)
+
+
+class ManifestUpsertTests(PassportTestCase):
+    """Manifests of a batch sent again: idempotent upsert by code or coupon."""
+
+    def setUp(self):
+        super().setUp()
+        self.user, self.headers = member(self.organization)
+
+    def put(self, *rows):
+        response = self.client.put(
+            f"/batches/{self.batch.pk}/passports", {"passports": list(rows)},
+            content_type="application/json", **self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def row(self, code, last_name="Mbala", **values):
+        return {"code": code, "coupon_id": f"C-{code}", "first_name": "Jean", "last_name": last_name, "gender": "M", **values}
+
+    def outcomes(self, result) -> dict:
+        return {name: result[name] for name in ("inserted", "updated", "restored", "unchanged")}
+
+    def test_manifest_sent_again(self):
+        result = self.put(self.row("M1"), self.row("M2"))
+        self.assertEqual(self.outcomes(result), {"inserted": 2, "updated": 0, "restored": 0, "unchanged": 0})
+        result = self.put(self.row("M1"), self.row("M2", last_name="Mbalaa"))
+        self.assertEqual(self.outcomes(result), {"inserted": 0, "updated": 1, "restored": 0, "unchanged": 1})
+        self.assertEqual(Passport.objects.get(code="M2").last_name, "Mbalaa")
+        # Matched by its coupon: the code is corrected.
+        self.put(self.row("M3", coupon_id="C-M1"))
+        self.assertEqual(Passport.objects.get(coupon_id="C-M1").code, "M3")
+        self.assertEqual(self.assertCountersConsistent(), 2)
+
+    def test_deleted_passports_are_restored_as_drafts(self):
+        self.put(self.row("M1"))
+        passport = Passport.objects.get(code="M1")
+        update_passport_status(Passport.objects.filter(pk=passport.pk), PassportStatus.COMPLETED)
+        Passport.objects.get(pk=passport.pk).delete()
+        result = self.put(self.row("M1"))
+        self.assertEqual(result["restored"], 1)
+        passport.refresh_from_db()
+        self.assertEqual((passport.deleted, passport.status), (None, PassportStatus.DRAFT))
+        self.assertEqual(self.assertCountersConsistent(), 1)
+
+    def test_code_given_to_another_row_of_the_passport(self):
+        self.put(self.row("M1"))
+        # M3 takes the code of the passport matched by its coupon; the row
+        # still carrying the old code matches the same passport.
+        result = self.put(self.row("M3", coupon_id="C-M1"), self.row("M1", coupon_id="C-M9"))
+        self.assertEqual(self.outcomes(result), {"inserted": 0, "updated": 1, "restored": 0, "unchanged": 0})
+        self.assertEqual([(c["row"], c["reason"]) for c in result["conflicts"]], [(1, "matches_claimed")])
+        self.assertEqual(list(Passport.objects.values_list("code", "coupon_id")), [("M3", "C-M1")])
+
+    def test_batches_of_other_organizations_are_not_found(self):
+        other = Organization.objects.create(name="Ambassade", slug="ambassade")
+        foreign = Batch.objects.create(organization=other)
+        data = {"passports": [self.row("M1")]}
+        for batch_id, headers, status in (
+            (foreign.pk, self.headers, 404),
+            (uuid.uuid4(), self.headers, 404),
+            (foreign.pk, {**self.headers, "HTTP_X_ORGANIZATION_ID": ""}, 403),
+            (foreign.pk, {**self.headers, "HTTP_X_ORGANIZATION_ID": "ambassade"}, 403),
+        ):
+            response = self.client.put(
+                f"/batches/{batch_id}/passports", data, content_type="application/json", **headers
+            )
+            self.assertEqual(response.status_code, status)
+        self.assertFalse(Passport.all_objects.filter(code="M1").exists())
+
+    def test_conflicts_are_left_out(self):
+        other = Batch.objects.create(organization=self.organization)
+        foreign = self.create_passports(1, batch=other)[0]
+        self.put(self.row("M1"), self.row("M2"))
+        result = self.put(
+            self.row("M1"),
+            self.row("M1"),
+            self.row(foreign.code, coupon_id=foreign.coupon_id),
+            self.row("M2", coupon_id="C-M1"),
+            self.row("M4", gender="X" * 100),
+        )
+        reasons = [(conflict["row"], conflict["reason"]) for conflict in result["conflicts"]]
+        self.assertEqual(reasons, [(1, "duplicate"), (2, "other_batch"), (3, "duplicate"), (4, "invalid")])
+        result = self.put(self.row("M2", coupon_id="C-M1"))
+        self.assertEqual(result["conflicts"][0]["reason"], "ambiguous")
+        self.assertEqual(Passport.objects.filter(batch=self.batch).count(), 2)
+        self.assertEqual(self.assertCountersConsistent(), 2)
+
+
+class ManifestDuplicateTests(PassportTestCase):
+    """Likely duplicates of a manifest, found on the stored name keys."""
+
+    def row(self, code, first_name, last_name):
+        return {"code": code, "coupon_id": f"C-{code}", "first_name": first_name, "last_name": last_name, "gender": "M"}
+
+    def upsert(self, rows, chunk_size=1000):
+        return list(stream_upsert(self.batch, rows, chunk_size=chunk_size, check_duplicates=True))
+
+    def test_name_keys_are_stored(self):
+        passport = self.create_passports(1)[0]
+        self.assertEqual((passport.phonetic_key, passport.surname_key), ("j500 k140", "kabila"))
+        passport.last_name = "Mbala"
+        passport.save(update_fields=["last_name"])
+        passport.refresh_from_db()
+        self.assertEqual((passport.phonetic_key, passport.surname_key), ("j500 m140", "mbala"))
+
+        self.upsert([self.row("M1", "Jean", "Tshisekedi")])
+        self.assertEqual(Passport.objects.get(code="M1").surname_key, "tshisekedi")
+
+    def test_duplicates_of_the_organization_and_of_previous_chunks(self):
+        kabila = self.create_passports(1)[0]
+        other = Organization.objects.create(name="Ambassade", slug="ambassade")
+        Passport.objects.create(
+            batch=Batch.objects.create(organization=other), code="O1", coupon_id="C-O1",
+            first_name="Joseph", last_name="Lumumba", gender="M",
+        )
+        results = self.upsert([
+            self.row("M1", "Jean", "Kabilla0"),
+            self.row("M2", "Joseph", "Lumumba"),
+            self.row("M3", "Josef", "Lumumba"),
+        ], chunk_size=2)
+        self.assertEqual([result["outcome"] for result in results], ["inserted"] * 3)
+        self.assertEqual([duplicate["duplicate_of"] for duplicate in results[0]["duplicates"]], [kabila.code])
+        # Not a duplicate of the passport of another organization
+        self.assertEqual(results[1]["duplicates"], [])
+        self.assertEqual([duplicate["duplicate_of"] for duplicate in results[2]["duplicates"]], ["M2"])
+
+    def test_only_the_blocks_of_the_chunk_are_read(self):
+        self.create_passports(3)
+        with CaptureQueriesContext(connections["default"]) as queries:
+            results = self.upsert([self.row("M1", "Patrice", "Lumumba")])
+        self.assertEqual(results[0]["duplicates"], [])
+        reads = [query["sql"] for query in queries if "phonetic_key" in query["sql"] and "SELECT" in query["sql"]]
+        self.assertEqual(len(reads), 1)
+        self.assertIn("l551 p362", reads[0])
+
+class DuplicateScanTests(PassportTestCase):
+    """Likely duplicate holders of an organization."""
+
+    def create(self, code, first_name, last_name, gender="M", batch=None):
+        return Passport.objects.create(
+            batch=batch or self.batch, code=code, coupon_id=f"C-{code}",
+            first_name=first_name, last_name=last_name, gender=gender,
+        )
+
+    def test_typos_and_swapped_names_are_reported(self):
+        self.create("D1", "Jean-Pierre", "Mukendi")
+        self.create("D2", "Jean-Pierre", "Mukendy")
+        self.create("D3", "Mukendi", "Jean-Pierre")
+        self.create("D4", "Jeanne", "Mukendi", gender="F")
+        self.create("D5", "Patrice", "Lumumba")
+        other = Organization.objects.create(name="Ambassade", slug="ambassade")
+        self.create("O1", "Jean-Pierre", "Mukendi", batch=Batch.objects.create(organization=other))
+
+        pairs = {(a.code, b.code) for a, b, _ in scan_organization(self.organization)}
+        self.assertEqual({tuple(sorted(pair)) for pair in pairs}, {("D1", "D2"), ("D1", "D3"), ("D2", "D3")})
+
+    def test_report_command(self):
+        self.create("D1", "Jean", "Mbala")
+        self.create("D2", "Jean", "Mballa")
+        output, errors = StringIO(), StringIO()
+        call_command("find_duplicate_passports", "consulat", stdout=output, stderr=errors)
+        rows = list(csv.reader(StringIO(output.getvalue())))
+        self.assertEqual(rows[0][:2], ["organization", "code"])
+        self.assertEqual([sorted((row[1], row[4])) for row in rows[1:]], [["D1", "D2"]])
+        self.assertIn("1 likely duplicates", errors.getvalue())
+
+
+@skipIf(len(settings.DATABASE_SHARDS) > 1, "scatter-gather threads do not see the test transaction")
+@override_settings(PUBLIC_PASSPORT_API=True)
+class PublicApiTests(PassportTestCase):
+    """Public responses, cached for every visitor."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_passports(2, status=PassportStatus.PUBLISHED)
+        other = Batch.objects.create(organization=Organization.objects.create(name="Ambassade", slug="ambassade"))
+        self.create_passports(3, batch=other, status=PassportStatus.PUBLISHED, prefix="F")
+
+    def test_the_organization_header_does_not_scope_the_cached_lookup(self):
+        response = self.client.get(PUBLIC_LOOKUP_PATH, HTTP_X_ORGANIZATION_ID="consulat")
+        self.assertEqual((response.headers["X-Cache"], response.json()["count"]), ("MISS", 5))
+        response = self.client.get(PUBLIC_LOOKUP_PATH)
+        self.assertEqual((response.headers["X-Cache"], response.json()["count"]), ("HIT", 5))
+        response = self.client.get(PUBLIC_LOOKUP_PATH, {"organization_id": "consulat"})
+        self.assertEqual(response.json()["count"], 2)
+
+    def test_counts_show_published_passports_only(self):
+        self.create_passports(4, prefix="D")
+        self.create_passports(1, status=PassportStatus.COMPLETED, prefix="C")
+        taken = self.create_passports(1, status=PassportStatus.PUBLISHED, prefix="T")[0]
+        update_passport_status(Passport.objects.filter(pk=taken.pk), PassportStatus.TAKEN)
+        counts = self.client.get(PUBLIC_COUNTS_PATH, {"organization_id": "consulat"}).json()
+        self.assertEqual(counts, {"published": 2, "taken": 1, "lost": 0})
+
+    def test_lookups_of_callers_of_other_organizations_are_the_same(self):
+        service = PassportService()
+        with use_organization(self.organization):
+            with mock.patch.object(service, "_public_lookup_page", wraps=service._public_lookup_page) as page:
+                self.assertEqual(service.public_lookup()["count"], 5)
+        page.assert_called_once_with(None, None, None, None, 1, 20)
+
+    @override_settings(PUBLIC_PASSPORT_API=False)
+    def test_routes_are_off_unless_enabled(self):
+        self.assertEqual(self.client.get(PUBLIC_LOOKUP_PATH).status_code, 404)
+        self.assertEqual(self.client.get(PUBLIC_COUNTS_PATH).status_code, 404)
+        self.assertEqual(warm_batch(self.batch, ["http://testserver"]), 0)
+
+
+class PublishWarmupTests(PassportTestCase):
+    """Publication of a batch and warming of the public responses."""
+
+    def test_warmup_runs_in_background_after_commit(self):
+        self.create_passports(2, status=PassportStatus.COMPLETED)
+        with mock.patch("passport.services.passport.run_in_background") as run_in_background:
+            with self.captureOnCommitCallbacks(execute=True):
+                BatchService().publish(self.batch.pk)
+                run_in_background.assert_not_called()
+        run_in_background.assert_called_once_with(announce_batch, mock.ANY)
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, BatchStatus.PUBLISHED)
+
+    @skipIf(len(settings.DATABASE_SHARDS) > 1, "scatter-gather threads do not see the test transaction")
+    @override_settings(DATABASE_REPLICAS=["replica_1"], REPLICA_MAX_LAG=5, PUBLIC_PASSPORT_API=True)
+    def test_warmup_right_after_the_purge_is_stored(self):
+        self.create_passports(3, status=PassportStatus.PUBLISHED)
+        with self.captureOnCommitCallbacks(execute=True):
+            purge_public_passports(self.batch)
+        # Read from the primary: a purge just before does not prevent storing.
+        self.assertGreater(warm_batch(self.batch, ["http://testserver"]), 0)
+        response = self.client.get(PUBLIC_LOOKUP_PATH, {"organization_id": "consulat"})
+        self.assertEqual(response.headers["X-Cache"], "HIT")
+        self.assertEqual(response.json()["count"], 3)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, "set DATABASE_REPLICA_URLS (e.g. a second SQLite file)")
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReplicaReadsTests(TransactionTestCase):
+    """Reads of the list endpoints against a replica (a test mirror of the primary)."""
+
+    databases = "__all__"
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.organization = Organization.objects.create(name="Consulat", slug="consulat")
+        self.user, self.headers = member(self.organization)
+        self.replica = settings.DATABASE_REPLICAS[0]
+
+    def test_authenticated_lists_read_from_the_replica(self):
+        with CaptureQueriesContext(connections[self.replica]) as replica:
+            response = self.client.get("/passports", **self.headers)
+        self.assertEqual(response.status_code, 200)
+        # Authentication wrote last_login: the client is not pinned for it.
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        self.assertTrue(any("passport_passport" in query["sql"] for query in replica.captured_queries))
+
+    def test_clients_that_wrote_read_from_the_primary(self):
+        response = self.client.post("/batches", {}, content_type="application/json", **self.headers)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        with CaptureQueriesContext(connections[self.replica]) as replica:
+            self.assertEqual(self.client.get("/passports", **self.headers).status_code, 200)
+        self.assertEqual(replica.captured_queries, [])
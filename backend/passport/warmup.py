@@ -0,0 +1,101 @@
+import logging
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db.models import QuerySet
+from django.db.models.functions import Substr, Upper
+
+from organisations.sharding import organization_gather
+from passport.enums import PassportStatus
+from passport.models import Batch, Passport
+from passport.signals import batch_published
+from utils_mixins.response_cache import public_origins, warm_response
+
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_LOOKUP_PATH = "/public/passports"
+PUBLIC_COUNTS_PATH = "/public/passports/counts"
+
+
+# Cache warming
+# Quand un lot est publié, les consultations publiques affluent: les pages et
+# recherches les plus probables sont recalculées avant l'annonce, pour que le
+# premier visiteur ne paie pas le cache froid.
+
+def _option(name: str):
+    return settings.WARM_CACHES[name]
+
+
+def _distinct(queryset: QuerySet, expression, organization_slug: Optional[str]) -> list:
+    values = set()
+    for rows in organization_gather(
+        queryset.order_by(),
+        lambda qs: list(qs.annotate(value=expression).values_list("value", flat=True).distinct()),
+        organization_slug,
+    ):
+        values.update(rows)
+    return sorted(value for value in values if value)
+
+
+def warmup_requests(organization_slug: Optional[str], passports: Optional[QuerySet] = None) -> list:
+    """
+    Public requests to precompute for an organization, as (path, params).
+    Lookups by surname initial and coupon prefix are taken from `passports`
+    (e.g. the batch just published), all published passports otherwise.
+    """
+    scope = {"organization_id": organization_slug} if organization_slug else {}
+    requests = [(PUBLIC_COUNTS_PATH, scope)]
+    for page in range(1, _option("pages") + 1):
+        requests.append((PUBLIC_LOOKUP_PATH, {**scope, "page": page} if page > 1 else scope))
+
+    if passports is None:
+        passports = Passport.objects.filter(status=PassportStatus.PUBLISHED)
+
+    for initial in _distinct(passports, Upper(Substr("last_name", 1, 1)), organization_slug):
+        requests.append((PUBLIC_LOOKUP_PATH, {**scope, "last_name_initial": initial}))
+    prefix_length = _option("coupon_prefix_length")
+    for prefix in _distinct(passports, Substr("coupon_id", 1, prefix_length), organization_slug):
+        requests.append((PUBLIC_LOOKUP_PATH, {**scope, "coupon_prefix": prefix}))
+
+    return requests[:_option("max_lookups")]
+
+
+def warm(requests: Iterable, origins: Optional[list] = None) -> int:
+    """Precompute `requests` for every public origin. Returns the number of responses cached."""
+    if not settings.PUBLIC_PASSPORT_API:
+        return 0
+    origins = origins or public_origins()
+    warmed = 0
+    for path, params in requests:
+        for origin in origins:
+            try:
+                status = warm_response(path, params, origin)
+            except Exception:
+                logger.exception("Could not warm %s %s from %s", path, params, origin)
+                continue
+            warmed += status == 200
+    return warmed
+
+
+def warm_organization(organization_slug: Optional[str], origins: Optional[list] = None) -> int:
+    """Warm the public responses of an organization (of every organization when None)."""
+    return warm(warmup_requests(organization_slug), origins)
+
+
+def warm_batch(batch: Batch, origins: Optional[list] = None) -> int:
+    """Warm the public responses showing the passports of a freshly published batch."""
+    slug = batch.organization.slug if batch.organization_id else None
+    published = batch.passports.filter(status=PassportStatus.PUBLISHED)
+    requests = warmup_requests(slug, published)
+    if slug:
+        # Listing of all organizations and global counts changed as well.
+        requests += warmup_requests(None, published)[:_option("pages") + 1]
+    return warm(requests, origins)
+
+
+def announce_batch(batch: Batch) -> None:
+    """Warm the caches, then announce the published batch."""
+    warmed = warm_batch(batch)
+    logger.info("Warmed %d public responses for batch %s", warmed, batch.pk)
+    batch_published.send(sender=Batch, batch=batch)
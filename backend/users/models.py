@@ -10,6 +10,7 @@ from django.core.validators import EmailValidator
 from safedelete.models import SafeDeleteModel
 from safedelete.models import SOFT_DELETE_CASCADE
 from auditlog.registry import auditlog
+from utils_mixins.soft_delete import BulkCascadeMixin
 from utils_mixins.models import (
     BaseModelMixin
 )
@@ -44,7 +45,7 @@ class UserManager(BaseUserManager):
         return self.create_user(email, password, **extra_fields)
 
 
-class User(AbstractUser, SafeDeleteModel, BaseModelMixin):
+class User(BulkCascadeMixin, AbstractUser, SafeDeleteModel, BaseModelMixin):
     """
     Modèle d'utilisateur personnalisé qui utilise l'email comme identifiant unique
     et intègre la suppression sécurisée (soft delete)
@@ -0,0 +1,26 @@
+import logging
+import threading
+
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+def run_in_background(function, *args, **kwargs) -> threading.Thread:
+    """
+    Run `function` in a daemon thread, off the request. Failures are logged;
+    the thread's database connections are closed when it is done.
+    Typically started from `transaction.on_commit`.
+    """
+    def run():
+        try:
+            function(*args, **kwargs)
+        except Exception:
+            logger.exception("Background task %s failed", function.__qualname__)
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
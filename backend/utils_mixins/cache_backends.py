@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+
+import redis
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+
+from utils_mixins.caches import TAG_VERSION_PREFIX
+from utils_mixins.circuit_breaker import get_breaker
+
+
+logger = logging.getLogger(__name__)
+
+REDIS_ERRORS = (redis.ConnectionError, redis.TimeoutError)
+
+# Maximum number of keys remembered while the circuit is open; once Redis
+# recovers they are deleted from it (tag versions get a fresh token) so
+# that no entry invalidated during the outage survives it.
+MAX_DIRTY_KEYS = 10_000
+
+# {(breaker, location, key prefix): keys written to the fallback}
+_dirty_keys: dict = {}
+_dirty_lock = threading.Lock()
+
+
+class ResilientRedisCache(RedisCache):
+    """
+    Redis cache backend degrading gracefully when Redis is slow or down.
+
+    Every call goes through a circuit breaker (see `utils_mixins.circuit_breaker`).
+    When Redis fails or times out, or while the circuit is open, calls are
+    served by a fallback: an in-process LocMemCache (`"FALLBACK": "locmem"`,
+    default) or nothing at all (`"FALLBACK": "none"`), i.e. straight to the
+    database.
+
+    Extra OPTIONS:
+        FALLBACK: "locmem" or "none".
+        CIRCUIT_BREAKER: name of the breaker, shared with cacheops' client.
+        FALLBACK_MAX_ENTRIES: size of the in-process fallback.
+    The other options (socket_timeout, socket_connect_timeout, ...) are
+    passed to the Redis connection pool.
+    """
+
+    def __init__(self, server, params):
+        params = dict(params)
+        options = dict(params.get("OPTIONS") or {})
+        fallback = options.pop("FALLBACK", "locmem")
+        breaker_name = options.pop("CIRCUIT_BREAKER", "redis")
+        fallback_max_entries = options.pop("FALLBACK_MAX_ENTRIES", 1000)
+        params["OPTIONS"] = options
+        super().__init__(server, params)
+
+        fallback_params = {
+            name: params[name]
+            for name in ("TIMEOUT", "KEY_PREFIX", "VERSION", "KEY_FUNCTION")
+            if name in params
+        }
+        if fallback == "locmem":
+            fallback_params["OPTIONS"] = {"MAX_ENTRIES": fallback_max_entries}
+            self.fallback = LocMemCache(f"resilient:{breaker_name}", fallback_params)
+        else:
+            self.fallback = DummyCache(server, fallback_params)
+
+        self.breaker = get_breaker(breaker_name)
+        # Shared by the instances of every thread (Django creates one per thread).
+        self._dirty_keys = _dirty_keys.setdefault((breaker_name, server, self.key_prefix), set())
+
+    def _remember(self, keys) -> None:
+        with _dirty_lock:
+            if len(self._dirty_keys) < MAX_DIRTY_KEYS:
+                self._dirty_keys.update(keys)
+
+    def _recover(self) -> None:
+        """Purge the keys written during the outage. Raises the Redis errors."""
+        if not self._dirty_keys:
+            return
+        with _dirty_lock:
+            keys = list(self._dirty_keys)
+        if not keys:
+            return
+        # A deleted tag version would read as "never invalidated" again and
+        # match the entries cached before the outage: it gets a fresh token.
+        tags = [key for key in keys if key.startswith(f"{TAG_VERSION_PREFIX}:")]
+        others = [key for key in keys if not key.startswith(f"{TAG_VERSION_PREFIX}:")]
+        if tags:
+            super().set_many(dict.fromkeys(tags, time.time_ns()), None)
+        if others:
+            super().delete_many(others)
+        with _dirty_lock:
+            self._dirty_keys.difference_update(keys)
+        # Not to be served during the next outage.
+        self.fallback.clear()
+        logger.info("Purged %d keys written during the Redis outage", len(keys))
+
+    def _call(self, name, written, *args, **kwargs):
+        if self.breaker.allow_request():
+            try:
+                # Before the call: it may read what the outage invalidated.
+                self._recover()
+                result = getattr(super(), name)(*args, **kwargs)
+            except REDIS_ERRORS as exc:
+                logger.warning("Redis cache %s failed: %s", name, exc)
+                self.breaker.record_failure()
+            except Exception:
+                # Redis answered, the error is ours (e.g. serialization).
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+        if written:
+            self._remember(written)
+        return getattr(self.fallback, name)(*args, **kwargs)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("add", [key], key, value, timeout, version)
+
+    def get(self, key, default=None, version=None):
+        return self._call("get", None, key, default, version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("set", [key], key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("touch", None, key, timeout, version)
+
+    def delete(self, key, version=None):
+        return self._call("delete", [key], key, version)
+
+    def get_many(self, keys, version=None):
+        return self._call("get_many", None, keys, version)
+
+    def has_key(self, key, version=None):
+        return self._call("has_key", None, key, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self._call("incr", [key], key, delta, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("set_many", list(data), data, timeout, version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        return self._call("delete_many", keys, keys, version)
+
+    def clear(self):
+        return self._call("clear", None)
+
+
+class CircuitBreakerRedis(redis.Redis):
+    """
+    Redis client sharing the cache circuit breaker, for cacheops
+    (CACHEOPS_CLIENT_CLASS). While the circuit is open commands fail fast
+    with a ConnectionError, which CACHEOPS_DEGRADE_ON_FAILURE turns into a
+    plain database query instead of waiting for a socket timeout.
+    """
+
+    breaker_name = "redis"
+
+    def execute_command(self, *args, **options):
+        breaker = get_breaker(self.breaker_name)
+        if not breaker.allow_request():
+            raise redis.ConnectionError("Circuit breaker is open")
+        try:
+            result = super().execute_command(*args, **options)
+        except REDIS_ERRORS:
+            breaker.record_failure()
+            raise
+        except Exception:
+            breaker.record_success()
+            raise
+        breaker.record_success()
+        return result
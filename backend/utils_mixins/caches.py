@@ -0,0 +1,358 @@
+import hashlib
+import math
+import random
+import time
+from functools import update_wrapper
+from typing import Any, Callable, Iterable, NamedTuple, Optional, Type
+
+from django.core.cache import caches
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+
+
+TAG_VERSION_PREFIX = "stampede:tag"
+DATA_VERSION_PREFIX = "data_version"
+
+
+class CacheEntry(NamedTuple):
+    """Envelope stored in the cache for every computed value."""
+    value: Any
+    expires_at: float     # logical expiry (epoch seconds)
+    delta: float          # seconds the last recomputation took
+    tags: dict            # tag -> version seen when the value was computed
+
+
+def _key_part(value: Any) -> str:
+    """Stable textual representation of a call argument."""
+    if isinstance(value, models.Model):
+        return f"{value._meta.label_lower}:{value.pk}"
+    return repr(value)
+
+
+def tag_version_key(tag: str) -> str:
+    return f"{TAG_VERSION_PREFIX}:{tag}"
+
+
+def model_tag(model: Type[models.Model]) -> str:
+    """Tag shared by every entry depending on any row of `model`."""
+    return f"model:{model._meta.label_lower}"
+
+
+def get_tag_versions(tags: Iterable[str], cache_alias: str = "default") -> dict:
+    """
+    Current version token of each tag (None when never invalidated).
+    Tokens are the invalidation time in nanoseconds.
+    """
+    tags = list(tags)
+    if not tags:
+        return {}
+    found = caches[cache_alias].get_many([tag_version_key(tag) for tag in tags])
+    return {tag: found.get(tag_version_key(tag)) for tag in tags}
+
+
+def invalidate_tags(*tags: str, cache_alias: str = "default") -> None:
+    """
+    Invalidate every entry carrying one of `tags` in O(1) per tag by changing
+    its version token; entries computed against a previous token are ignored.
+    """
+    tags = {tag for tag in tags if tag}
+    if not tags:
+        return
+    token = time.time_ns()
+    caches[cache_alias].set_many({tag_version_key(tag): token for tag in tags}, None)
+
+
+def data_version_key(namespace: str) -> str:
+    return f"{DATA_VERSION_PREFIX}:{namespace}"
+
+
+def get_data_versions(namespaces: Iterable[str], cache_alias: str = "default") -> dict:
+    """
+    Current data version number of each namespace.
+    Missing versions are seeded with the current time in nanoseconds rather
+    than 0, so that a version evicted from the cache restarts above every
+    number it reached before and old entries stay unreachable.
+    """
+    namespaces = list(namespaces)
+    cache = caches[cache_alias]
+    found = cache.get_many([data_version_key(namespace) for namespace in namespaces])
+    versions = {}
+    for namespace in namespaces:
+        key = data_version_key(namespace)
+        version = found.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), None)
+            version = cache.get(key, time.time_ns())
+        versions[namespace] = version
+    return versions
+
+
+def bump_data_version(*namespaces: str, cache_alias: str = "default") -> None:
+    """Atomically increment the data version of `namespaces` (O(1) invalidation)."""
+    cache = caches[cache_alias]
+    namespaces = list(dict.fromkeys(namespaces))
+    for namespace in namespaces:
+        key = data_version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, time.time_ns(), None):
+                cache.incr(key)
+    cache.set_many({f"{data_version_key(namespace)}:bumped_at": time.time() for namespace in namespaces}, None)
+
+
+def get_data_bumped_at(namespaces: Iterable[str], cache_alias: str = "default") -> float:
+    """Epoch seconds of the last bump of any of `namespaces` (0 if unknown)."""
+    keys = [f"{data_version_key(namespace)}:bumped_at" for namespace in namespaces]
+    return max(caches[cache_alias].get_many(keys).values(), default=0.0)
+
+
+class VersionedResults:
+    """
+    Countable and sliceable stand-in for a queryset, caching its count and
+    slices under keys embedding the data version of `namespaces`.
+
+    Bumping a version (`bump_data_version`) makes every entry computed before
+    unreachable: entries are never deleted, they age out (`timeout`, or LRU
+    eviction when the cache has a memory budget). Versions are read once,
+    before the first query, so a write racing with the computation stores
+    its result under the old version. Within `settle_time` seconds of a bump
+    (e.g. the replica staleness bound), results are only cached until that
+    delay has passed. Can be handed to Django's Paginator.
+    """
+
+    def __init__(
+        self,
+        queryset: models.QuerySet,
+        key: str,
+        namespaces: Iterable[str],
+        timeout: int,
+        cache_alias: str = "default",
+        version_cache_alias: str = "default",
+        settle_time: float = 0,
+    ):
+        self.queryset = queryset
+        self.key = key
+        self.namespaces = list(namespaces)
+        self.timeout = timeout
+        self.cache_alias = cache_alias
+        self.version_cache_alias = version_cache_alias
+        self.settle_time = settle_time
+        self._versioned_key = None
+        self._entry_timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def ordered(self) -> bool:
+        return self.queryset.ordered
+
+    def _make_key(self, part: str) -> str:
+        if self._versioned_key is None:
+            versions = get_data_versions(self.namespaces, self.version_cache_alias)
+            tokens = ",".join(f"{versions[namespace]}" for namespace in self.namespaces)
+            self._versioned_key = f"{self.key}:{tokens}"
+            if self.settle_time:
+                bumped_at = get_data_bumped_at(self.namespaces, self.version_cache_alias)
+                settling = bumped_at + self.settle_time - time.time()
+                if settling > 0:
+                    self._entry_timeout = min(self.timeout, math.ceil(settling))
+        return f"{self._versioned_key}:{part}"
+
+    def _get_or_compute(self, part: str, compute: Callable) -> Any:
+        key = self._make_key(part)
+        # Wrapped in a tuple so that 0 or [] are hits too.
+        found = self.cache.get(key)
+        if found is not None:
+            return found[0]
+        value = compute()
+        self.cache.set(key, (value,), self._entry_timeout)
+        return value
+
+    def cached(self, part: str, compute: Callable) -> Any:
+        """Another value derived from the queryset (e.g. facet counts), cached with the same versions."""
+        return self._get_or_compute(part, compute)
+
+    def count(self) -> int:
+        return self._get_or_compute("count", self.queryset.count)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            return self.queryset[index]
+        return self._get_or_compute(
+            f"{index.start or 0}-{index.stop}", lambda: list(self.queryset[index])
+        )
+
+
+class StampedeCachedFunction:
+    """
+    Cache wrapper protecting a function against cache stampedes.
+
+    - single-flight: only the caller holding the recomputation lock hits the
+      database, concurrent callers wait for its result (cold key) or keep
+      serving the previous value (warm key);
+    - probabilistic early refresh (XFetch): a value may be recomputed a bit
+      before its expiry, the probability growing as expiry approaches, so hot
+      keys rarely expire all at once;
+    - stale-while-revalidate: entries are kept `stale_timeout` seconds after
+      their logical expiry and served while one caller recomputes them.
+
+    Invalidation is scoped by tags:
+    - `tags(*args, **kwargs)` derives tags from the call arguments (e.g. the
+      slug being looked up), so that misses are invalidated too;
+    - `result_tags(result)` derives tags from the computed value (e.g. its pk);
+    - `depends_on` models add a model-wide tag, discarding the entries as soon
+      as any row of that model is saved or deleted.
+    An entry whose tags were invalidated (`invalidate_tags`) is never served,
+    not even stale.
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        timeout: int,
+        prefix: Optional[str] = None,
+        tags: Optional[Callable[..., Iterable[str]]] = None,
+        result_tags: Optional[Callable[[Any], Iterable[str]]] = None,
+        depends_on: Iterable[Type[models.Model]] = (),
+        stale_timeout: Optional[int] = None,
+        beta: float = 1.0,
+        lock_timeout: int = 10,
+        wait_timeout: float = 2.0,
+        cache_alias: str = "default",
+    ):
+        self.func = func
+        self.timeout = timeout
+        self.prefix = prefix or f"stampede:{func.__module__}.{func.__qualname__}"
+        self.tags = tags
+        self.result_tags = result_tags
+        self.depends_on = tuple(depends_on)
+        self.stale_timeout = timeout if stale_timeout is None else stale_timeout
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.cache_alias = cache_alias
+        update_wrapper(self, func)
+
+        for model in self.depends_on:
+            self._connect(model)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _connect(self, model: Type[models.Model]) -> None:
+        def receiver(sender, **kwargs):
+            invalidate_tags(model_tag(sender), cache_alias=self.cache_alias)
+
+        uid = f"{self.prefix}:{model._meta.label_lower}"
+        post_save.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+        post_delete.connect(receiver, sender=model, weak=False, dispatch_uid=uid)
+
+    def make_key(self, *args, **kwargs) -> str:
+        parts = [_key_part(arg) for arg in args]
+        parts += [f"{name}={_key_part(kwargs[name])}" for name in sorted(kwargs)]
+        digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def _call_tags(self, args, kwargs) -> set:
+        tags = {model_tag(model) for model in self.depends_on}
+        if self.tags is not None:
+            tags.update(self.tags(*args, **kwargs))
+        return tags
+
+    def _lookup(self, key: str) -> Optional[CacheEntry]:
+        entry = self.cache.get(key)
+        if entry is None or not entry.tags:
+            return entry
+        if get_tag_versions(entry.tags, self.cache_alias) != entry.tags:
+            # A tag was invalidated: the value must not be served, even stale.
+            return None
+        return entry
+
+    def _should_refresh(self, entry: CacheEntry, now: float) -> bool:
+        if now >= entry.expires_at:
+            return True
+        # XFetch: -log(random()) is exponentially distributed, so the earlier
+        # we are before expiry, the less likely an early refresh becomes.
+        jitter = entry.delta * self.beta * -math.log(1.0 - random.random())
+        return now + jitter >= entry.expires_at
+
+    def _compute(self, key: str, args, kwargs) -> Any:
+        # Argument tags are read before computing so that an invalidation
+        # racing with the computation is not lost.
+        # Result tags are only known afterwards: one invalidated after
+        # `horizon` may have changed the value while it was computed.
+        tags = get_tag_versions(self._call_tags(args, kwargs), self.cache_alias)
+        horizon = time.time_ns()
+        started = time.monotonic()
+        value = self.func(*args, **kwargs)
+        delta = time.monotonic() - started
+        if self.result_tags is not None:
+            extra = get_tag_versions(set(self.result_tags(value)) - tags.keys(), self.cache_alias)
+            if any(version is not None and version > horizon for version in extra.values()):
+                return value
+            tags.update(extra)
+        entry = CacheEntry(value, time.time() + self.timeout, delta, tags)
+        self.cache.set(key, entry, self.timeout + self.stale_timeout)
+        return value
+
+    def _wait(self, key: str, lock_key: str) -> Optional[CacheEntry]:
+        """Wait for the lock holder to store a fresh entry."""
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry
+            if self.cache.get(lock_key) is None:
+                break
+            delay = min(delay * 2, 0.2)
+        return None
+
+    def __call__(self, *args, **kwargs):
+        key = self.make_key(*args, **kwargs)
+        entry = self._lookup(key)
+        if entry is not None and not self._should_refresh(entry, time.time()):
+            return entry.value
+
+        lock_key = f"{key}:lock"
+        if self.cache.add(lock_key, 1, self.lock_timeout):
+            try:
+                return self._compute(key, args, kwargs)
+            finally:
+                self.cache.delete(lock_key)
+
+        if entry is not None:
+            # Someone else is refreshing: serve the stale value meanwhile.
+            return entry.value
+
+        entry = self._wait(key, lock_key)
+        if entry is not None:
+            return entry.value
+        return self._compute(key, args, kwargs)
+
+    def invalidate(self, *args, **kwargs) -> None:
+        """Drop the entry cached for the given call arguments."""
+        self.cache.delete(self.make_key(*args, **kwargs))
+
+
+def stampede_cached(timeout: int, **options) -> Callable[[Callable], StampedeCachedFunction]:
+    """
+    Decorator caching a function's result with stampede protection.
+
+    Usage:
+        @stampede_cached(timeout=60*15, tags=lookup_tags, result_tags=row_tags)
+        def get_organization(**kwargs): ...
+
+    See `StampedeCachedFunction` for the available options.
+    """
+    def decorator(func: Callable) -> StampedeCachedFunction:
+        return StampedeCachedFunction(func, timeout, **options)
+    return decorator
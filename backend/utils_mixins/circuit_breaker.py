@@ -0,0 +1,109 @@
+import logging
+import threading
+import time
+from collections import Counter
+from enum import Enum
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"          # calls go through
+    OPEN = "open"              # calls are short-circuited to the fallback
+    HALF_OPEN = "half_open"    # one trial call is let through
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and every
+    call is short-circuited for `reset_timeout` seconds. Then a single trial
+    call is let through (half-open): its success closes the circuit, its
+    failure opens it again for another cool-down period.
+
+    `metrics` counts state transitions, failures and short-circuited calls.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.metrics = Counter()
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: CircuitState) -> None:
+        if state == self.state:
+            return
+        logger.warning("Circuit breaker %r: %s -> %s", self.name, self.state.value, state.value)
+        self.state = state
+        self.metrics[f"to_{state.value}"] += 1
+        if state == CircuitState.OPEN:
+            self.opened_at = time.monotonic()
+
+    def allow_request(self) -> bool:
+        """Whether the protected resource may be called now."""
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return True
+            if self.state == CircuitState.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.metrics["short_circuited"] += 1
+                    return False
+                self._transition(CircuitState.HALF_OPEN)
+            if self._trial_running:
+                self.metrics["short_circuited"] += 1
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self) -> bool:
+        """Record a successful call. Returns True when it closed the circuit."""
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            if self.state == CircuitState.CLOSED:
+                return False
+            self._transition(CircuitState.CLOSED)
+            return True
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.metrics["failures"] += 1
+            self.failures += 1
+            self._trial_running = False
+            if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._transition(CircuitState.OPEN)
+
+    def stats(self) -> dict:
+        return {"name": self.name, "state": self.state.value, **self.metrics}
+
+
+_breakers: dict = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """
+    Return the process-wide breaker called `name`, configured from the
+    CIRCUIT_BREAKERS setting (`{name: {"failure_threshold": .., "reset_timeout": ..}}`).
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            config = getattr(settings, "CIRCUIT_BREAKERS", {}).get(name, {})
+            _breakers[name] = CircuitBreaker(name, **config)
+        return _breakers[name]
+
+
+def breakers_stats() -> list:
+    """State and metrics of the breakers of this process (the configured ones at least)."""
+    for name in getattr(settings, "CIRCUIT_BREAKERS", {}):
+        get_breaker(name)
+    return [breaker.stats() for breaker in _breakers.values()]
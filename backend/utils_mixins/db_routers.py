@@ -0,0 +1,163 @@
+import logging
+import math
+import random
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import HttpRequest
+
+
+logger = logging.getLogger(__name__)
+
+# Epoch seconds until which a client reads from the primary (read-your-writes).
+PIN_COOKIE = "mae_primary_until"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Seconds a measured replica lag is reused before being measured again.
+LAG_CHECK_INTERVAL = 1.0
+
+
+class _RoutingState:
+    def __init__(self, use_replica: bool):
+        self.use_replica = use_replica
+        self.written = False
+        self.replica = None
+
+
+_state: ContextVar[Optional[_RoutingState]] = ContextVar("db_routing", default=None)
+_lags: dict = {}
+
+
+def max_staleness() -> float:
+    """Seconds a read may lag behind the primary (0 without replicas)."""
+    if not getattr(settings, "DATABASE_REPLICAS", None):
+        return 0.0
+    return settings.REPLICA_MAX_LAG
+
+
+def mark_written() -> None:
+    """
+    Record a data write of the current request: its next reads go to the
+    primary and the client is pinned to it. Unsafe methods are pinned
+    anyway; to call from write paths of GET/HEAD requests.
+    """
+    state = _state.get()
+    if state is not None:
+        state.written = True
+
+
+def replica_lag(alias: str) -> float:
+    """
+    Seconds `alias` is behind the primary: 0 when unknown (e.g. SQLite),
+    infinite when the replica cannot be reached.
+    """
+    now = time.monotonic()
+    checked = _lags.get(alias)
+    if checked is not None and now - checked[0] < LAG_CHECK_INTERVAL:
+        return checked[1]
+
+    lag = 0.0
+    connection = connections[alias]
+    if connection.vendor == "postgresql":
+        try:
+            with connection.cursor() as cursor:
+                # An idle primary sends no transaction: a replica that
+                # replayed all it received is up to date.
+                cursor.execute(
+                    "SELECT CASE"
+                    " WHEN NOT pg_is_in_recovery()"
+                    "  OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+                    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                    " END"
+                )
+                lag = float(cursor.fetchone()[0])
+        except DatabaseError as exc:
+            logger.warning("Replica %s unavailable: %s", alias, exc)
+            lag = math.inf
+    _lags[alias] = (now, lag)
+    return lag
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of replica-enabled requests (see ReplicaRoutingMiddleware)
+    to a replica lagging at most REPLICA_MAX_LAG seconds, the same one for
+    the whole request. Writes, reads inside a transaction and every read
+    following `mark_written()` go to the primary.
+
+    A write alone does not pin the request: authentication writes
+    `last_login` on every request, which would send all reads to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Explicitly the primary, not None: Django would fall back to the
+        # database of the `instance` hint, e.g. a shard for its organization.
+        state = _state.get()
+        if state is None or not state.use_replica or state.written:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            healthy = [
+                alias for alias in settings.DATABASE_REPLICAS
+                if replica_lag(alias) <= settings.REPLICA_MAX_LAG
+            ]
+            state.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in getattr(settings, "DATABASE_REPLICAS", ()):
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enables replica reads for GET/HEAD requests on REPLICA_ROUTES.
+
+    A client which wrote (unsafe method, or `mark_written()` during the
+    request) is pinned to the primary for REPLICA_MAX_LAG seconds through a cookie,
+    so that it reads its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.routes = getattr(settings, "REPLICA_ROUTES", [])
+
+    def pinned(self, request: HttpRequest) -> bool:
+        try:
+            return time.time() < float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            return False
+
+    def __call__(self, request: HttpRequest):
+        use_replica = (
+            bool(getattr(settings, "DATABASE_REPLICAS", None))
+            and request.method in ("GET", "HEAD")
+            and any(request.path.startswith(prefix) for prefix in self.routes)
+            and not self.pinned(request)
+        )
+        state = _RoutingState(use_replica)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+
+        if settings.DATABASE_REPLICAS and (state.written or request.method not in SAFE_METHODS):
+            lag = settings.REPLICA_MAX_LAG
+            response.set_cookie(
+                PIN_COOKIE, f"{time.time() + lag:.3f}", max_age=math.ceil(lag), httponly=True, samesite="Lax"
+            )
+        return response
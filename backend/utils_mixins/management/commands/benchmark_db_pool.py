@@ -0,0 +1,103 @@
+import copy
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import ConnectionHandler
+
+from passport.models import Passport
+
+
+class Command(BaseCommand):
+    help = 'Compare requests/second on Postgres with and without the connection pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=16,
+            help='Concurrent clients (default: 16)'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per client (default: 200)'
+        )
+        parser.add_argument(
+            '--pool-size',
+            type=int,
+            default=10,
+            help='max_size of the pool (default: 10)'
+        )
+
+    def handle(self, *args, **options):
+        default = connections.databases[DEFAULT_DB_ALIAS]
+        if default['ENGINE'] != 'django.db.backends.postgresql':
+            raise CommandError("The pool benchmark needs DATABASE_URL to point to Postgres.")
+
+        direct = copy.deepcopy(default)
+        direct['OPTIONS'].pop('pool', None)
+        direct['CONN_MAX_AGE'] = 0
+
+        pooled = copy.deepcopy(default)
+        pooled['CONN_MAX_AGE'] = 0
+        pooled['OPTIONS']['pool'] = {
+            **pooled['OPTIONS'].get('pool', {}),
+            'min_size': options['pool_size'],
+            'max_size': options['pool_size'],
+        }
+
+        self.stdout.write(
+            f"{options['threads']} clients x {options['requests']} requests "
+            f"(one connection per request without pool)"
+        )
+        header = f"{'mode':<14} {'seconds':>9} {'req/s':>9} {'p95 ms':>9}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for name, settings_dict in (('no pool', direct), ('psycopg pool', pooled)):
+            elapsed, latencies = self._run(settings_dict, options['threads'], options['requests'])
+            total = len(latencies)
+            p95 = sorted(latencies)[int(total * 0.95) - 1] * 1000
+            self.stdout.write(f"{name:<14} {elapsed:>9.2f} {total / elapsed:>9.0f} {p95:>9.1f}")
+
+    def _run(self, settings_dict, threads, requests):
+        # A private handler: thread-local connections, own pool, same settings.
+        alias = 'benchmark'
+        handler = ConnectionHandler({DEFAULT_DB_ALIAS: settings_dict, alias: settings_dict})
+        table = Passport._meta.db_table
+        latencies = []
+        lock = threading.Lock()
+
+        def client():
+            mine = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                connection = handler[alias]
+                with connection.cursor() as cursor:
+                    # What a list request does: one count, one page.
+                    cursor.execute(f'SELECT COUNT(*) FROM "{table}" WHERE "deleted" IS NULL')
+                    cursor.execute(
+                        f'SELECT "id", "code", "last_name" FROM "{table}" '
+                        f'WHERE "deleted" IS NULL ORDER BY "created_at" DESC LIMIT 20'
+                    )
+                    cursor.fetchall()
+                # End of request: the connection is closed, or returned to the pool.
+                connection.close()
+                mine.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(mine)
+
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        connection = handler[alias]
+        if getattr(connection, 'pool', None) is not None:
+            connection.close_pool()
+        return elapsed, latencies
@@ -0,0 +1,176 @@
+import copy
+import os
+import random
+import string
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from passport.enums import BatchStatus, PassportStatus
+from organisations.models import Organization
+from passport.models import Batch, Passport
+
+
+class Command(BaseCommand):
+    help = 'Mixed search/publish load on SQLite with the default settings and with the SQLite profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=8,
+            help='Concurrent search clients (default: 8)'
+        )
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=2,
+            help='Concurrent publish clients (default: 2)'
+        )
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=10,
+            help='Duration of each run (default: 10)'
+        )
+        parser.add_argument(
+            '--passports',
+            type=int,
+            default=20_000,
+            help='Passports in the benchmark database (default: 20000)'
+        )
+
+    def handle(self, *args, **options):
+        from mae.settings.database import _sqlite_profile
+
+        plain = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'OPTIONS': {},
+            # Django's default busy timeout (sqlite3 module default: 5 s).
+            'CONN_MAX_AGE': 0,
+        }
+        tuned = copy.deepcopy(plain)
+        _sqlite_profile(tuned)
+
+        self.stdout.write(
+            f"{options['readers']} readers, {options['writers']} writers, "
+            f"{options['seconds']:.0f} s, {options['passports']} passports"
+        )
+        header = f"{'profile':<10} {'searches/s':>11} {'publish/s':>10} {'locked':>8} {'p95 ms':>8}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for name, settings_dict in (('default', plain), ('tuned', tuned)):
+            result = self._run(name, settings_dict, options)
+            self.stdout.write(
+                f"{name:<10} {result['searches']:>11.0f} {result['publishes']:>10.1f} "
+                f"{result['locked']:>8} {result['p95']:>8.1f}"
+            )
+
+    def _run(self, name, settings_dict, options):
+        directory = tempfile.mkdtemp(prefix='mae-sqlite-bench-')
+        alias = f'sqlite_benchmark_{name}'
+        connections.settings[alias] = connections.configure_settings({
+            DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS],
+            alias: {**copy.deepcopy(settings_dict), 'NAME': os.path.join(directory, 'db.sqlite3')},
+        })[alias]
+        try:
+            batches = self._seed(alias, options['passports'])
+            return self._load(alias, batches, options)
+        finally:
+            connections[alias].close()
+            del connections.settings[alias]
+            for filename in os.listdir(directory):
+                os.remove(os.path.join(directory, filename))
+            os.rmdir(directory)
+
+    def _seed(self, alias, count):
+        with connections[alias].schema_editor() as editor:
+            editor.create_model(Organization)
+            editor.create_model(Batch)
+            editor.create_model(Passport)
+        batches = Batch.objects.using(alias).bulk_create([Batch() for _ in range(count // 100)])
+        passports = []
+        for index in range(count):
+            batch = batches[index % len(batches)]
+            passports.append(Passport(
+                batch=batch,
+                code=f'P{index}',
+                coupon_id=f'C{index}',
+                first_name=random.choice(string.ascii_uppercase) * 5,
+                last_name=random.choice(string.ascii_uppercase) + 'name',
+                gender='M',
+            ))
+        Passport.objects.using(alias).bulk_create(passports, batch_size=2000)
+        connections[alias].close()
+        return [batch.pk for batch in batches]
+
+    def _load(self, alias, batches, options):
+        deadline = time.monotonic() + options['seconds']
+        counts = {'searches': 0, 'publishes': 0, 'locked': 0}
+        latencies = []
+        lock = threading.Lock()
+
+        def record(kind, started):
+            with lock:
+                counts[kind] += 1
+                latencies.append(time.perf_counter() - started)
+
+        def reader():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    # A counter clerk's search: count, then the first page.
+                    qs = Passport.objects.using(alias).filter(
+                        last_name__istartswith=random.choice(string.ascii_uppercase)
+                    )
+                    qs.count()
+                    list(qs.order_by('-created_at')[:20])
+                except OperationalError:
+                    with lock:
+                        counts['locked'] += 1
+                    continue
+                record('searches', started)
+            connections[alias].close()
+
+        def writer():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                batch_id = random.choice(batches)
+                try:
+                    # A batch publication (as BatchService.publish): reads,
+                    # then passports and batch status updates.
+                    with transaction.atomic(using=alias):
+                        passports = Passport.objects.using(alias).filter(batch_id=batch_id)
+                        Batch.objects.using(alias).get(pk=batch_id)
+                        passports.exists()
+                        passports.update(status=PassportStatus.PUBLISHED)
+                        passports.count()
+                        Batch.objects.using(alias).filter(pk=batch_id).update(
+                            status=BatchStatus.PUBLISHED
+                        )
+                except OperationalError:
+                    with lock:
+                        counts['locked'] += 1
+                    continue
+                record('publishes', started)
+            connections[alias].close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        latencies.sort()
+        return {
+            'searches': counts['searches'] / elapsed,
+            'publishes': counts['publishes'] / elapsed,
+            'locked': counts['locked'],
+            'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        }
@@ -0,0 +1,103 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from utils_mixins.uuids import uuid7
+
+
+GENERATORS = {
+    'v4': uuid.uuid4,
+    'v7': uuid7,
+}
+
+
+def _bench_model(version):
+    """Throwaway table shaped like an insert-heavy table keyed by UUID."""
+    meta = type('Meta', (), {
+        'app_label': 'utils_mixins',
+        'db_table': f'uuid_benchmark_{version}',
+        'managed': False,
+    })
+    return type(f'UUIDBenchmark{version.upper()}', (models.Model,), {
+        '__module__': __name__,
+        'Meta': meta,
+        'id': models.UUIDField(primary_key=True),
+        'created_at': models.DateTimeField(auto_now_add=True),
+        'payload': models.CharField(max_length=64),
+    })
+
+
+class Command(BaseCommand):
+    help = 'Compare bulk insert throughput and primary key index size with UUID v4 and v7 keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=1_000_000,
+            help='Rows inserted per version (default: 1000000)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10_000,
+            help='Rows per INSERT (default: 10000)'
+        )
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+        header = f"{'version':<8} {'rows':>10} {'seconds':>9} {'rows/s':>10} {'pk index':>12}"
+        self.stdout.write(f"{connection.vendor}, {rows} rows per version")
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        for version, generate in GENERATORS.items():
+            model = _bench_model(version)
+            with connection.schema_editor() as editor:
+                editor.create_model(model)
+            try:
+                elapsed = self._insert(model, generate, rows, batch_size)
+                size = self._index_size(model)
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.delete_model(model)
+
+            size = f"{size / 2**20:.1f} MiB" if size is not None else "n/a"
+            self.stdout.write(
+                f"{version:<8} {rows:>10} {elapsed:>9.2f} {rows / elapsed:>10.0f} {size:>12}"
+            )
+
+    def _insert(self, model, generate, rows, batch_size):
+        started = time.perf_counter()
+        for start in range(0, rows, batch_size):
+            count = min(batch_size, rows - start)
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    [model(id=generate(), payload=f'row {start + i}') for i in range(count)]
+                )
+        return time.perf_counter() - started
+
+    def _index_size(self, model):
+        """Size in bytes of the primary key index, when the database can tell."""
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT pg_relation_size(indexrelid) FROM pg_index "
+                    "WHERE indrelid = %s::regclass AND indisprimary",
+                    [table],
+                )
+                return cursor.fetchone()[0]
+            if connection.vendor == 'sqlite':
+                try:
+                    cursor.execute(
+                        "SELECT SUM(pgsize) FROM dbstat WHERE name = %s",
+                        [f'sqlite_autoindex_{table}_1'],
+                    )
+                except Exception:
+                    # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB.
+                    return None
+                return cursor.fetchone()[0]
+        return None
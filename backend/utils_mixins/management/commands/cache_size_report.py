@@ -0,0 +1,55 @@
+import pickle
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from utils_mixins import serializers
+
+
+class Command(BaseCommand):
+    help = 'Report cache bytes per entry with pickle and with the compact serializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            default=['organisations.Organization', 'organisations.OrganizationUser', 'passport.Passport'],
+            help='Models to sample (app_label.Model)'
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=100,
+            help='Number of rows sampled per model (default: 100)'
+        )
+
+    def handle(self, *args, **options):
+        header = f"{'entry':<40} {'pickle':>10} {'compact':>10} {'compressed':>12} {'gain':>7}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+
+        for label in options['models']:
+            model = apps.get_model(label)
+            rows = list(model._default_manager.all()[:options['sample']])
+            if not rows:
+                self.stdout.write(self.style.WARNING(f"{label}: no rows to sample"))
+                continue
+
+            # One entry per instance (e.g. get_organization) ...
+            self._report(f"{label} (instance)", rows)
+            # ... and one entry for the whole list (e.g. a cached queryset).
+            self._report(f"{label} (list of {len(rows)})", [rows])
+
+    def _report(self, name, values):
+        pickled = sum(len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) for value in values)
+        with override_settings(CACHE_COMPRESSION=None):
+            compact = sum(len(serializers.dumps(value)) for value in values)
+        compressed = sum(len(serializers.dumps(value)) for value in values)
+
+        count = len(values)
+        gain = 100 * (1 - compressed / pickled)
+        self.stdout.write(
+            f"{name:<40} {pickled // count:>10} {compact // count:>10} "
+            f"{compressed // count:>12} {gain:>6.1f}%"
+        )
@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from utils_mixins.soft_delete import purge_aliases, purge_soft_deleted, purgeable
+
+
+class Command(BaseCommand):
+    help = 'Delete for good the rows soft-deleted past the retention (SOFT_DELETE_RETENTION)'
+
+    def add_arguments(self, parser):
+        retention = settings.SOFT_DELETE_RETENTION
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=retention['days'],
+            help=f"Rows soft-deleted more than this many days ago are purged (default: {retention['days']})"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=retention['chunk_size'],
+            help=f"Rows deleted per transaction (default: {retention['chunk_size']})"
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=retention['pause'],
+            help=f"Seconds between chunks (default: {retention['pause']})"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count the rows due for the purge'
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        total_rows, total_bytes = 0, None
+
+        for label in settings.SOFT_DELETE_RETENTION['models']:
+            model = apps.get_model(label)
+            if options['dry_run']:
+                # Parents of children due are not counted (still referenced).
+                due = sum(purgeable(model, before).using(alias).count() for alias in purge_aliases(model))
+                self.stdout.write(f"{model._meta.label}: {due} rows due")
+                continue
+
+            rows, size = purge_soft_deleted(
+                model, before, chunk_size=options['chunk_size'], pause=options['pause']
+            )
+            total_rows += rows
+            if size is not None:
+                total_bytes = (total_bytes or 0) + size
+            reclaimed = f"{size} bytes" if size is not None else "bytes not measured"
+            self.stdout.write(f"{model._meta.label}: {rows} rows purged ({reclaimed})")
+
+        if not options['dry_run']:
+            reclaimed = f", {total_bytes} bytes reclaimed (reusable after VACUUM)" if total_bytes is not None else ""
+            self.stdout.write(self.style.SUCCESS(f"{total_rows} rows purged{reclaimed}"))
@@ -1,13 +1,16 @@
-import uuid
 from django.db import models
 from django.conf import settings
+from utils_mixins.uuids import default_uuid
 
 
 class UUIDPrimaryKeyMixin(models.Model):
-    """Mixin that provides a UUID primary key field."""
+    """
+    Mixin that provides a UUID primary key field.
+    Random (v4) by default, time-ordered (v7) with UUID_PRIMARY_KEY_VERSION = 7.
+    """
     id = models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=default_uuid,
         editable=False,
         help_text="Unique identifier for this record"
     )
@@ -0,0 +1,173 @@
+import gzip
+import time
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse
+from django.test.client import RequestFactory
+from django.urls import resolve
+
+from utils_mixins.caches import get_tag_versions, invalidate_tags
+from utils_mixins.db_routers import max_staleness
+
+
+SURROGATE_KEY_HEADER = "Surrogate-Key"
+KEY_PREFIX = "response"
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    content_type: str
+    body: bytes           # gzip-compressed
+    tags: dict            # surrogate key -> version
+
+
+def surrogate_tag(key: str) -> str:
+    return f"surrogate:{key}"
+
+
+def add_surrogate_keys(response: HttpResponse, *keys: str) -> None:
+    """Tag a response so that it can be purged with `purge_surrogate_keys`."""
+    existing = response.headers.get(SURROGATE_KEY_HEADER, "").split()
+    response.headers[SURROGATE_KEY_HEADER] = " ".join(dict.fromkeys([*existing, *keys]))
+
+
+def purge_surrogate_keys(*keys: str) -> None:
+    """Purge, in O(1) per key, every cached response tagged with one of `keys`."""
+    invalidate_tags(*(surrogate_tag(key) for key in keys))
+
+
+class ResponseCacheMiddleware:
+    """
+    Full-response cache for the routes listed in RESPONSE_CACHE_ROUTES
+    (`{path prefix: timeout}`).
+
+    Successful GET responses are stored gzip-compressed, keyed by the
+    normalized URL (sorted, stripped, non-empty query parameters), and tagged
+    with the surrogate keys the view set in the `Surrogate-Key` header.
+    Hits are answered before any other middleware or controller code runs,
+    pre-compressed when the client accepts gzip.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.routes = getattr(settings, "RESPONSE_CACHE_ROUTES", {})
+        self.cache_alias = getattr(settings, "RESPONSE_CACHE_ALIAS", "default")
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_timeout(self, request: HttpRequest):
+        if request.method != "GET":
+            return None
+        for prefix, timeout in self.routes.items():
+            if request.path.startswith(prefix):
+                return timeout
+        return None
+
+    def make_key(self, request: HttpRequest) -> str:
+        params = sorted(
+            (name, " ".join(value.split()))
+            for name, value in parse_qsl(request.META.get("QUERY_STRING", ""))
+            if value.strip()
+        )
+        return f"{KEY_PREFIX}:{request.get_host()}{request.path}?{urlencode(params)}"
+
+    def __call__(self, request: HttpRequest):
+        timeout = self.get_timeout(request)
+        if timeout is None:
+            return self.get_response(request)
+
+        key = self.make_key(request)
+        cached = self.cache.get(key)
+        if cached is not None and get_tag_versions(cached.tags, self.cache_alias) == cached.tags:
+            return self.build_response(request, cached)
+
+        response = self.refresh(request, key, timeout)
+        response.headers["X-Cache"] = "MISS"
+        return response
+
+    def refresh(self, request: HttpRequest, key: str, timeout, max_lag: Optional[float] = None) -> HttpResponse:
+        """
+        Compute the response, whatever is cached, and store it. `max_lag`:
+        seconds the data read may lag behind the primary (max_staleness()
+        by default, 0 when it was read from the primary).
+        """
+        started = time.time_ns()
+        response = self.get_response(request)
+        keys = response.headers.get(SURROGATE_KEY_HEADER, "").split()
+        if SURROGATE_KEY_HEADER in response.headers:
+            del response.headers[SURROGATE_KEY_HEADER]
+        if response.status_code == 200 and not response.streaming:
+            self.store(key, response, keys, started, timeout, max_lag)
+        return response
+
+    def store(self, key, response, keys, started, timeout, max_lag: Optional[float] = None) -> None:
+        tags = get_tag_versions([surrogate_tag(k) for k in keys], self.cache_alias)
+        # Purged while the response was being computed, or so recently that
+        # a replica may not show the change yet: it may be stale.
+        if max_lag is None:
+            max_lag = max_staleness()
+        horizon = started - int(max_lag * 1e9)
+        if any(version is not None and version > horizon for version in tags.values()):
+            return
+        cached = CachedResponse(
+            response.status_code,
+            response.headers.get("Content-Type", ""),
+            gzip.compress(response.content),
+            tags,
+        )
+        self.cache.set(key, cached, timeout)
+
+    def build_response(self, request: HttpRequest, cached: CachedResponse) -> HttpResponse:
+        if "gzip" in request.headers.get("Accept-Encoding", ""):
+            response = HttpResponse(cached.body, status=cached.status, content_type=cached.content_type)
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(
+                gzip.decompress(cached.body), status=cached.status, content_type=cached.content_type
+            )
+        response.headers["Vary"] = "Accept-Encoding"
+        response.headers["X-Cache"] = "HIT"
+        return response
+
+
+def _resolve_and_call(request: HttpRequest) -> HttpResponse:
+    match = resolve(request.path_info)
+    return match.func(request, *match.args, **match.kwargs)
+
+
+def public_origins() -> list:
+    """Origins the public routes are served from (PUBLIC_ORIGINS or ALLOWED_HOSTS)."""
+    origins = getattr(settings, "PUBLIC_ORIGINS", None)
+    if origins:
+        return list(origins)
+    return [
+        f"https://{host}" for host in settings.ALLOWED_HOSTS
+        if host and host != "*" and not host.startswith(".")
+    ]
+
+
+def warm_response(path: str, params: Optional[dict] = None, origin: str = "http://localhost") -> int:
+    """
+    Render `path` as a GET from `origin` and store it in the response cache,
+    replacing any cached entry. Returns the status code.
+
+    Rendered outside ReplicaRoutingMiddleware, hence read from the primary:
+    a purge just before is no reason not to store it.
+    """
+    origin = urlsplit(origin)
+    request = RequestFactory().get(
+        path,
+        params or {},
+        secure=origin.scheme == "https",
+        HTTP_HOST=origin.netloc,
+    )
+    middleware = ResponseCacheMiddleware(_resolve_and_call)
+    timeout = middleware.get_timeout(request)
+    if timeout is None:
+        raise ValueError(f"{path} is not listed in RESPONSE_CACHE_ROUTES")
+    return middleware.refresh(request, middleware.make_key(request), timeout, max_lag=0).status_code
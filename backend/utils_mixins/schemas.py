@@ -8,3 +8,14 @@ class MessageSchema(Schema):
     code: Optional[int] = None
     detail: str
 
+
+
+class CircuitBreakerSchema(Schema):
+    """State and counters of a circuit breaker (see utils_mixins.circuit_breaker)."""
+    name: str
+    state: str
+    failures: int = 0
+    short_circuited: int = 0
+    to_open: int = 0
+    to_half_open: int = 0
+    to_closed: int = 0
@@ -0,0 +1,174 @@
+"""
+Compact cache serialization.
+
+Pickling a model instance stores its whole `__dict__`: `_state`, related
+object caches, deferred markers, plus the class path of every object. Here
+model instances are reduced to a tuple of their concrete field values
+(rebuilt with `Model.from_db` on read), wherever they appear in the cached
+value (querysets results, lists, dicts, cache envelopes...). Payloads above
+CACHE_COMPRESSION_THRESHOLD bytes are compressed with CACHE_COMPRESSION:
+"zlib" (standard library), "zstd" or "lz4" (the `zstandard` or `lz4`
+package must be installed, zlib is used with a warning otherwise).
+
+`CompactRedisSerializer` is the "serializer" option of a Redis cache: a
+value cached against other model fields is read as a miss. cacheops keeps
+its own pickle serializer: it has no way to turn a value it cannot load
+into a miss.
+"""
+import io
+import logging
+import pickle
+import zlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache.backends.redis import RedisSerializer
+from django.db import models
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+
+logger = logging.getLogger(__name__)
+
+
+RAW, ZLIB, ZSTD, LZ4 = b"\x00", b"\x01", b"\x02", b"\x03"
+PICKLE = b"\x80"  # values written by the plain pickle serializer
+
+DEFAULT_COMPRESSION_THRESHOLD = 1024
+
+
+class StaleSchemaError(pickle.UnpicklingError):
+    """The cached instance was serialized with different model fields."""
+
+
+def _fields_signature(model) -> int:
+    names = ",".join(field.attname for field in model._meta.concrete_fields)
+    return zlib.crc32(names.encode())
+
+
+def _rebuild_instance(label, signature, db, values, deferred, related, extra):
+    model = apps.get_model(label)
+    if signature != _fields_signature(model):
+        raise StaleSchemaError(f"Fields of {label} changed since this value was cached")
+    if deferred:
+        values = list(values)
+        for index in deferred:
+            values[index] = models.DEFERRED
+    instance = model.from_db(db, [f.attname for f in model._meta.concrete_fields], values)
+    instance._state.fields_cache.update(related)
+    instance.__dict__.update(extra)
+    return instance
+
+
+class CompactPickler(pickle.Pickler):
+
+    def reducer_override(self, obj):
+        if not isinstance(obj, models.Model) or obj._meta.abstract:
+            return NotImplemented
+
+        model = obj._meta.concrete_model
+        values, deferred = [], []
+        for index, field in enumerate(model._meta.concrete_fields):
+            if field.attname in obj.__dict__:
+                values.append(obj.__dict__[field.attname])
+            else:
+                values.append(None)
+                deferred.append(index)
+
+        attnames = {field.attname for field in model._meta.concrete_fields}
+        # Annotations and `to_attr` prefetches are kept, Django internals are not.
+        extra = {
+            name: value for name, value in obj.__dict__.items()
+            if name not in attnames and not name.startswith("_")
+        }
+        return _rebuild_instance, (
+            model._meta.label_lower,
+            _fields_signature(model),
+            obj._state.db,
+            tuple(values),
+            tuple(deferred),
+            dict(obj._state.fields_cache),
+            extra,
+        )
+
+
+_warned = set()
+
+
+def _compression():
+    codec = getattr(settings, "CACHE_COMPRESSION", "zlib")
+    if (codec == "zstd" and zstandard is None) or (codec == "lz4" and lz4 is None):
+        if codec not in _warned:
+            _warned.add(codec)
+            logger.warning("CACHE_COMPRESSION=%s but its package is not installed: zlib is used", codec)
+        return "zlib"
+    return codec
+
+
+def _compression_threshold():
+    return getattr(settings, "CACHE_COMPRESSION_THRESHOLD", DEFAULT_COMPRESSION_THRESHOLD)
+
+
+def compress(data: bytes) -> bytes:
+    codec = _compression()
+    if codec is None or len(data) < _compression_threshold():
+        return RAW + data
+    if codec == "zstd":
+        return ZSTD + zstandard.ZstdCompressor().compress(data)
+    if codec == "lz4":
+        return LZ4 + lz4.frame.compress(data)
+    return ZLIB + zlib.compress(data)
+
+
+def decompress(data: bytes) -> bytes:
+    header, body = data[:1], data[1:]
+    if header == PICKLE:
+        return data
+    if header == RAW:
+        return body
+    if header == ZLIB:
+        return zlib.decompress(body)
+    if header == ZSTD and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(body)
+    if header == LZ4 and lz4 is not None:
+        return lz4.frame.decompress(body)
+    raise pickle.UnpicklingError("Unknown cache payload header (or codec not installed)")
+
+
+def dumps(obj, protocol=pickle.HIGHEST_PROTOCOL) -> bytes:
+    buffer = io.BytesIO()
+    CompactPickler(buffer, protocol).dump(obj)
+    return compress(buffer.getvalue())
+
+
+def loads(data: bytes):
+    return pickle.loads(decompress(bytes(data)))
+
+
+class CompactRedisSerializer(RedisSerializer):
+    """Serializer for Django's Redis cache (OPTIONS["serializer"])."""
+
+    def dumps(self, obj):
+        # Integers stay raw for incr()/decr() atomicity, as in RedisSerializer.
+        if type(obj) is int:
+            return obj
+        return dumps(obj, self.protocol)
+
+    def loads(self, data):
+        try:
+            return int(data)
+        except ValueError:
+            pass
+        try:
+            return loads(data)
+        except pickle.UnpicklingError:
+            # Other model fields (StaleSchemaError) or codec: a cache miss.
+            return None
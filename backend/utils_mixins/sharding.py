@@ -0,0 +1,121 @@
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cmp_to_key
+from itertools import islice
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import QuerySet
+
+
+# Shard forced by `use_shard` (tooling), whatever the current organization.
+_forced_shard: ContextVar[Optional[str]] = ContextVar("forced_shard", default=None)
+
+
+def shard_aliases() -> list:
+    """Databases holding sharded data: the default one, then DATABASE_SHARDS."""
+    return list(dict.fromkeys([DEFAULT_DB_ALIAS, *getattr(settings, "DATABASE_SHARDS", ())]))
+
+
+def is_sharded() -> bool:
+    return len(shard_aliases()) > 1
+
+
+def forced_shard() -> Optional[str]:
+    return _forced_shard.get()
+
+
+@contextmanager
+def use_shard(alias: str):
+    """Route every sharded query of the block to `alias`."""
+    if alias not in shard_aliases():
+        raise ValueError(f"{alias} is not a shard (DATABASE_SHARDS)")
+    token = _forced_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _forced_shard.reset(token)
+
+
+def scatter(queryset: QuerySet, func: Callable, aliases: Optional[Iterable[str]] = None) -> list:
+    """
+    Run `func(queryset.using(alias))` on every shard in parallel, one thread
+    (and connection) per shard. Returns the results in `aliases` order.
+    """
+    aliases = list(aliases or shard_aliases())
+    if len(aliases) == 1:
+        return [func(queryset.using(aliases[0]))]
+
+    def run(alias):
+        try:
+            return func(queryset.using(alias))
+        finally:
+            connections[alias].close()
+
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return list(pool.map(run, aliases))
+
+
+def _compare(a, b) -> int:
+    # NULLs first, as SQLite sorts them.
+    if a is None or b is None:
+        return (a is not None) - (b is not None)
+    return (a > b) - (a < b)
+
+
+class ShardedResults:
+    """
+    Countable and sliceable union of an ordered queryset over every shard
+    (scatter-gather): each shard runs the query, the ordered rows are merged.
+    A slice [start:stop] reads at most `stop` rows per shard. Ordering must
+    use plain field names present in the rows (model instances or values()
+    dicts). Can be handed to Django's Paginator or to VersionedResults.
+    """
+
+    ordered = True
+
+    def __init__(self, queryset: QuerySet, aliases: Optional[Iterable[str]] = None):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not ordering:
+            raise ValueError("ShardedResults needs an ordered queryset")
+        if not all(isinstance(field, str) and "__" not in field for field in ordering):
+            raise ValueError("ShardedResults only merges on plain field names")
+        self.queryset = queryset
+        self.aliases = list(aliases or shard_aliases())
+        self.ordering = [(field.lstrip("-"), field.startswith("-")) for field in ordering]
+
+    def _value(self, row, field):
+        return row[field] if isinstance(row, dict) else getattr(row, field)
+
+    def _compare_rows(self, a, b) -> int:
+        for field, descending in self.ordering:
+            result = _compare(self._value(a, field), self._value(b, field))
+            if result:
+                return -result if descending else result
+        return 0
+
+    def count(self) -> int:
+        return sum(scatter(self.queryset, lambda qs: qs.count(), self.aliases))
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:None])
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            rows = self[index:index + 1]
+            if not rows:
+                raise IndexError("ShardedResults index out of range")
+            return rows[0]
+        if index.step is not None:
+            raise ValueError("ShardedResults slices have no step")
+        start, stop = index.start or 0, index.stop
+        queryset = self.queryset if stop is None else self.queryset[:stop]
+        rows = scatter(queryset, list, self.aliases)
+        merged = heapq.merge(*rows, key=cmp_to_key(self._compare_rows))
+        return list(islice(merged, start, stop))
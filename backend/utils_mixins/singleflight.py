@@ -0,0 +1,116 @@
+import threading
+import time
+import uuid
+from typing import Any, Callable
+
+from django.core.cache import caches
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent calls sharing the same key execute the
+    function once, the other callers wait for and share its result.
+
+    Within a worker, callers are coalesced with a thread event. With
+    `distributed=True`, the leader of each worker also competes for a cache
+    lock: the worker holding it executes the function and publishes the
+    result of this flight for `result_timeout` seconds, the workers which
+    joined the flight wait for that result instead of executing the same
+    query. Results are never shared with calls started after the flight.
+    Any Django cache backend works (Redis in production, LocMemCache as a
+    local stand-in).
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        distributed: bool = False,
+        result_timeout: float = 2,
+        lock_timeout: int = 10,
+        wait_timeout: float = 5.0,
+        cache_alias: str = "default",
+    ):
+        self.prefix = prefix
+        self.distributed = distributed
+        self.result_timeout = result_timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.cache_alias = cache_alias
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def do(self, key: str, func: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.distributed:
+                call.result = self._do_distributed(key, func, args, kwargs)
+            else:
+                call.result = func(*args, **kwargs)
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _do_distributed(self, key: str, func: Callable, args, kwargs) -> Any:
+        lock_key = f"{self.prefix}:{key}:lock"
+        flight = uuid.uuid4().hex
+
+        if not self.cache.add(lock_key, flight, self.lock_timeout):
+            # Join the flight in progress: only its result is shared, so a
+            # result computed before a write is never served after it.
+            leader = self.cache.get(lock_key)
+            if leader is not None:
+                found = self._wait(lock_key, f"{self.prefix}:{key}:{leader}")
+                if found is not None:
+                    return found[0]
+            # The other worker failed, is too slow or just finished: run
+            # the query ourselves.
+            return func(*args, **kwargs)
+
+        try:
+            result = func(*args, **kwargs)
+            # Wrapped in a tuple so that a None result is still a hit.
+            self.cache.set(f"{self.prefix}:{key}:{flight}", (result,), self.result_timeout)
+            return result
+        finally:
+            self.cache.delete(lock_key)
+
+    def _wait(self, lock_key: str, result_key: str):
+        deadline = time.monotonic() + self.wait_timeout
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            found = self.cache.get(result_key)
+            if found is not None:
+                return found
+            if self.cache.get(lock_key) is None:
+                # Released: the result may have been published meanwhile.
+                return self.cache.get(result_key)
+            delay = min(delay * 2, 0.2)
+        return None
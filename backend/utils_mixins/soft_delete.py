@@ -0,0 +1,364 @@
+"""
+Set-based soft delete.
+
+safedelete's SOFT_DELETE_CASCADE collects the whole tree of related
+objects in Python and saves them one by one (one UPDATE, signals and audit
+entry per row). Here the tree is walked by model: each level is marked with
+one UPDATE per chunk of parent keys (`deleted` and `deleted_by_cascade`),
+the whole cascade in one transaction per database. Leaves (e.g. passports)
+are never loaded.
+
+Only the CASCADE relations between safedelete models are followed, as
+safedelete does. Sharded models (SHARDED_MODELS) are updated on every shard
+below a non-sharded parent, on the parent's shard otherwise. Trees with
+PROTECT / RESTRICT relations or SET_NULL / SET_DEFAULT / SET updates are
+left to safedelete's collector (see `needs_collector`).
+
+Row signals are not sent: `bulk_soft_deleted` is sent once per UPDATE
+instead, with the lookup matching the rows it changes.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from typing import Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, models, router, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from safedelete.config import DELETED_BY_CASCADE_FIELD_NAME, FIELD_NAME
+from safedelete.models import SOFT_DELETE, SOFT_DELETE_CASCADE, is_safedelete_cls
+
+from utils_mixins.background import run_in_background
+from utils_mixins.db_routers import replica_lag
+from utils_mixins.sharding import shard_aliases
+
+
+logger = logging.getLogger(__name__)
+
+# Sent for each set of rows (un)deleted. Arguments: sender (the model),
+# using, lookup (filter kwargs matching the rows), undelete. Sent after the
+# UPDATE for deletes, before it for undeletes: once restored, the rows can
+# no longer be told from those which were not deleted.
+bulk_soft_deleted = Signal()
+
+# Keys per IN (...) clause.
+CHUNK_SIZE = 1000
+
+
+def _is_sharded(model) -> bool:
+    return model._meta.label_lower in getattr(settings, "SHARDED_MODELS", ())
+
+
+def cascade_edges(model) -> list:
+    """(child model, foreign key name) of the CASCADE relations to follow from `model`."""
+    return list(dict.fromkeys(
+        (relation.related_model, relation.field.name)
+        for relation in model._meta.related_objects
+        if relation.on_delete is models.CASCADE
+        and not relation.many_to_many
+        and is_safedelete_cls(relation.related_model)
+    ))
+
+
+def needs_collector(model, seen=None) -> bool:
+    """
+    Whether deleting `model` rows checks PROTECT / RESTRICT relations or
+    updates SET_NULL / SET_DEFAULT / SET foreign keys somewhere in its
+    cascade tree, which only safedelete's (row by row) collector does.
+    """
+    seen = set() if seen is None else seen
+    seen.add(model)
+    for relation in model._meta.related_objects:
+        if relation.many_to_many or relation.on_delete is models.DO_NOTHING:
+            continue
+        if relation.on_delete is not models.CASCADE:
+            return True
+        if relation.related_model not in seen and needs_collector(relation.related_model, seen):
+            return True
+    return False
+
+
+def _cascade_parents(model) -> set:
+    return {
+        field.related_model
+        for field in model._meta.fields
+        if field.many_to_one
+        and field.remote_field.on_delete is models.CASCADE
+        and is_safedelete_cls(field.related_model)
+    }
+
+
+def _descendants(model, seen=None) -> set:
+    seen = set() if seen is None else seen
+    for child, _ in cascade_edges(model):
+        if child not in seen:
+            seen.add(child)
+            _descendants(child, seen)
+    return seen
+
+
+def undelete_edges(model) -> list:
+    """
+    Relations followed to undelete `model`: not the shortcuts to a
+    descendant also reached through an intermediate model (organization to
+    passport, when passports come back with their batch), otherwise the
+    children of an intermediate row deleted on its own would come back.
+    """
+    descendants = _descendants(model)
+    return [
+        (child, field)
+        for child, field in cascade_edges(model)
+        if not (_cascade_parents(child) - {model}) & descendants
+    ]
+
+
+def _aliases(child, parent, parent_alias: str) -> list:
+    if _is_sharded(child):
+        return [parent_alias] if _is_sharded(parent) else shard_aliases()
+    return [router.db_for_write(child)]
+
+
+def _chunks(keys: list):
+    for start in range(0, len(keys), CHUNK_SIZE):
+        yield keys[start:start + CHUNK_SIZE]
+
+
+class _Cascade:
+
+    def __init__(self, undelete: bool):
+        self.undelete = undelete
+        self.now = timezone.now()
+        self.counter = Counter()
+
+    def pending(self, queryset):
+        """Rows of `queryset` this operation changes."""
+        if self.undelete:
+            return queryset.filter(**{f"{FIELD_NAME}__isnull": False})
+        return queryset.filter(**{f"{FIELD_NAME}__isnull": True})
+
+    def mark(self, queryset, lookup: dict, using: str, cascade: bool) -> int:
+        """Mark the pending rows of `queryset`, matched by `lookup` (and the pending filters)."""
+        model = queryset.model
+        if self.undelete:
+            changes = {**lookup, f"{FIELD_NAME}__isnull": False}
+            if cascade:
+                changes[DELETED_BY_CASCADE_FIELD_NAME] = True
+            bulk_soft_deleted.send(sender=model, using=using, lookup=changes, undelete=True)
+            count = queryset.update(**{FIELD_NAME: None, DELETED_BY_CASCADE_FIELD_NAME: False})
+        else:
+            count = queryset.update(**{FIELD_NAME: self.now, DELETED_BY_CASCADE_FIELD_NAME: cascade})
+            if count:
+                changed = {**lookup, FIELD_NAME: self.now}
+                bulk_soft_deleted.send(sender=model, using=using, lookup=changed, undelete=False)
+        if count:
+            self.counter[model._meta.label] += count
+        return count
+
+    def run(self, model, pks: list, using: str) -> None:
+        """Mark the rows `pks` of `model`, then their descendants."""
+        for chunk in _chunks(pks):
+            queryset = self.pending(model._base_manager.using(using).filter(pk__in=chunk))
+            self.mark(queryset, {"pk__in": chunk}, using, cascade=False)
+        self.descend(model, pks, using)
+
+    def edges(self, model) -> list:
+        return undelete_edges(model) if self.undelete else cascade_edges(model)
+
+    def descend(self, parent, pks: list, using: str) -> None:
+        for child, field in self.edges(parent):
+            for alias in _aliases(child, parent, using):
+                keys = []
+                for chunk in _chunks(pks):
+                    lookup = {f"{field}__in": chunk}
+                    queryset = self.pending(child._base_manager.using(alias).filter(**lookup))
+                    if self.undelete:
+                        # Only what the cascade deleted comes back.
+                        queryset = queryset.filter(**{DELETED_BY_CASCADE_FIELD_NAME: True})
+                    if self.edges(child):
+                        # Keys needed for the next level: fetched before the
+                        # UPDATE, which makes them unreachable.
+                        chunk_keys = list(queryset.values_list("pk", flat=True))
+                        keys += chunk_keys
+                        lookup = {"pk__in": chunk_keys}
+                        queryset = child._base_manager.using(alias).filter(**lookup)
+                    self.mark(queryset, lookup, alias, cascade=True)
+                if keys:
+                    self.descend(child, keys, alias)
+
+
+def _atomic_everywhere(using: str) -> ExitStack:
+    stack = ExitStack()
+    for alias in dict.fromkeys([using, *shard_aliases()]):
+        stack.enter_context(transaction.atomic(using=alias))
+    return stack
+
+
+def bulk_soft_delete(queryset, undelete: bool = False, defer: bool = False) -> Optional[dict]:
+    """
+    Soft-delete (or undelete) the rows of `queryset` and, set-based, their
+    descendants, as SOFT_DELETE_CASCADE would. Returns the number of rows
+    per model label.
+
+    With `defer`, only the rows of `queryset` are marked now; their
+    descendants are marked in a background thread once the transaction is
+    committed (very large trees), and None is returned.
+
+    Deleting rows whose tree needs safedelete's collector (PROTECT,
+    SET_NULL, ...) raises ValueError: delete them one by one instead.
+    """
+    model, using = queryset.model, queryset.db
+    if not undelete and needs_collector(model):
+        raise ValueError(f"{model._meta.label} has PROTECT or SET_* relations: delete its rows one by one.")
+    pks = list(queryset.values_list("pk", flat=True))
+    cascade = _Cascade(undelete)
+    with _atomic_everywhere(using):
+        if not defer:
+            cascade.run(model, pks, using)
+            return dict(cascade.counter)
+        for chunk in _chunks(pks):
+            rows = cascade.pending(model._base_manager.using(using).filter(pk__in=chunk))
+            cascade.mark(rows, {"pk__in": chunk}, using, cascade=False)
+        transaction.on_commit(
+            lambda: run_in_background(_descend_in_background, model, pks, using, undelete), using=using
+        )
+    return None
+
+
+class BulkCascadeMixin:
+    """
+    SOFT_DELETE_CASCADE model whose `delete()` and `undelete()` cascade
+    set-based: the instance itself is saved as usual (signals, audit log),
+    its descendants are marked by `bulk_soft_delete`'s UPDATEs. Deletes
+    needing the collector (see `needs_collector`) are left to safedelete.
+    To put before SafeDeleteModel in the bases.
+    """
+
+    def _cascade(self, undelete: bool) -> Counter:
+        cascade = _Cascade(undelete)
+        using = self._state.db or router.db_for_write(type(self), instance=self)
+        with _atomic_everywhere(using):
+            cascade.descend(type(self), [self.pk], using)
+        return cascade.counter
+
+    def soft_delete_cascade_policy_action(self, **kwargs):
+        if needs_collector(type(self)):
+            return super().soft_delete_cascade_policy_action(**kwargs)
+        with transaction.atomic(using=router.db_for_write(type(self), instance=self)):
+            _, deleted = self._delete(force_policy=SOFT_DELETE, **kwargs)
+            counter = self._cascade(undelete=False)
+        counter.update(deleted)
+        return sum(counter.values()), dict(counter)
+
+    def undelete(self, force_policy=None, **kwargs):
+        if (force_policy or self._safedelete_policy) != SOFT_DELETE_CASCADE:
+            return super().undelete(force_policy=force_policy, **kwargs)
+        with transaction.atomic(using=router.db_for_write(type(self), instance=self)):
+            _, undeleted = super().undelete(force_policy=SOFT_DELETE, **kwargs)
+            counter = self._cascade(undelete=True)
+        counter.update(undeleted)
+        return sum(counter.values()), dict(counter)
+
+
+def _descend_in_background(model, pks: list, using: str, undelete: bool) -> None:
+    try:
+        cascade = _Cascade(undelete)
+        with _atomic_everywhere(using):
+            cascade.descend(model, pks, using)
+        logger.info("Soft-delete cascade of %d %s: %s", len(pks), model._meta.label, dict(cascade.counter))
+    except Exception:
+        logger.exception("Soft-delete cascade of %d %s failed", len(pks), model._meta.label)
+
+
+# Purge
+# Soft-deleted rows past the retention are deleted for good, oldest first
+# (index on `deleted`), a chunk per transaction, with a pause between
+# chunks. Rows still referenced (e.g. a batch whose passports are kept, a
+# membership of an owner) stay.
+
+# Seconds the purge waits at most for the replicas to catch up, per chunk.
+MAX_REPLICA_WAIT = 60
+
+
+def _referencing(model) -> list:
+    """(model, column) of the foreign keys to `model` from its database."""
+    return [
+        (relation.related_model, relation.field.attname)
+        for relation in model._meta.get_fields(include_hidden=True)
+        if relation.auto_created
+        and not relation.concrete
+        and (relation.one_to_many or relation.one_to_one)
+        and _is_sharded(relation.related_model) == _is_sharded(model)
+    ]
+
+
+def purgeable(model, before) -> models.QuerySet:
+    """Rows of `model` soft-deleted before `before` and referenced by no row."""
+    queryset = model._base_manager.filter(**{f"{FIELD_NAME}__lt": before})
+    for related, column in _referencing(model):
+        # Anti-join on the index of the foreign key, not NOT IN (the whole table).
+        queryset = queryset.filter(~models.Exists(related._base_manager.filter(**{column: models.OuterRef("pk")})))
+    return queryset
+
+
+def purge_aliases(model) -> list:
+    return shard_aliases() if _is_sharded(model) else [router.db_for_write(model)]
+
+
+def _heap_bytes(alias: str, model, pks: list) -> Optional[int]:
+    """Bytes of the rows `pks` in the table (Postgres only, None elsewhere)."""
+    connection = connections[alias]
+    if connection.vendor != "postgresql":
+        return None
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {quote(model._meta.db_table)} AS t"
+            f" WHERE t.{quote(model._meta.pk.column)} = ANY(%s)",
+            [pks],
+        )
+        return int(cursor.fetchone()[0])
+
+
+def _throttle(alias: str, pause: float) -> None:
+    time.sleep(pause)
+    if alias != DEFAULT_DB_ALIAS:
+        return
+    waited = 0
+    while waited < MAX_REPLICA_WAIT and any(
+        replica_lag(replica) > settings.REPLICA_MAX_LAG for replica in getattr(settings, "DATABASE_REPLICAS", ())
+    ):
+        time.sleep(1)
+        waited += 1
+
+
+def purge_soft_deleted(model, before, chunk_size: int = 500, pause: float = 0.0) -> tuple:
+    """
+    Delete for good the `purgeable` rows of `model` (on each of its
+    databases), `chunk_size` rows per transaction, sleeping `pause` seconds
+    (and while the replicas lag) between chunks. Signals are not sent: the
+    rows were hidden since their soft delete.
+    Returns the number of rows deleted and their bytes (None unless measured).
+    """
+    rows, size = 0, None
+    for alias in purge_aliases(model):
+        while True:
+            with transaction.atomic(using=alias):
+                pks = list(
+                    purgeable(model, before).using(alias)
+                    .order_by(FIELD_NAME).values_list("pk", flat=True)[:chunk_size]
+                )
+                if pks:
+                    measured = _heap_bytes(alias, model, pks)
+                    if measured is not None:
+                        size = (size or 0) + measured
+                    # Checked again: undeleted since the selection.
+                    rows += model._base_manager.using(alias).filter(
+                        pk__in=pks, **{f"{FIELD_NAME}__lt": before}
+                    )._raw_delete(alias)
+            if len(pks) < chunk_size:
+                break
+            _throttle(alias, pause)
+        logger.info("Purged soft-deleted %s on %s", model._meta.label, alias)
+    return rows, size
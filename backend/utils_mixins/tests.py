@@ -1,3 +1,623 @@
-from django.test import TestCase
+import os
+import pickle
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from mae.settings.database import _database
+from organisations.models import Organization
+from utils_mixins import circuit_breaker, db_routers, serializers
+from utils_mixins.cache_backends import ResilientRedisCache
+from utils_mixins.caches import (
+    StampedeCachedFunction, VersionedResults, bump_data_version, get_tag_versions, invalidate_tags, tag_version_key,
+)
+from utils_mixins.circuit_breaker import CircuitState, breakers_stats, get_breaker
+from utils_mixins.response_cache import ResponseCacheMiddleware, add_surrogate_keys, purge_surrogate_keys
+from utils_mixins.singleflight import SingleFlight
+from utils_mixins.uuids import default_uuid, uuid7
+
+
+class FakeRedisServer:
+    """
+    Local fake Redis (RESP2, the commands Django's Redis cache sends) in a
+    thread. `mode`: "up", "stall" (reads, never answers) or "down" (closes
+    every connection).
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.mode = "up"
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                transaction = None
+                while True:
+                    try:
+                        command = self.read_command()
+                    except (ConnectionError, OSError):
+                        return
+                    if command is None or fake.mode == "down":
+                        return
+                    if fake.mode == "stall":
+                        time.sleep(5)
+                        return
+                    name = command[0].upper()
+                    if name == b"MULTI":
+                        transaction = []
+                        self.wfile.write(b"+OK\r\n")
+                    elif name == b"EXEC":
+                        replies, transaction = [fake.execute(c) for c in transaction], None
+                        self.wfile.write(b"*%d\r\n" % len(replies) + b"".join(replies))
+                    elif transaction is not None:
+                        transaction.append(command)
+                        self.wfile.write(b"+QUEUED\r\n")
+                    else:
+                        self.wfile.write(fake.execute(command))
+
+            def read_command(self):
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                command = []
+                for _ in range(int(line[1:])):
+                    size = int(self.rfile.readline()[1:])
+                    command.append(self.rfile.read(size + 2)[:-2])
+                return command
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def execute(self, command) -> bytes:
+        name, args = command[0].upper(), command[1:]
+        if name in (b"PING",):
+            return b"+PONG\r\n"
+        if name in (b"SELECT", b"EXPIRE", b"PERSIST"):
+            return b"+OK\r\n" if name == b"SELECT" else b":1\r\n"
+        if name == b"GET":
+            return self.bulk(self.data.get(args[0]))
+        if name == b"MGET":
+            return b"*%d\r\n" % len(args) + b"".join(self.bulk(self.data.get(key)) for key in args)
+        if name == b"SET":
+            options = [arg.upper() for arg in args[2:]]
+            if b"NX" in options and args[0] in self.data:
+                return b"$-1\r\n"
+            self.data[args[0]] = args[1]
+            return b"+OK\r\n"
+        if name == b"MSET":
+            self.data.update(zip(args[::2], args[1::2]))
+            return b"+OK\r\n"
+        if name == b"DEL":
+            return b":%d\r\n" % sum(self.data.pop(key, None) is not None for key in args)
+        if name == b"EXISTS":
+            return b":%d\r\n" % sum(key in self.data for key in args)
+        if name == b"INCRBY":
+            self.data[args[0]] = b"%d" % (int(self.data.get(args[0], 0)) + int(args[1]))
+            return b":" + self.data[args[0]] + b"\r\n"
+        return b"-ERR unknown command\r\n"
+
+    @staticmethod
+    def bulk(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+BREAKER = "test-redis"
+
+
+@override_settings(CIRCUIT_BREAKERS={BREAKER: {"failure_threshold": 2, "reset_timeout": 0.2}})
+class ResilientRedisCacheTests(SimpleTestCase):
+    """ResilientRedisCache against a local fake Redis."""
+
+    def setUp(self):
+        self.redis = FakeRedisServer()
+        self.addCleanup(self.redis.stop)
+        self.addCleanup(circuit_breaker._breakers.pop, BREAKER, None)
+        options = {
+            "socket_timeout": 0.1,
+            "socket_connect_timeout": 0.1,
+            "CIRCUIT_BREAKER": BREAKER,
+        }
+        caches = {"default": {
+            "BACKEND": "utils_mixins.cache_backends.ResilientRedisCache",
+            "LOCATION": self.redis.url,
+            "OPTIONS": options,
+        }}
+        settings = override_settings(CACHES=caches)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.cache = ResilientRedisCache(self.redis.url, {"OPTIONS": options})
+        self.cache.fallback.clear()
+
+    def test_values_are_stored_in_redis(self):
+        self.cache.set("key", {"a": 1}, 60)
+        self.assertEqual(self.cache.get("key"), {"a": 1})
+        self.assertIn(b":1:key", self.redis.data)
+        self.assertEqual(get_breaker(BREAKER).state, CircuitState.CLOSED)
+
+    def test_stalled_redis_opens_the_circuit(self):
+        self.cache.set("key", "redis", 60)
+        self.redis.mode = "stall"
+        for _ in range(2):
+            self.assertIsNone(self.cache.get("key"))
+        breaker = get_breaker(BREAKER)
+        self.assertEqual(breaker.state, CircuitState.OPEN)
+
+        # Short-circuited: served by the in-process fallback at once.
+        started = time.monotonic()
+        self.cache.set("key", "fallback", 60)
+        self.assertEqual(self.cache.get("key"), "fallback")
+        self.assertLess(time.monotonic() - started, 0.1)
+        stats = {stats["name"]: stats for stats in breakers_stats()}[BREAKER]
+        self.assertEqual(stats["state"], "open")
+        self.assertGreaterEqual(stats["short_circuited"], 2)
+
+    def test_recovery_purges_the_keys_written_during_the_outage(self):
+        self.cache.set("key", "before", 60)
+        self.redis.mode = "down"
+        for _ in range(2):
+            self.cache.get("key")
+        self.cache.set("key", "during", 60)
+
+        self.redis.mode = "up"
+        time.sleep(0.25)
+        # Half-open trial: the key written meanwhile is purged first.
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(get_breaker(BREAKER).state, CircuitState.CLOSED)
+
+    def test_tags_invalidated_during_the_outage_stay_invalidated(self):
+        tags = get_tag_versions(["organization:1"])
+        self.assertEqual(tags, {"organization:1": None})
+
+        self.redis.mode = "down"
+        for _ in range(2):
+            get_tag_versions(["organization:1"])
+        invalidate_tags("organization:1")
+
+        self.redis.mode = "up"
+        time.sleep(0.25)
+        # Entries cached with the version None before the outage must not match.
+        self.assertIsNotNone(get_tag_versions(["organization:1"])["organization:1"])
+        self.assertIn(f":1:{tag_version_key('organization:1')}".encode(), self.redis.data)
+
+    def test_redis_refusing_connections(self):
+        port = self.redis.port
+        self.redis.stop()
+        with socket.socket() as probe:
+            self.assertNotEqual(probe.connect_ex(("127.0.0.1", port)), 0)
+        self.assertEqual(self.cache.get("key", "default"), "default")
+
+
+class CompactSerializerTests(SimpleTestCase):
+    """Compact cache serialization of model instances."""
+
+    def organization(self, **kwargs):
+        organization = Organization(name="Consulat", slug="consulat", **kwargs)
+        organization._state.adding, organization._state.db = False, "default"
+        return organization
+
+    def test_instances_are_rebuilt_from_their_fields(self):
+        organization = self.organization()
+        cached = serializers.loads(serializers.dumps({"value": [organization]}))
+        rebuilt = cached["value"][0]
+        self.assertIsInstance(rebuilt, Organization)
+        self.assertEqual((rebuilt.pk, rebuilt.slug, rebuilt.name), (organization.pk, "consulat", "Consulat"))
+        self.assertEqual(rebuilt._state.db, "default")
+        self.assertFalse(rebuilt._state.adding)
+        self.assertLess(len(serializers.dumps(organization)), len(pickle.dumps(organization)))
+
+    @override_settings(CACHE_COMPRESSION="zlib", CACHE_COMPRESSION_THRESHOLD=100)
+    def test_large_values_are_compressed(self):
+        self.assertEqual(serializers.dumps("x")[:1], serializers.RAW)
+        data = serializers.dumps("x" * 1000)
+        self.assertEqual(data[:1], serializers.ZLIB)
+        self.assertEqual(serializers.loads(data), "x" * 1000)
+
+    @override_settings(CACHE_COMPRESSION="zstd", CACHE_COMPRESSION_THRESHOLD=100)
+    def test_missing_codec_falls_back_to_zlib_with_a_warning(self):
+        with mock.patch.object(serializers, "zstandard", None), mock.patch.object(serializers, "_warned", set()):
+            with self.assertLogs("utils_mixins.serializers", "WARNING"):
+                data = serializers.dumps("x" * 1000)
+        self.assertEqual(data[:1], serializers.ZLIB)
+
+    def test_values_cached_against_other_fields_are_misses(self):
+        data = serializers.dumps(self.organization())
+        serializer = serializers.CompactRedisSerializer()
+        with mock.patch.object(serializers, "_fields_signature", return_value=0):
+            with self.assertRaises(serializers.StaleSchemaError):
+                serializers.loads(data)
+            self.assertIsNone(serializer.loads(data))
+        self.assertEqual(serializer.loads(data).slug, "consulat")
+        self.assertEqual(serializer.loads(serializer.dumps(42)), 42)
+
+
+LOCMEM_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"tests-{alias}"}
+    for alias in ("default", "search")
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class StampedeCacheTests(SimpleTestCase):
+    """Stampede protection, stale-while-revalidate and tag invalidation."""
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.calls = []
+        self.lookup = StampedeCachedFunction(
+            self.compute, timeout=60, prefix="tests:lookup", tags=lambda slug: {f"slug:{slug}"}
+        )
+
+    def compute(self, slug):
+        self.calls.append(slug)
+        return f"{slug}-{len(self.calls)}"
+
+    def test_hits_until_their_tag_is_invalidated(self):
+        self.assertEqual((self.lookup("a"), self.lookup("b")), ("a-1", "b-2"))
+        self.assertEqual((self.lookup("a"), self.lookup("b")), ("a-1", "b-2"))
+        invalidate_tags("slug:a")
+        self.assertEqual((self.lookup("a"), self.lookup("b")), ("a-3", "b-2"))
+
+    def test_stale_value_is_served_while_another_caller_refreshes(self):
+        self.lookup("a")
+        # Expired (the cache clock moves too), and being refreshed.
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.lookup.cache.add(f"{self.lookup.make_key('a')}:lock", 1, 10)
+            self.assertEqual(self.lookup("a"), "a-1")
+        self.assertEqual(self.calls, ["a"])
+
+    def test_invalidated_values_are_not_served_stale(self):
+        self.lookup("a")
+        self.lookup.cache.add(f"{self.lookup.make_key('a')}:lock", 1, 10)
+        invalidate_tags("slug:a")
+        self.lookup.wait_timeout = 0.05
+        self.assertEqual(self.lookup("a"), "a-2")
+
+    def test_result_tag_invalidated_while_computing_is_not_stored(self):
+        def compute(slug):
+            self.calls.append(slug)
+            invalidate_tags("row:1")
+            return f"{slug}-{len(self.calls)}"
+
+        lookup = StampedeCachedFunction(compute, timeout=60, prefix="tests:rows", result_tags=lambda value: {"row:1"})
+        self.assertEqual((lookup("a"), lookup("a")), ("a-1", "a-2"))
+
+    def test_concurrent_misses_compute_once(self):
+        started = threading.Event()
+
+        def slow(slug):
+            started.set()
+            time.sleep(0.1)
+            return self.compute(slug)
+
+        lookup = StampedeCachedFunction(slow, timeout=60, prefix="tests:slow")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(lookup("a"))) for _ in range(5)]
+        threads[0].start()
+        started.wait(1)
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((results, self.calls), (["a-1"] * 5, ["a"]))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SingleFlightTests(SimpleTestCase):
+    """Concurrent identical calls coalesced, within and across workers."""
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.calls = 0
+        self.release = threading.Event()
+
+    def query(self, value="result"):
+        self.calls += 1
+        self.release.wait(1)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def concurrently(self, flights, value="result", count=5) -> list:
+        results = []
+
+        def call(flight):
+            try:
+                results.append(flight.do("key", self.query, value))
+            except Exception as exc:
+                results.append(exc)
+
+        threads = [threading.Thread(target=call, args=(flights[i % len(flights)],)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_calls_run_once(self):
+        results = self.concurrently([SingleFlight("tests")])
+        self.assertEqual((results, self.calls), (["result"] * 5, 1))
+
+    def test_errors_are_shared_and_not_kept(self):
+        flight = SingleFlight("tests")
+        results = self.concurrently([flight], ValueError("boom"))
+        self.assertEqual(self.calls, 1)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(flight.do("key", self.query), "result")
+
+    def test_workers_share_the_result_of_one_flight(self):
+        workers = [SingleFlight("tests", distributed=True) for _ in range(2)]
+        results = self.concurrently(workers, count=2)
+        self.assertEqual((results, self.calls), (["result"] * 2, 1))
+        # Later calls run their own query.
+        workers[0].do("key", self.query)
+        self.assertEqual(self.calls, 2)
+
+
+class FakeQuerySet:
+    """Countable and sliceable rows, counting the queries."""
+
+    ordered = True
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = 0
+
+    def count(self):
+        self.queries += 1
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        self.queries += 1
+        return self.rows[index]
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VersionedResultsTests(SimpleTestCase):
+    """Search results cached under the data version of their organization."""
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.queryset = FakeQuerySet(list(range(30)))
+
+    def results(self, **kwargs):
+        return VersionedResults(self.queryset, "tests:search", ["organization:1"], 60, **kwargs)
+
+    def test_results_are_cached_until_the_version_is_bumped(self):
+        self.assertEqual((self.results().count(), self.results()[0:10]), (30, list(range(10))))
+        self.assertEqual((self.results().count(), self.results()[0:10]), (30, list(range(10))))
+        self.assertEqual(self.queryset.queries, 2)
+
+        bump_data_version("organization:2")
+        self.results().count()
+        self.assertEqual(self.queryset.queries, 2)
+        bump_data_version("organization:1")
+        self.queryset.rows.append(30)
+        self.assertEqual(self.results().count(), 31)
+        self.assertEqual(self.queryset.queries, 3)
+
+    def test_empty_results_are_hits(self):
+        self.queryset.rows = []
+        self.assertEqual(self.results()[0:10], [])
+        self.assertEqual(self.results()[0:10], [])
+        self.assertEqual(self.queryset.queries, 1)
+
+    def test_results_right_after_a_bump_are_cached_until_it_settles(self):
+        bump_data_version("organization:1")
+        results = self.results(settle_time=5)
+        results.count()
+        self.assertLessEqual(results._entry_timeout, 5)
+        self.assertEqual(self.results(settle_time=0)._entry_timeout, 60)
+
+
+class UUIDv7Tests(SimpleTestCase):
+    """Time-ordered primary keys."""
+
+    def test_ids_are_ordered_version_7(self):
+        ids = [uuid7() for _ in range(5000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 5000)
+        self.assertEqual({(value.version, value.variant) for value in ids}, {(7, uuid.RFC_4122)})
+        self.assertAlmostEqual((ids[0].int >> 80) / 1000, time.time(), delta=5)
+
+    def test_version_is_read_from_the_settings(self):
+        self.assertEqual(default_uuid().version, 4)
+        with override_settings(UUID_PRIMARY_KEY_VERSION=7):
+            self.assertEqual(default_uuid().version, 7)
+
+
+class PostgresProfileTests(SimpleTestCase):
+    """Connection settings of the Postgres production profile."""
+
+    URL = "postgres://mae:secret@db:5432/mae"
+
+    def test_pool_by_default(self):
+        with mock.patch.dict(os.environ, {"DATABASE_POOL_MAX_SIZE": "20"}):
+            database = _database(self.URL)
+        self.assertEqual(database["OPTIONS"]["pool"]["max_size"], 20)
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+        self.assertEqual(database["OPTIONS"]["prepare_threshold"], 5)
+        self.assertFalse(database["DISABLE_SERVER_SIDE_CURSORS"])
+
+    def test_persistent_connections_without_pool(self):
+        with mock.patch.dict(os.environ, {"DATABASE_POOL": "OFF"}):
+            database = _database(self.URL)
+        self.assertNotIn("pool", database["OPTIONS"])
+        self.assertEqual(database["CONN_MAX_AGE"], 60)
+
+    def test_pgbouncer_disables_prepared_statements_and_server_side_cursors(self):
+        with mock.patch.dict(os.environ, {"DATABASE_PGBOUNCER": "ON"}):
+            database = _database(self.URL)
+        self.assertIsNone(database["OPTIONS"]["prepare_threshold"])
+        self.assertTrue(database["DISABLE_SERVER_SIDE_CURSORS"])
+
+
+class SqliteProfileTests(TestCase):
+    """Single-node SQLite profile: locking and pragmas."""
+
+    def test_settings(self):
+        database = _database("sqlite:////tmp/mae.sqlite3")
+        self.assertEqual(database["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertIn("PRAGMA journal_mode=WAL", database["OPTIONS"]["init_command"])
+        self.assertEqual(database["CONN_MAX_AGE"], 600)
+        with mock.patch.dict(os.environ, {"SQLITE_PROFILE": "OFF"}):
+            self.assertNotIn("OPTIONS", _database("sqlite:////tmp/mae.sqlite3"))
+
+    @skipUnless(connection.vendor == "sqlite", "DATABASE_URL is not SQLite")
+    def test_pragmas_of_the_connections(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA temp_store")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    RESPONSE_CACHE_ROUTES={"/public/": 60},
+    DATABASE_REPLICAS=["replica_1"],
+    REPLICA_MAX_LAG=5,
+)
+class ResponseCacheTests(SimpleTestCase):
+    """Full-response cache and its staleness guard."""
+
+    def setUp(self):
+        for alias in LOCMEM_CACHES:
+            caches[alias].clear()
+        self.calls = 0
+        self.middleware = ResponseCacheMiddleware(self.view)
+        self.request = RequestFactory().get("/public/passports", {"page": "2", "q": " "})
+
+    def view(self, request):
+        self.calls += 1
+        response = HttpResponse(b"[]", content_type="application/json")
+        add_surrogate_keys(response, "passports")
+        self.on_view()
+        return response
+
+    def on_view(self):
+        pass
+
+    def test_hits_are_served_without_the_view(self):
+        self.assertEqual(self.middleware(self.request).headers["X-Cache"], "MISS")
+        response = self.middleware(RequestFactory().get("/public/passports?page=2"))
+        self.assertEqual(response.headers["X-Cache"], "HIT")
+        self.assertEqual(response.content, b"[]")
+        self.assertNotIn("Surrogate-Key", response.headers)
+        self.assertEqual(self.calls, 1)
+
+        purge_surrogate_keys("passports")
+        self.assertEqual(self.middleware(self.request).headers["X-Cache"], "MISS")
+        self.assertEqual(self.calls, 2)
+
+    def test_recent_purge_is_not_stored_from_a_replica(self):
+        purge_surrogate_keys("passports")
+        key = self.middleware.make_key(self.request)
+        self.middleware.refresh(self.request, key, 60)
+        self.assertIsNone(self.middleware.cache.get(key))
+
+    def test_recent_purge_is_stored_when_read_from_the_primary(self):
+        purge_surrogate_keys("passports")
+        key = self.middleware.make_key(self.request)
+        self.middleware.refresh(self.request, key, 60, max_lag=0)
+        self.assertIsNotNone(self.middleware.cache.get(key))
+
+    def test_purge_while_computing_is_never_stored(self):
+        self.on_view = lambda: purge_surrogate_keys("passports")
+        key = self.middleware.make_key(self.request)
+        self.middleware.refresh(self.request, key, 60, max_lag=0)
+        self.assertIsNone(self.middleware.cache.get(key))
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"], REPLICA_MAX_LAG=5, REPLICA_ROUTES=["/passports"])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions of ReplicaRouter / ReplicaRoutingMiddleware (no query is run)."""
+
+    def setUp(self):
+        self.lag = 0.0
+        patcher = mock.patch.object(db_routers, "replica_lag", side_effect=lambda alias: self.lag)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.model = get_user_model()
+        self.reads = []
+
+    def get(self, path="/passports", method="get", view=None, **extra):
+        def default_view(request):
+            self.reads.append(router.db_for_read(self.model))
+            return HttpResponse()
+
+        middleware = db_routers.ReplicaRoutingMiddleware(view or default_view)
+        return middleware(getattr(RequestFactory(), method)(path, **extra))
+
+    def test_reads_go_to_a_replica(self):
+        response = self.get()
+        self.assertEqual(self.reads, ["replica_1"])
+        self.assertNotIn(db_routers.PIN_COOKIE, response.cookies)
+
+    def test_other_routes_and_unsafe_methods_read_the_primary(self):
+        self.get("/organizations")
+        response = self.get(method="post")
+        self.assertEqual(self.reads, ["default", "default"])
+        self.assertIn(db_routers.PIN_COOKIE, response.cookies)
+
+    def test_a_write_alone_does_not_pin(self):
+        # E.g. `last_login` written by the authentication of every request.
+        def view(request):
+            self.assertEqual(router.db_for_write(self.model), "default")
+            self.reads.append(router.db_for_read(self.model))
+            return HttpResponse()
+
+        response = self.get(view=view)
+        self.assertEqual(self.reads, ["replica_1"])
+        self.assertNotIn(db_routers.PIN_COOKIE, response.cookies)
+
+    def test_marked_writes_pin_the_client_to_the_primary(self):
+        def view(request):
+            self.reads.append(router.db_for_read(self.model))
+            db_routers.mark_written()
+            self.reads.append(router.db_for_read(self.model))
+            return HttpResponse()
+
+        response = self.get(view=view)
+        self.assertEqual(self.reads, ["replica_1", "default"])
+        pinned_until = float(response.cookies[db_routers.PIN_COOKIE].value)
+        self.assertAlmostEqual(pinned_until, time.time() + 5, delta=1)
+
+        self.reads = []
+        self.get(HTTP_COOKIE=f"{db_routers.PIN_COOKIE}={pinned_until}")
+        self.get(HTTP_COOKIE=f"{db_routers.PIN_COOKIE}={time.time() - 1}")
+        self.assertEqual(self.reads, ["default", "replica_1"])
+
+    def test_lagging_replicas_are_skipped(self):
+        self.lag = 6.0
+        self.get()
+        self.assertEqual(self.reads, ["default"])
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(router.db_for_read(self.model), "default")